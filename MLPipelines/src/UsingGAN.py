@@ -1,25 +1,108 @@
 import pandas as pd
+import numpy as np
 import pickle
 import logging
 import os
-from PIL import Image
+import sys
+import threading
+from utils.executors import get_process_pool
+
+RCTGAN_MODEL_PATH = os.getenv("RCTGAN_MODEL_PATH", "../models/model_rctgan_tuned.p")
+RCTGAN_SAMPLE_BATCH_ROWS = int(os.getenv("RCTGAN_SAMPLE_BATCH_ROWS", 10000))
+# Tables the model was trained on; the other datasets (e.g. *_reference) are not modelled
+RCTGAN_TABLES = ("account_details", "account_fin_info")
+
+# path -> (mtime, loaded object), shared by every generator in the process
+_file_cache = {}
+_file_cache_lock = threading.Lock()
+
+
+def load_cached(path, loader):
+    """
+    Loads a file once and returns the cached object until the file's modification time
+    changes. Cached DataFrames are shared between callers and must be treated as read-only.
+    """
+    mtime = os.path.getmtime(path)
+    with _file_cache_lock:
+        cached = _file_cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+    logging.info(f'          - loading {path}')
+    loaded = loader(path)
+    with _file_cache_lock:
+        _file_cache[path] = (mtime, loaded)
+    return loaded
+
+
+def load_pickle(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def load_image(path):
+    from PIL import Image
+
+    image = Image.open(path)
+    image.load()
+    return image
+
+
+def seed_everything(seed: int):
+    import random
+
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    if "torch" in sys.modules:
+        sys.modules["torch"].manual_seed(seed)
+
+
+def table_parents(model_path, table_names) -> dict:
+    """
+    Maps each of `table_names` to its parent table in the model metadata when that parent
+    is among `table_names` too, otherwise to None.
+    """
+    model = load_cached(model_path, load_pickle)
+    metadata = getattr(model, "metadata", None)
+    parents = {}
+    for table_name in table_names:
+        try:
+            candidates = list(metadata.get_parents(table_name))
+        except (AttributeError, KeyError, ValueError):
+            candidates = []
+        parents[table_name] = next((parent for parent in candidates if parent in table_names), None)
+    return parents
+
+
+def sample_table_batch(model_path, table_name, num_rows, seed, sample_children=False) -> dict:
+    """
+    Samples `num_rows` rows of one table, and with `sample_children` the child rows
+    linked to them. Runs in a compute worker, which unpickles the model on its first batch
+    and keeps it for the following ones; the global RNGs it seeds are the worker's, never
+    the API process's.
+
+    Returns:
+        dict: {table_name: DataFrame} for the table and any sampled children.
+    """
+    model = load_cached(model_path, load_pickle)
+    seed_everything(seed)
+    sampled = model.sample(table_name, num_rows=num_rows, sample_children=sample_children)
+    return sampled if isinstance(sampled, dict) else {table_name: sampled}
+
 
 class SyntheticDataGeneratorRCTGAN:
-    def __init__(self):
+    def __init__(self, model_path=RCTGAN_MODEL_PATH):
         logging.info('          - initialising the SyntheticDataGeneratorRCTGAN class object')
-        self.TRAINED_MODEL_PATH  = "../models/model_rctgan_tuned.p"
+        self.TRAINED_MODEL_PATH  = model_path
         self.SYNTHETIC_DATA_PATH = "../models/synthetic_data_gh.pkl"
         self.REAL_DATA_PATH = "../datasets/"
         self.REPORTS_PATH = "../outputs/using_gan/"
         self.ACCOUNT_DETAILS_SYN_PATH = '../outputs/using_gan/account_details/account_details_syn.csv'
         self.ACCOUNT_FIN_INFO_SYN_PATH = '../outputs/using_gan/account_fin_info/account_fin_info_syn.csv'
-    
+
 
     def load_model(self):
-        with open(self.TRAINED_MODEL_PATH, "rb") as f:
-            model = pickle.load(f)
-        return model
-    
+        return load_cached(os.path.abspath(self.TRAINED_MODEL_PATH), load_pickle)
+
 
     def load_csv_from_folder(self, folder_path):
         data_dict = {}
@@ -28,36 +111,90 @@ class SyntheticDataGeneratorRCTGAN:
                 for filename in os.listdir(folder_path):
                     if filename.endswith(".csv"):
                         file_path = os.path.join(folder_path, filename)
-                        data_dict[filename.replace(".csv", "")] = pd.read_csv(file_path)
+                        data_dict[filename.replace(".csv", "")] = load_cached(file_path, pd.read_csv)
         else:
             logging.error('             - folder does not exists')
         return data_dict
 
-    
+
     def generate_synthetic_data(self):
         real_data = self.load_csv_from_folder(self.REAL_DATA_PATH)
 
         synthetic_data = {}
-        synthetic_data['account_details'] = pd.read_csv(self.ACCOUNT_DETAILS_SYN_PATH)
-        synthetic_data['account_fin_info'] = pd.read_csv(self.ACCOUNT_FIN_INFO_SYN_PATH)
+        synthetic_data['account_details'] = load_cached(self.ACCOUNT_DETAILS_SYN_PATH, pd.read_csv)
+        synthetic_data['account_fin_info'] = load_cached(self.ACCOUNT_FIN_INFO_SYN_PATH, pd.read_csv)
 
         synthetic_data_reports = self.evaluate_synthetic_data(real_data, synthetic_data)
         return synthetic_data, synthetic_data_reports
-        
+
+
+    def sample(self, num_rows, table_names=None, batch_rows=RCTGAN_SAMPLE_BATCH_ROWS, seed=None):
+        """
+        Samples new rows from the trained model on demand.
+
+        Each table is sampled in batches of `batch_rows`, every batch with its own seed drawn
+        from `seed`, so the output is reproducible for a given seed. The model seeds the
+        global random, NumPy and torch RNGs, so every batch runs in the compute process
+        pool, where each worker loads the model once, and the RNGs of this process are
+        left alone.
+
+        A table whose parent in the model metadata is also requested (account_fin_info
+        under account_details) is sampled together with its parent, so its foreign keys
+        match the sampled parent rows. Its row count then follows from the parents and its
+        own `num_rows` is ignored.
+
+        Args:
+            num_rows (int | dict): Rows per table, or a {table_name: rows} mapping.
+            table_names (list): Tables to sample when `num_rows` is an int, default RCTGAN_TABLES.
+            batch_rows (int): Rows per sampling call.
+            seed (int): Base seed, None for a random one.
+
+        Returns:
+            dict: {table_name: DataFrame}
+        """
+        if not isinstance(num_rows, dict):
+            table_names = table_names or RCTGAN_TABLES
+            num_rows = {table_name: num_rows for table_name in table_names}
+
+        model_path = os.path.abspath(self.TRAINED_MODEL_PATH)
+        pool = get_process_pool()
+        parents = pool.submit(table_parents, model_path, list(num_rows)).result()
+        children = [table_name for table_name, parent in parents.items() if parent is not None]
+        if children:
+            logging.info(f'          - sampling {children} with their parent tables')
+        batches = [(table_name, min(batch_rows, rows - start))
+                   for table_name, rows in num_rows.items() if parents[table_name] is None
+                   for start in range(0, rows, batch_rows)]
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(len(batches))]
+
+        logging.info(f'          - sampling {len(batches)} batches in the compute process pool')
+        futures = [pool.submit(sample_table_batch, model_path, table_name, rows, batch_seed,
+                               table_name in parents.values())
+                   for (table_name, rows), batch_seed in zip(batches, seeds)]
+        results = [future.result() for future in futures]
+
+        sampled = {table_name: [] for table_name in num_rows}
+        for result in results:
+            for table_name, frame in result.items():
+                if table_name in sampled:
+                    sampled[table_name].append(frame)
+        return {table_name: pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+                for table_name, frames in sampled.items()}
+
 
     def evaluate_synthetic_data(self, real_data, synthetic_data):
         output = {}
-        for key in real_data.keys():
+        for key in synthetic_data.keys():
             data = {}
-            report = Image.open(f'{self.REPORTS_PATH}{key}/{key}.png')
-            data['real_data'] = real_data[key]
+            report = load_cached(f'{self.REPORTS_PATH}{key}/{key}.png', load_image)
+            data['real_data'] = real_data.get(key)
             data['synthetic_data'] = synthetic_data[key]
             data['reports'] = report
             output[key] = data
-        print(output)
+        logging.info(f'          - evaluated synthetic tables: {list(output)}')
         return output
 
 
 if __name__ == '__main__':
     syn_data_gen_gan = SyntheticDataGeneratorRCTGAN()
-    output = syn_data_gen_gan.generate_synthetic_data()
\ No newline at end of file
+    output = syn_data_gen_gan.generate_synthetic_data()
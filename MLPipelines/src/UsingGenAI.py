@@ -1,3 +1,8 @@
+from dotenv import load_dotenv
+
+# Load environment variables before the utils modules read their settings at import
+load_dotenv()
+
 import pandas as pd
 from utils.data_generator import SyntheticDataGenerator
 from utils.drift_detector import DriftDetector
@@ -5,14 +10,12 @@ from utils.data_analyzer import DataAnalyzer
 from utils.data_generator_using_meta_info import DataGenerationUsingMetaInfo
 import openai
 import os
-from dotenv import load_dotenv
 import logging
 
 
 class SyntheticDataGeneratorUsingGenAI():
     def __init__(self):
         logging.info('          - initialising the object of SyntheticDataGeneratorUsingGenAI() ')
-        load_dotenv()
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
         logging.info('          - OPENAI key set successfully')
         print('OPENAI key set successfully')
@@ -33,8 +36,8 @@ class SyntheticDataGeneratorUsingGenAI():
         drift_report_payload = self.drift_detector.detect_tabular_drift(real_data, synthetic_data)
         structured_synthetic_data_payload = {}
         structured_synthetic_data_payload['synthetic_data'] = synthetic_data
-        structured_synthetic_data_payload['structured_data_insights'] = synthtic_data_insights_payload['structured_data_insights']
-        structured_synthetic_data_payload['drift_report'] = drift_report_payload['report_html']
+        structured_synthetic_data_payload['structured_data_insights'] = synthtic_data_insights_payload
+        structured_synthetic_data_payload['drift_report'] = drift_report_payload
         return structured_synthetic_data_payload
     
 
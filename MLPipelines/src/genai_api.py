@@ -1,71 +1,240 @@
+import time
+_import_started = time.perf_counter()
+
+from dotenv import load_dotenv
+
+# Load environment variables first: the utils modules read their settings when imported,
+# and the compute worker processes inherit this environment
+load_dotenv()
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
+from typing import Optional, Union, List
 import pandas as pd
 from utils.data_generator import SyntheticDataGenerator
 from utils.drift_detector import DriftDetector
 from utils.data_analyzer import DataAnalyzer
 from utils.data_generator_using_meta_info import DataGenerationUsingMetaInfo
+from utils.llm_cache import get_default_cache
+from utils.openai_client import get_shared_client
+from utils.report_store import get_report_store
+from utils.executors import run_in_thread, shutdown_pools, get_process_pool, COMPUTE_PROCESS_WORKERS
+from utils.job_queue import JobQueue
+from utils.startup import warm_imports, warm_compute_worker, import_time_report
+import threading
+import asyncio
 import os
-from dotenv import load_dotenv
 import logging
+import json
 from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import Request, Header
+from fastapi.responses import StreamingResponse, Response
+from fastapi.responses import JSONResponse
+from utils.ingestion import read_table, read_dataset, InputTooLargeError, MAX_UPLOAD_BYTES
+import gzip
+from utils.response_formats import negotiate_format, encode_table, dumps_json
 
 
 app = FastAPI(title="GenAI Synthetic Data API", 
                   description="API for generating and analyzing synthetic data using OpenAI", 
                   version="1.0")
 
-# Load environment variables
-load_dotenv()
-
 class SyntheticDataGeneratorUsingGenAI():
     def __init__(self):
         logging.info('          - initializing SyntheticDataGeneratorUsingGenAI() object')
         self.OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
         logging.info('          - OPENAI key set successfully')
-        self.data_generator = SyntheticDataGenerator(api_key=self.OPENAI_API_KEY)
-        self.data_analyzer = DataAnalyzer(api_key=self.OPENAI_API_KEY)
-        self.drift_detector = DriftDetector()
-        self.data_generator_using_meta_info = DataGenerationUsingMetaInfo(api_key=self.OPENAI_API_KEY)
-
-    def get_structured_data_insights(self, real_data):
-        return self.data_analyzer.show_plots_and_insights(real_data)
-
-    def generate_synthetic_data_structured(self, real_data, num_rows):
-        synthetic_data = self.data_generator.generate_tabular_data(real_data, num_rows)
-        synthtic_data_insights_payload = self.data_analyzer.show_plots_and_insights(synthetic_data)
-        drift_report_payload = self.drift_detector.detect_tabular_drift(real_data, synthetic_data)
+        self.llm_cache = get_default_cache()
+        self.data_generator = SyntheticDataGenerator(api_key=self.OPENAI_API_KEY, cache=self.llm_cache)
+        self.data_analyzer = DataAnalyzer(api_key=self.OPENAI_API_KEY, cache=self.llm_cache)
+        self.report_store = get_report_store()
+        self.drift_detector = DriftDetector(report_store=self.report_store, use_process_pool=True)
+        self.data_generator_using_meta_info = DataGenerationUsingMetaInfo(api_key=self.OPENAI_API_KEY, cache=self.llm_cache)
+
+    def get_structured_data_insights(self, real_data, insight_mode="concurrent", plot_mode="aggregated"):
+        return self.data_analyzer.show_plots_and_insights(real_data, insight_mode=insight_mode, plot_mode=plot_mode)
+
+    def generate_synthetic_data_structured(self, real_data, num_rows, batch_size=None, engine="llm",
+                                           include_html_report=False, stop_on_drift=False, insight_mode="concurrent",
+                                           plot_mode="aggregated", progress_callback=None, constraints=None,
+                                           key_columns=None, deduplicate=False, use_cache=False):
+        progress_callback = progress_callback or (lambda *args: None)
+        drift_tracker = self.drift_detector.create_drift_tracker(real_data) if stop_on_drift else None
+        synthetic_data = self.data_generator.generate_tabular_data(real_data, num_rows, batch_size=batch_size, engine=engine,
+                                                                   drift_tracker=drift_tracker,
+                                                                   progress_callback=progress_callback,
+                                                                   constraints=constraints, key_columns=key_columns,
+                                                                   deduplicate=deduplicate, use_cache=use_cache)
+        progress_callback(len(synthetic_data), num_rows, "insights")
+        synthtic_data_insights_payload = self.data_analyzer.show_plots_and_insights(synthetic_data,
+                                                                                   insight_mode=insight_mode,
+                                                                                   plot_mode=plot_mode)
+        progress_callback(len(synthetic_data), num_rows, "drift")
+        drift_report_payload = self.drift_detector.detect_tabular_drift(real_data, synthetic_data,
+                                                                        include_html=include_html_report)
         return {
             'synthetic_data': synthetic_data,
-            'structured_data_insights': synthtic_data_insights_payload['structured_data_insights'],
-            'drift_report': drift_report_payload['report_html']
+            'structured_data_insights': synthtic_data_insights_payload,
+            'drift_report': drift_report_payload
         }
 
-    def generate_synthetic_data_unstructured(self, real_data, column_name, num_rows):
+    def generate_synthetic_data_unstructured(self, real_data, column_name, num_rows, projection="tsne",
+                                             mmd_method="auto", pca_components=None, progress_callback=None,
+                                             use_cache=False):
+        progress_callback = progress_callback or (lambda *args: None)
         reference_texts = real_data[column_name].dropna().tolist()
-        synthetic_data = self.data_generator.generate_textual_data("\n".join(reference_texts), num_rows)
-        drift_reports_payload = self.drift_detector.textual_data_drift_reports(real_data, synthetic_data, column_name)
+        progress_callback(0, num_rows, "generating")
+        synthetic_data = self.data_generator.generate_textual_data("\n".join(reference_texts), column_name, num_rows,
+                                                                   use_cache=use_cache)
+        progress_callback(len(synthetic_data), num_rows, "drift")
+        drift_reports_payload = self.drift_detector.textual_data_drift_reports(real_data, synthetic_data, column_name,
+                                                                               projection=projection,
+                                                                               mmd_method=mmd_method,
+                                                                               pca_components=pca_components)
         return {
             'synthetic_data': synthetic_data,
             'drift_report': drift_reports_payload
         }
 
+    def generate_synthetic_data_relational(self, parent_data, child_data, key, num_parents, cardinality=None,
+                                           batch_size=None, engine="llm", random_state=None, constraints=None):
+        return self.data_generator.generate_relational_data(parent_data, child_data, key, num_parents,
+                                                            cardinality=cardinality, batch_size=batch_size,
+                                                            engine=engine, random_state=random_state,
+                                                            constraints=constraints)
+
     def get_schema_from_users_prompt(self, user_prompt):
         return self.data_generator_using_meta_info.get_metadata_from_llm(user_prompt)
 
-    def generate_synthetic_data_from_metadata(self, schema, schema_data, num_rows):
-        synthetic_data = self.data_generator_using_meta_info.generate_synthetic_data_llm(schema, schema_data, num_rows)
+    def generate_synthetic_data_from_metadata(self, schema, schema_data, num_rows, constraints=None, key_columns=None,
+                                              deduplicate=True, use_cache=False):
+        synthetic_data = self.data_generator_using_meta_info.generate_synthetic_data_llm(schema, schema_data, num_rows,
+                                                                                        constraints=constraints,
+                                                                                        key_columns=key_columns,
+                                                                                        deduplicate=deduplicate,
+                                                                                        use_cache=use_cache)
         return {'synthetic_data': synthetic_data}
 
-syn_data_gen = SyntheticDataGeneratorUsingGenAI()
+    def stream_synthetic_data_structured(self, real_data, num_rows, chunk_rows=100, stop_on_drift=False):
+        chunks = self.data_generator.stream_tabular_data(real_data, num_rows, chunk_rows=chunk_rows)
+        if stop_on_drift:
+            return self.stop_stream_on_drift(chunks, self.drift_detector.create_drift_tracker(real_data))
+        return chunks
+
+    def stop_stream_on_drift(self, chunks, drift_tracker):
+        """
+        Passes chunks through until the tracker reports drift, then yields the drift summary
+        as a final dict and closes the underlying completion stream.
+        """
+        for chunk in chunks:
+            yield chunk
+            if drift_tracker.update(chunk).drift_detected():
+                chunks.close()
+                yield {'event': 'drift_detected', 'drift_summary': drift_tracker.report()}
+                return
+
+    def stream_synthetic_data_from_metadata(self, schema, schema_data, num_rows, chunk_rows=100):
+        return self.data_generator_using_meta_info.stream_synthetic_data_llm(schema, schema_data, num_rows, chunk_rows=chunk_rows)
+
+_syn_data_gen = None
+_job_queue = None
+_lazy_init_lock = threading.Lock()
+
+def get_syn_data_gen() -> SyntheticDataGeneratorUsingGenAI:
+    """
+    Builds the generator on first use instead of at import, so workers start fast.
+    """
+    global _syn_data_gen
+    with _lazy_init_lock:
+        if _syn_data_gen is None:
+            _syn_data_gen = SyntheticDataGeneratorUsingGenAI()
+    return _syn_data_gen
+
+def get_job_queue() -> JobQueue:
+    global _job_queue
+    with _lazy_init_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+    return _job_queue
+
+
+def stream_ndjson(chunks):
+    """
+    Serializes DataFrame chunks as newline-delimited JSON records while they are generated.
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, dict):
+                yield json.dumps(chunk) + "\n"
+                continue
+            yield chunk.to_json(orient='records', lines=True, date_format='iso') + "\n"
+    except Exception as e:
+        logging.error(f'          - streaming generation failed: {e}')
+        yield json.dumps({'error': str(e)}) + "\n"
+
+async def build_response(payload, accept: str = None, output_format: str = None):
+    """
+    Returns the generation payload in the negotiated format: `output_format` (the `format`
+    query parameter) when given, otherwise the Accept header. JSON returns the whole payload,
+    the tabular formats (arrow, arrow_file, parquet, csv, ndjson) stream only the synthetic data table.
+    """
+    try:
+        output_format = negotiate_format(accept, output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    if output_format == "json":
+        return Response(content=await run_in_thread(dumps_json, payload), media_type="application/json")
+    if isinstance(payload, dict) and 'synthetic_data' not in payload:
+        raise HTTPException(status_code=406, detail="This result has several tables and is only available as JSON")
+    synthetic_data = payload['synthetic_data'] if isinstance(payload, dict) else payload
+    if not isinstance(synthetic_data, pd.DataFrame):
+        synthetic_data = pd.DataFrame(synthetic_data)
+    media_type, chunks = encode_table(synthetic_data, output_format)
+    return StreamingResponse(chunks, media_type=media_type, headers={"X-Row-Count": str(len(synthetic_data))})
 
 class DataRequest(BaseModel):
     csv_file: UploadFile
 
+class StructuredDataRequest(BaseModel):
+    csv_path: str
+    num_rows: int
+    batch_size: Optional[int] = None
+    engine: str = "llm"
+    include_html_report: bool = False
+    stop_on_drift: bool = False
+    insight_mode: str = "concurrent"
+    plot_mode: str = "aggregated"
+    dtypes: Optional[dict] = None
+    # "infer" to enforce the rules every reference row satisfies, or a list of constraint specs
+    constraints: Optional[Union[str, List[dict]]] = None
+    # Columns that must be unique on their own, and whether to drop repeated rows
+    key_columns: Optional[List[str]] = None
+    deduplicate: bool = False
+    # Replay cached LLM responses for an identical request instead of generating new rows
+    use_cache: bool = False
+
 class UnstructuredDataRequest(BaseModel):
     csv_path: str
     column_name: str
     num_rows: int
+    projection: str = "tsne"
+    mmd_method: str = "auto"
+    pca_components: Optional[int] = None
+    dtypes: Optional[dict] = None
+    use_cache: bool = False
+
+class RelationalDataRequest(BaseModel):
+    parent_csv_path: str
+    child_csv_path: str
+    key: str = "card_number"
+    num_parents: int
+    # Children per parent: an int, [min, max], or null to follow the reference tables
+    cardinality: Optional[Union[int, List[int]]] = None
+    batch_size: Optional[int] = None
+    engine: str = "llm"
+    random_state: Optional[int] = None
+    dtypes: Optional[dict] = None
+    constraints: Optional[Union[str, List[dict]]] = None
 
 class MetadataRequest(BaseModel):
     user_prompt: str
@@ -74,52 +243,262 @@ class GenerateFromMetadataRequest(BaseModel):
     schema: dict
     schema_data: dict
     num_rows: int
+    constraints: Optional[List[dict]] = None
+    key_columns: Optional[List[str]] = None
+    deduplicate: bool = True
+    use_cache: bool = False
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    """
+    Rejects bodies declared larger than MAX_UPLOAD_MB before they are spooled to disk.
+    Bodies without a Content-Length are checked once received.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        return JSONResponse(status_code=413,
+                            content={"detail": f"Request body exceeds {MAX_UPLOAD_BYTES / 2**20:.0f} MB"})
+    return await call_next(request)
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the GenAI Synthetic Data API"}
 
+@app.on_event("shutdown")
+def shutdown():
+    shutdown_pools()
+
+# Blocking work (OpenAI calls, embedding, t-SNE, drift tests) never runs on the event loop:
+# handlers await it on the shared I/O thread pool, and the drift detector hands CPU-bound
+# stages on to the compute process pool.
+
 @app.post("/get_structured_data_insights/")
-async def get_structured_data_insights(csv_file: UploadFile = File(...)):
+async def get_structured_data_insights(csv_file: UploadFile = File(...), insight_mode: str = "concurrent",
+                                       plot_mode: str = "aggregated"):
     try:
-        # Read uploaded CSV file content
-        contents = await csv_file.read()
-        real_data = pd.read_csv(StringIO(contents.decode("utf-8")))
+        # Parse the upload straight from the temporary file Starlette spooled it to
+        real_data = await run_in_thread(read_table, csv_file.file, csv_file.filename)
         
         # Generate insights
-        return syn_data_gen.get_structured_data_insights(real_data)
+        return await run_in_thread(get_syn_data_gen().get_structured_data_insights, real_data, insight_mode,
+                                   plot_mode)
+    except InputTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def run_structured_generation(request: StructuredDataRequest, progress_callback=None):
+    real_data = read_dataset(request.csv_path, dtypes=request.dtypes)
+    return get_syn_data_gen().generate_synthetic_data_structured(real_data, request.num_rows,
+                                                                 request.batch_size, request.engine,
+                                                                 request.include_html_report,
+                                                                 request.stop_on_drift,
+                                                                 insight_mode=request.insight_mode,
+                                                                 plot_mode=request.plot_mode,
+                                                                 progress_callback=progress_callback,
+                                                                 constraints=request.constraints,
+                                                                 key_columns=request.key_columns,
+                                                                 deduplicate=request.deduplicate,
+                                                                 use_cache=request.use_cache)
+
+def run_unstructured_generation(request: UnstructuredDataRequest, progress_callback=None):
+    real_data = read_dataset(request.csv_path, dtypes=request.dtypes)
+    return get_syn_data_gen().generate_synthetic_data_unstructured(real_data, request.column_name, request.num_rows,
+                                                                   request.projection, request.mmd_method,
+                                                                   request.pca_components,
+                                                                   progress_callback=progress_callback,
+                                                                   use_cache=request.use_cache)
+
 @app.post("/generate_synthetic_data_structured/")
-async def generate_synthetic_data_structured(request: UnstructuredDataRequest):
+async def generate_synthetic_data_structured(request: StructuredDataRequest, format: Optional[str] = None,
+                                              accept: Optional[str] = Header(None)):
     try:
-        real_data = pd.read_csv(request.csv_path)
-        return syn_data_gen.generate_synthetic_data_structured(real_data, request.num_rows)
+        payload = await run_in_thread(run_structured_generation, request)
+    except InputTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return await build_response(payload, accept, format)
 
 @app.post("/generate_synthetic_data_unstructured/")
-async def generate_synthetic_data_unstructured(request: UnstructuredDataRequest):
+async def generate_synthetic_data_unstructured(request: UnstructuredDataRequest, format: Optional[str] = None,
+                                                accept: Optional[str] = Header(None)):
     try:
-        real_data = pd.read_csv(request.csv_path)
-        return syn_data_gen.generate_synthetic_data_unstructured(real_data, request.column_name, request.num_rows)
+        payload = await run_in_thread(run_unstructured_generation, request)
+    except InputTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return await build_response(payload, accept, format)
+
+def run_relational_generation(request: RelationalDataRequest, progress_callback=None):
+    parent_data = read_dataset(request.parent_csv_path, dtypes=request.dtypes)
+    child_data = read_dataset(request.child_csv_path, dtypes=request.dtypes)
+    cardinality = tuple(request.cardinality) if isinstance(request.cardinality, list) else request.cardinality
+    return get_syn_data_gen().generate_synthetic_data_relational(parent_data, child_data, request.key,
+                                                                 request.num_parents, cardinality=cardinality,
+                                                                 batch_size=request.batch_size, engine=request.engine,
+                                                                 random_state=request.random_state,
+                                                                 constraints=request.constraints)
+
+@app.post("/generate_synthetic_data_relational/")
+async def generate_synthetic_data_relational(request: RelationalDataRequest):
+    try:
+        payload = await run_in_thread(run_relational_generation, request)
+    except InputTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=await run_in_thread(dumps_json, payload), media_type="application/json")
 
 @app.post("/get_schema_from_users_prompt/")
 async def get_schema_from_users_prompt(request: MetadataRequest):
     try:
-        return syn_data_gen.get_schema_from_users_prompt(request.user_prompt)
+        return await run_in_thread(get_syn_data_gen().get_schema_from_users_prompt, request.user_prompt)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/generate_synthetic_data_from_metadata/")
-async def generate_synthetic_data_from_metadata(request: GenerateFromMetadataRequest):
+async def generate_synthetic_data_from_metadata(request: GenerateFromMetadataRequest, format: Optional[str] = None,
+                                                accept: Optional[str] = Header(None)):
+    try:
+        payload = await run_in_thread(get_syn_data_gen().generate_synthetic_data_from_metadata,
+                                      request.schema, request.schema_data, request.num_rows, request.constraints,
+                                      request.key_columns, request.deduplicate, request.use_cache)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return await build_response(payload, accept, format)
+
+@app.post("/generate_synthetic_data_structured/stream/")
+async def stream_synthetic_data_structured(request: StructuredDataRequest):
+    try:
+        real_data = await run_in_thread(read_dataset, request.csv_path, request.dtypes)
+        chunks = get_syn_data_gen().stream_synthetic_data_structured(real_data, request.num_rows,
+                                                                     stop_on_drift=request.stop_on_drift)
+        # Starlette iterates synchronous generators in its thread pool
+        return StreamingResponse(stream_ndjson(chunks), media_type="application/x-ndjson")
+    except InputTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/generate_synthetic_data_from_metadata/stream/")
+async def stream_synthetic_data_from_metadata(request: GenerateFromMetadataRequest):
+    try:
+        chunks = get_syn_data_gen().stream_synthetic_data_from_metadata(request.schema, request.schema_data, request.num_rows)
+        return StreamingResponse(stream_ndjson(chunks), media_type="application/x-ndjson")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/jobs/generate_synthetic_data_structured/", status_code=202)
+async def submit_structured_generation_job(request: StructuredDataRequest):
+    """
+    Queues a structured generation and returns its job ID immediately. Poll `/jobs/{job_id}`
+    for progress and fetch the payload from `/jobs/{job_id}/result` once it has succeeded.
+    """
+    return get_job_queue().submit("generate_synthetic_data_structured", run_structured_generation, request)
+
+@app.post("/jobs/generate_synthetic_data_unstructured/", status_code=202)
+async def submit_unstructured_generation_job(request: UnstructuredDataRequest):
+    return get_job_queue().submit("generate_synthetic_data_unstructured", run_unstructured_generation, request)
+
+@app.post("/jobs/generate_synthetic_data_relational/", status_code=202)
+async def submit_relational_generation_job(request: RelationalDataRequest):
+    return get_job_queue().submit("generate_synthetic_data_relational", run_relational_generation, request)
+
+@app.get("/jobs/")
+async def job_queue_stats():
+    return get_job_queue().stats()
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    try:
+        return get_job_queue().status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, format: Optional[str] = None, accept: Optional[str] = Header(None)):
+    try:
+        job = get_job_queue().get(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if job.error is not None:
+        raise HTTPException(status_code=500, detail=job.error)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {job.status}")
+    return await build_response(job.result, accept, format)
+
+@app.get("/reports/{report_id}")
+async def get_report(report_id: str, request: Request):
+    """
+    Serves a rendered report artifact, rendering it on first request. Reports are content
+    addressed, so the ID doubles as a strong ETag and responses are cacheable indefinitely.
+    """
+    etag = f'"{report_id}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    report_store = get_syn_data_gen().report_store
+    if not await run_in_thread(report_store.has, report_id):
+        raise HTTPException(status_code=404, detail=f"Report '{report_id}' not found")
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
     try:
-        return syn_data_gen.generate_synthetic_data_from_metadata(request.schema, request.schema_data, request.num_rows)
+        content, media_type = await run_in_thread(report_store.get, report_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Report '{report_id}' not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        content = gzip.decompress(content)
+    headers["Vary"] = "Accept-Encoding"
+    return Response(content=content, media_type=media_type, headers=headers)
+
+@app.get("/openai_client_stats/")
+async def openai_client_stats():
+    return get_shared_client(get_syn_data_gen().OPENAI_API_KEY).stats
+
+@app.get("/llm_cache_stats/")
+async def llm_cache_stats():
+    return await run_in_thread(get_syn_data_gen().llm_cache.stats)
+
+@app.post("/warmup")
+async def warmup(load_embedding_model: bool = False):
+    """
+    Loads the lazily imported subsystems ahead of the first real request: the generator
+    objects, the heavy libraries in this process and in every compute worker process,
+    and optionally the embedding model in the workers. Returns the seconds spent per step.
+    """
+    timings = {}
+    started = time.perf_counter()
+    await run_in_thread(get_syn_data_gen)
+    timings["api_objects"] = round(time.perf_counter() - started, 3)
+    timings["imports"] = await run_in_thread(warm_imports)
+
+    started = time.perf_counter()
+    pool = get_process_pool()
+    futures = [pool.submit(warm_compute_worker, load_embedding_model) for _ in range(COMPUTE_PROCESS_WORKERS)]
+    try:
+        timings["compute_workers"] = [await asyncio.wrap_future(future) for future in futures]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Warming the compute workers failed: {e}")
+    timings["compute_pool"] = round(time.perf_counter() - started, 3)
+    return timings
+
+@app.get("/startup_report")
+async def startup_report(top: int = 30, refresh: bool = False):
+    """
+    Time this API module took to import in the running process, plus a fresh-interpreter
+    `-X importtime` breakdown of the import cost per module and per package, measured once
+    and cached until `refresh`.
+    """
+    report = await run_in_thread(import_time_report, "src.genai_api", top, refresh)
+    report["api_import_seconds"] = round(API_IMPORT_SECONDS, 3)
+    return report
+
+API_IMPORT_SECONDS = time.perf_counter() - _import_started
+
 # Run the API using: uvicorn src.genai_api:app --reload
 # /Users/apple/Documents/Priyesh/VirtualEnvs/Synthetic_Data_Generation_Venvs/syn_data_gen_genai_venv/bin/python
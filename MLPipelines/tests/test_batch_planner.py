@@ -0,0 +1,27 @@
+from utils.batch_planner import drop_truncated_rows, split_csv_records
+
+
+def test_split_csv_records_keeps_quoted_newlines_in_one_record():
+    records = split_csv_records('a,b\n1,"x\ny"\n3,4')
+    assert [fields for _, fields in records] == [["a", "b"], ["1", "x\ny"], ["3", "4"]]
+    assert "".join(text for text, _ in records) == 'a,b\n1,"x\ny"\n3,4'
+
+
+def test_complete_response_with_quoted_newline_is_unchanged():
+    text = 'a,b\n1,"x\ny"\n3,4'
+    assert drop_truncated_rows(text, complete=True) == (text, 0)
+
+
+def test_truncated_response_drops_only_the_last_record():
+    cleaned, dropped = drop_truncated_rows('a,b\n1,"x\ny"\n3,4', complete=False)
+    assert (cleaned, dropped) == ('a,b\n1,"x\ny"\n', 1)
+
+
+def test_record_cut_inside_a_quote_is_dropped():
+    cleaned, dropped = drop_truncated_rows('a,b\n1,2\n3,"unterminated', complete=True)
+    assert (cleaned, dropped) == ("a,b\n1,2\n", 1)
+
+
+def test_records_with_the_wrong_field_count_are_dropped():
+    cleaned, dropped = drop_truncated_rows("a,b\n1,2,3\n4,5\n\n6", num_columns=2)
+    assert (cleaned, dropped) == ("a,b\n4,5\n\n", 2)
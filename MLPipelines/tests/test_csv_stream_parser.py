@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from utils.csv_stream_parser import iter_completion_text, iter_csv_chunks
+
+
+def completion_stream(pieces, finish_reason):
+    for i, piece in enumerate(pieces):
+        choice = SimpleNamespace(delta=SimpleNamespace(content=piece),
+                                 finish_reason=finish_reason if i == len(pieces) - 1 else None)
+        yield SimpleNamespace(choices=[choice])
+
+
+def rows(chunks):
+    return [row for chunk in chunks for row in chunk.to_dict("records")]
+
+
+def test_short_final_row_is_dropped_not_padded():
+    assert rows(iter_csv_chunks(iter(["a,b,c\n1,2,3\n4,5"]))) == [{"a": 1, "b": 2, "c": 3}]
+
+
+def test_final_row_of_a_length_truncated_stream_is_dropped():
+    text = iter_completion_text(completion_stream(["a,b\n1,2\n3,", "4"], "length"))
+    assert rows(iter_csv_chunks(text)) == [{"a": 1, "b": 2}]
+    assert text.finish_reason == "length"
+
+
+def test_final_row_of_a_finished_stream_is_kept():
+    text = iter_completion_text(completion_stream(["a,b\n1,2\n3,", "4"], "stop"))
+    assert rows(iter_csv_chunks(text)) == [{"a": 1, "b": 2}, {"a": 3, "b": 4}]
+
+
+def test_quoted_newlines_span_pieces():
+    chunks = iter_csv_chunks(iter(['a,b\n1,"x\n', 'y"\n2,z\n']), chunk_rows=1)
+    assert rows(chunks) == [{"a": 1, "b": "x\ny"}, {"a": 2, "b": "z"}]
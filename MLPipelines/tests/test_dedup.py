@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.dedup import BloomFilter, HashSet, UniquenessTracker, canonical_text, hash_columns
+
+
+def normalised(value) -> int:
+    # HashSet stores 0 as 1, since 0 marks an empty slot
+    return 1 if value == 0 else int(value)
+
+
+def check_against_set(batches, capacity=16):
+    hash_set = HashSet(capacity)
+    reference = set()
+    for batch in batches:
+        batch = np.asarray(batch, dtype=np.uint64)
+        assert hash_set.contains(batch).tolist() == [normalised(value) in reference for value in batch]
+        hash_set.add(batch)
+        reference |= {normalised(value) for value in batch}
+        assert len(hash_set) == len(reference)
+    return hash_set
+
+
+def test_hash_set_matches_python_set_on_random_hashes():
+    rng = np.random.default_rng(0)
+    batches = [rng.integers(0, 2**63, size=size, dtype=np.uint64) for size in (1, 50, 1000, 5000)]
+    # Repeat values inside and across batches
+    batches.append(np.concatenate([batches[2][:300], batches[3][:300], batches[3][:300]]))
+    check_against_set(batches)
+
+
+def test_hash_set_matches_python_set_on_colliding_hashes():
+    rng = np.random.default_rng(1)
+    # Same low bits, so every hash starts probing from the same few slots
+    colliding = (rng.integers(1, 2**40, size=2000, dtype=np.uint64) << np.uint64(20)) | np.uint64(5)
+    batches = [colliding[:500], colliding[250:1500], colliding, np.array([0, 1, 5], dtype=np.uint64)]
+    hash_set = check_against_set(batches)
+    absent = (rng.integers(2**41, 2**42, size=500, dtype=np.uint64) << np.uint64(20)) | np.uint64(5)
+    assert not hash_set.contains(absent).any()
+
+
+def test_hash_set_add_distinct_within_one_batch():
+    hash_set = HashSet(16)
+    values = np.arange(1, 200, dtype=np.uint64) * np.uint64(16)
+    hash_set.add(values, distinct=True)
+    assert len(hash_set) == len(values)
+    assert hash_set.contains(values).all()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    rng = np.random.default_rng(2)
+    values = rng.integers(0, 2**63, size=10000, dtype=np.uint64)
+    bloom = BloomFilter(expected_items=len(values), false_positive_rate=0.01)
+    bloom.add(values)
+    assert bloom.contains(values).all()
+    others = rng.integers(0, 2**63, size=10000, dtype=np.uint64)
+    assert bloom.contains(others).mean() < 0.05
+
+
+@pytest.mark.parametrize("values", [
+    [7, 7.0, "7", "7.0", "007", " 7 ", "+7"],
+    [-3, -3.0, "-3", "-003.00"],
+    [4532015112830366123, "4532015112830366123"],
+    [7.5, "7.5", "7.50"],
+    [None, np.nan, pd.NA, pd.NaT],
+])
+def test_canonical_text_equivalences(values):
+    text = canonical_text(pd.Series(values, dtype=object))
+    assert text.nunique() == 1
+
+
+def test_canonical_text_is_dtype_independent():
+    assert canonical_text(pd.Series([7, None], dtype="Int64")).tolist() == \
+        canonical_text(pd.Series([7.0, np.nan])).tolist() == \
+        canonical_text(pd.Series(["7", None], dtype="string")).tolist()
+
+
+def test_canonical_text_keeps_distinct_values_apart():
+    text = canonical_text(pd.Series([7, 70, "7a", 7.5, True, "x", None], dtype=object))
+    assert text.is_unique
+
+
+def test_hash_columns_ignores_parsed_dtype():
+    as_ints = pd.DataFrame({"id": [7, 8], "name": ["a", "b"]})
+    as_floats = pd.DataFrame({"id": [7.0, 8.0], "name": ["a", "b"]})
+    as_text = pd.DataFrame({"id": ["7", "8"], "name": ["a", "b"]})
+    assert (hash_columns(as_ints) == hash_columns(as_floats)).all()
+    assert (hash_columns(as_ints) == hash_columns(as_text)).all()
+
+
+def test_uniqueness_tracker_rejects_keys_across_dtypes():
+    tracker = UniquenessTracker(key_columns=["id"])
+    first = tracker.filter(pd.DataFrame({"id": [7, 8], "value": ["a", "b"]}))
+    second = tracker.filter(pd.DataFrame({"id": [7.0, np.nan, "8", 9], "value": ["c", "d", "e", "f"]}))
+    assert first["id"].tolist() == [7, 8]
+    assert second["value"].tolist() == ["d", "f"]
+    assert tracker.stats()["rejected_rows"] == 2
+
+
+def test_uniqueness_tracker_deduplicates_within_a_batch_and_caps_rows():
+    tracker = UniquenessTracker(key_columns=["id"])
+    batch = pd.DataFrame({"id": [1, 1, 2, 3, 4], "value": ["a", "b", "c", "d", "e"]})
+    kept = tracker.filter(batch, max_rows=2)
+    assert kept["value"].tolist() == ["a", "c"]
+    assert tracker.filter(batch)["value"].tolist() == ["d", "e"]
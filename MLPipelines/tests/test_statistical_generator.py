@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from utils.relational import generate_unique_keys, is_luhn_valid, luhn_check_digits
+from utils.statistical_generator import GaussianCopulaGenerator, string_key_format
+
+
+def test_luhn_check_digits_match_known_card_numbers():
+    assert luhn_check_digits(np.array([7992739871, 453201511283036])).tolist() == [3, 6]
+
+
+def test_generated_keys_are_unique_valid_and_avoid_excluded_keys():
+    rng = np.random.default_rng(0)
+    exclude = generate_unique_keys(1000, 16, rng, luhn=True)
+    keys = generate_unique_keys(100_000, 16, rng, luhn=True, exclude=exclude)
+    assert len(np.unique(keys)) == len(keys)
+    assert is_luhn_valid(keys).all()
+    assert (keys >= 10**15).all() and (keys < 10**16).all()
+    assert not np.isin(keys, exclude).any()
+
+
+def test_generated_keys_fill_a_narrow_range():
+    keys = generate_unique_keys(80, 2, np.random.default_rng(1), exclude=[10, 11])
+    assert len(set(keys.tolist())) == 80
+    assert not {10, 11} & set(keys.tolist())
+
+
+def test_string_key_format():
+    assert string_key_format(pd.Series(["EMP01", "EMP02", "EMP10"])) == ("EMP", 2, 10)
+    assert string_key_format(pd.Series(["EMP01", "EMP01"])) is None
+    assert string_key_format(pd.Series(["B99", "C11"])) is None
+    assert string_key_format(pd.Series(["John Doe", "Jane Smith"])) is None
+
+
+def test_sampled_string_ids_continue_the_reference_numbering():
+    reference = pd.DataFrame({"ID": ["EMP01", "EMP02", "EMP03"], "Age": [28, 34, 41]})
+    generator = GaussianCopulaGenerator(random_state=0).fit(reference)
+    first, second = generator.sample(3), generator.sample(2)
+    assert first["ID"].tolist() == ["EMP04", "EMP05", "EMP06"]
+    assert second["ID"].tolist() == ["EMP07", "EMP08"]
+    assert first.dtypes.equals(reference.dtypes)
+
+
+def test_sampled_card_numbers_are_fresh():
+    reference = pd.DataFrame({"card_number": [4532015112830366, 9966803425076400, 1100554786351499],
+                              "credit_limit": [1000, 5000, 3000]})
+    sampled = GaussianCopulaGenerator(random_state=0).fit(reference).sample(1000)
+    assert sampled["card_number"].is_unique
+    assert not sampled["card_number"].isin(reference["card_number"]).any()
+    assert is_luhn_valid(sampled["card_number"].to_numpy()).all()
@@ -0,0 +1,243 @@
+import csv
+import io
+import logging
+import math
+import os
+import threading
+
+import pandas as pd
+
+# Context window and output cap per model, in tokens
+MODEL_TOKEN_LIMITS = {
+    "gpt-4": {"context": 8192, "max_output": 4096},
+    "gpt-4-turbo": {"context": 128000, "max_output": 4096},
+    "gpt-4o": {"context": 128000, "max_output": 16384},
+    "gpt-4o-mini": {"context": 128000, "max_output": 16384},
+    "gpt-3.5-turbo": {"context": 16385, "max_output": 4096},
+}
+DEFAULT_TOKEN_LIMITS = {"context": 8192, "max_output": 4096}
+# Without tiktoken: CSV is mostly digits and short words, which tokenise at ~3 characters per token
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", 3.0))
+ROW_TOKEN_SAFETY = float(os.getenv("ROW_TOKEN_SAFETY", 1.2))
+# Markers, header line and the odd remark around the CSV block
+OUTPUT_OVERHEAD_TOKENS = 64
+MESSAGE_OVERHEAD_TOKENS = 8
+CALIBRATION_WEIGHT = 0.3
+# Typical rendered width, in tokens, of a value by schema type when no sample data exists
+SCHEMA_TYPE_TOKENS = {"int": 3, "integer": 3, "float": 5, "number": 5, "bool": 1, "boolean": 1,
+                      "date": 5, "datetime": 8, "string": 6, "str": 6}
+
+
+def get_encoding(model: str):
+    """
+    tiktoken encoding for `model`, or None when tiktoken is not installed.
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Exact token count with tiktoken when installed, otherwise an estimate from the length.
+    """
+    encoding = get_encoding(model)
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def count_message_tokens(messages: list, model: str = "gpt-4") -> int:
+    return sum(count_tokens(message["content"], model) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def estimate_row_tokens(reference_data: pd.DataFrame, model: str = "gpt-4", sample_rows: int = 200,
+                        quantile: float = 0.95) -> float:
+    """
+    Output tokens one CSV row of `reference_data` takes: a high quantile over the token
+    counts of sampled reference rows rendered as CSV, so wide rows are covered.
+    """
+    sample = reference_data.sample(min(sample_rows, len(reference_data)), random_state=0) \
+        if len(reference_data) > sample_rows else reference_data
+    if sample.empty:
+        return float(len(reference_data.columns) * 4)
+    lines = sample.to_csv(index=False, header=False).splitlines()
+    return float(pd.Series([count_tokens(line + "\n", model) for line in lines]).quantile(quantile))
+
+
+def estimate_schema_row_tokens(schema, field_ranges=None, model: str = "gpt-4") -> float:
+    """
+    Output tokens per row from a schema without data: a typical width per value type, or
+    the width of the example values in `field_ranges` when given, plus the separators.
+    """
+    fields = schema.get("fields", schema) if isinstance(schema, dict) else schema
+    names = list(fields) if isinstance(fields, dict) else [field.get("name", field) if isinstance(field, dict) else field
+                                                          for field in fields]
+    tokens = 0.0
+    for name in names:
+        field_type = fields[name] if isinstance(fields, dict) else "string"
+        field_type = field_type.get("type", "string") if isinstance(field_type, dict) else str(field_type)
+        example = (field_ranges or {}).get(name) if isinstance(field_ranges, dict) else None
+        if example is not None:
+            widths = [count_tokens(str(value), model) for value in (example if isinstance(example, (list, tuple)) else [example])]
+            tokens += max(widths)
+        else:
+            tokens += SCHEMA_TYPE_TOKENS.get(field_type.lower(), SCHEMA_TYPE_TOKENS["string"])
+    # One separator per value, the last one being the newline
+    return tokens + len(names)
+
+
+class TokenCalibration:
+    """
+    Tokens per row actually observed in past responses, per column layout. Estimates are
+    blended with the running observations so the plan follows the real output width.
+    """
+
+    def __init__(self, weight: float = CALIBRATION_WEIGHT):
+        self.weight = weight
+        self.observed = {}
+        self.lock = threading.Lock()
+
+
+    def observe(self, key, text: str, num_rows: int, model: str = "gpt-4"):
+        if num_rows <= 0:
+            return
+        per_row = count_tokens(text, model) / num_rows
+        with self.lock:
+            previous = self.observed.get(key)
+            self.observed[key] = per_row if previous is None else (1 - self.weight) * previous + self.weight * per_row
+
+
+    def row_tokens(self, key, estimate: float) -> float:
+        with self.lock:
+            observed = self.observed.get(key)
+        return estimate if observed is None else max(estimate * (1 - self.weight), observed)
+
+
+_calibration = TokenCalibration()
+
+def get_token_calibration() -> TokenCalibration:
+    return _calibration
+
+
+class BatchPlan:
+    """
+    Rows to request per LLM call and the matching `max_tokens`.
+    """
+
+    def __init__(self, rows_per_call: int, max_tokens: int, row_tokens: float, prompt_tokens: int,
+                 overhead_tokens: int = OUTPUT_OVERHEAD_TOKENS):
+        self.rows_per_call = rows_per_call
+        self.max_tokens = max_tokens
+        self.row_tokens = row_tokens
+        self.prompt_tokens = prompt_tokens
+        self.overhead_tokens = overhead_tokens
+
+
+    def batch_sizes(self, num_rows: int) -> list:
+        sizes = [self.rows_per_call] * (num_rows // self.rows_per_call)
+        if num_rows % self.rows_per_call:
+            sizes.append(num_rows % self.rows_per_call)
+        return sizes
+
+
+    def max_tokens_for(self, num_rows: int) -> int:
+        """
+        Output cap for a call asking for `num_rows` rows, at most the planned cap.
+        """
+        return min(self.max_tokens, math.ceil(num_rows * self.row_tokens * ROW_TOKEN_SAFETY) + self.overhead_tokens)
+
+
+    def to_dict(self) -> dict:
+        return {"rows_per_call": self.rows_per_call, "max_tokens": self.max_tokens,
+                "row_tokens": round(self.row_tokens, 2), "prompt_tokens": self.prompt_tokens}
+
+
+def plan_batches(row_tokens: float, prompt_tokens: int, model: str = "gpt-4", max_rows_per_call: int = None,
+                 header_tokens: int = 0) -> BatchPlan:
+    """
+    Chooses the most rows per call whose output, at `row_tokens` per row plus a safety
+    margin, fits both the model's output cap and what the prompt leaves of its context.
+
+    Args:
+        row_tokens (float): Estimated output tokens per row.
+        prompt_tokens (int): Tokens of the prompt messages.
+        model (str): Model name, see MODEL_TOKEN_LIMITS.
+        max_rows_per_call (int): Upper bound on rows per call, e.g. a requested batch size.
+        header_tokens (int): Tokens of the CSV header line each response repeats.
+    """
+    limits = MODEL_TOKEN_LIMITS.get(model, DEFAULT_TOKEN_LIMITS)
+    output_budget = min(limits["max_output"], limits["context"] - prompt_tokens)
+    overhead_tokens = OUTPUT_OVERHEAD_TOKENS + header_tokens
+    rows_per_call = int((output_budget - overhead_tokens) // (row_tokens * ROW_TOKEN_SAFETY))
+    if rows_per_call < 1:
+        raise ValueError(f"A single row (~{row_tokens:.0f} tokens) does not fit the {output_budget} output tokens "
+                         f"left by a {prompt_tokens}-token prompt for {model}")
+    if max_rows_per_call:
+        rows_per_call = min(rows_per_call, max_rows_per_call)
+    max_tokens = min(output_budget, math.ceil(rows_per_call * row_tokens * ROW_TOKEN_SAFETY) + overhead_tokens)
+    return BatchPlan(rows_per_call, max_tokens, row_tokens, prompt_tokens, overhead_tokens)
+
+
+def split_csv_records(csv_text: str) -> list:
+    """
+    Splits CSV text into records with csv.reader, so a quoted field spanning lines stays
+    in one record.
+
+    Returns:
+        list: (record text, fields) per record; fields is None for a record left inside an
+            unterminated quote, i.e. cut off mid-field.
+    """
+    lines = csv_text.splitlines(keepends=True)
+    consumed = 0
+
+    def counted_lines():
+        nonlocal consumed
+        for line in lines:
+            consumed += 1
+            yield line
+
+    records = []
+    start = 0
+    try:
+        for fields in csv.reader(counted_lines()):
+            text = "".join(lines[start:consumed])
+            records.append((text, None if text.count('"') % 2 else fields))
+            start = consumed
+    except csv.Error:
+        records.append(("".join(lines[start:]), None))
+    return records
+
+
+def drop_truncated_rows(csv_text: str, num_columns: int = None, complete: bool = True):
+    """
+    Removes records cut off by the output limit from CSV text: every record whose field
+    count differs from `num_columns` (default: the header's), and the final record when
+    the output is not `complete` (finish_reason "length"), since a cut at a field boundary
+    can still look whole. Text without such records is returned unchanged.
+
+    Returns:
+        tuple: (cleaned CSV text, number of records dropped)
+    """
+    records = split_csv_records(csv_text)
+    if not records or not records[0][1]:
+        return csv_text, 0
+    (header, header_fields), body = records[0], records[1:]
+    truncated = 0
+    if not complete and body:
+        body = body[:-1]
+        truncated = 1
+    expected = num_columns or len(header_fields)
+    # Blank lines parse to no fields and are left for read_csv to skip
+    kept = [text for text, fields in body if fields is not None and len(fields) in (0, expected)]
+    dropped = truncated + len(body) - len(kept)
+    if not dropped:
+        return csv_text, 0
+    logging.warning(f'          - dropped {dropped} truncated or malformed CSV rows')
+    cleaned = header + "".join(kept)
+    return cleaned if cleaned.endswith("\n") else cleaned + "\n", dropped
@@ -0,0 +1,327 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.statistical_generator import infer_date_column
+
+MONOTONIC_GROUP_MIN_COLUMNS = 3
+
+
+def as_comparable(values: pd.Series) -> pd.Series:
+    """
+    Numeric columns as they are, date strings parsed to datetimes, so order constraints
+    compare dates chronologically. Values that cannot be parsed become NaT.
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values
+    return pd.to_datetime(values, errors='coerce', format='mixed')
+
+
+class Constraint:
+    """
+    A business rule evaluated over a whole DataFrame at once. Subclasses implement
+    `violations`, returning a boolean array that is True for the rows breaking the rule.
+    Rows where a checked value is missing are not counted as violations.
+    """
+
+    name = "constraint"
+
+    def violations(self, data: pd.DataFrame) -> np.ndarray:
+        raise NotImplementedError
+
+
+    def required_columns(self) -> set:
+        return set()
+
+
+    def to_dict(self) -> dict:
+        raise NotImplementedError
+
+
+class Monotonic(Constraint):
+    """
+    Values must not decrease (or increase) from each column to the next, e.g. the
+    due_in_30_days .. due_in_210_days buckets.
+    """
+
+    def __init__(self, columns, increasing: bool = True, strict: bool = False):
+        self.columns = list(columns)
+        self.increasing = increasing
+        self.strict = strict
+        self.name = f"monotonic({', '.join(self.columns)})"
+
+
+    def violations(self, data: pd.DataFrame) -> np.ndarray:
+        values = data[self.columns].to_numpy(dtype=np.float64)
+        steps = np.diff(values, axis=1) * (1 if self.increasing else -1)
+        with np.errstate(invalid='ignore'):
+            broken = steps <= 0 if self.strict else steps < 0
+        return broken.any(axis=1)
+
+
+    def required_columns(self) -> set:
+        return set(self.columns)
+
+
+    def to_dict(self) -> dict:
+        return {"type": "monotonic", "columns": self.columns, "increasing": self.increasing, "strict": self.strict}
+
+
+class ColumnOrder(Constraint):
+    """
+    `low` must be less than (or equal to) `high` in every row, for numbers or dates,
+    e.g. bill_cycle_end_date < payment_due_date.
+    """
+
+    def __init__(self, low: str, high: str, strict: bool = True):
+        self.low = low
+        self.high = high
+        self.strict = strict
+        self.name = f"{low} {'<' if strict else '<='} {high}"
+
+
+    def violations(self, data: pd.DataFrame) -> np.ndarray:
+        low, high = as_comparable(data[self.low]), as_comparable(data[self.high])
+        broken = (low >= high) if self.strict else (low > high)
+        return broken.fillna(False).to_numpy(dtype=bool)
+
+
+    def required_columns(self) -> set:
+        return {self.low, self.high}
+
+
+    def to_dict(self) -> dict:
+        return {"type": "order", "low": self.low, "high": self.high, "strict": self.strict}
+
+
+class Range(Constraint):
+    """
+    Values of `column` must lie within [minimum, maximum]; either bound may be None.
+    """
+
+    def __init__(self, column: str, minimum=None, maximum=None):
+        self.column = column
+        self.minimum = minimum
+        self.maximum = maximum
+        self.name = f"{column} in [{minimum}, {maximum}]"
+
+
+    def violations(self, data: pd.DataFrame) -> np.ndarray:
+        values = pd.to_numeric(data[self.column], errors='coerce')
+        broken = np.zeros(len(values), dtype=bool)
+        if self.minimum is not None:
+            broken |= (values < self.minimum).to_numpy(dtype=bool)
+        if self.maximum is not None:
+            broken |= (values > self.maximum).to_numpy(dtype=bool)
+        return broken
+
+
+    def required_columns(self) -> set:
+        return {self.column}
+
+
+    def to_dict(self) -> dict:
+        return {"type": "range", "column": self.column, "min": self.minimum, "max": self.maximum}
+
+
+class Expression(Constraint):
+    """
+    Any boolean pandas expression the rows must satisfy, e.g.
+    "credit_utilised <= 100 and avg_spend <= credit_limit".
+    """
+
+    def __init__(self, expression: str, name: str = None):
+        self.expression = expression
+        self.name = name or expression
+
+
+    def violations(self, data: pd.DataFrame) -> np.ndarray:
+        satisfied = data.eval(self.expression)
+        return ~np.asarray(pd.Series(satisfied).fillna(True), dtype=bool)
+
+
+    def to_dict(self) -> dict:
+        return {"type": "expression", "expression": self.expression, "name": self.name}
+
+
+CONSTRAINT_TYPES = {
+    "monotonic": lambda spec: Monotonic(spec["columns"], spec.get("increasing", True), spec.get("strict", False)),
+    "order": lambda spec: ColumnOrder(spec["low"], spec["high"], spec.get("strict", True)),
+    "range": lambda spec: Range(spec["column"], spec.get("min"), spec.get("max")),
+    "expression": lambda spec: Expression(spec["expression"], spec.get("name")),
+}
+
+
+class ConstraintSet:
+    """
+    A list of constraints checked together. Constraints on columns missing from the data
+    are skipped.
+    """
+
+    def __init__(self, constraints=None):
+        self.constraints = list(constraints or [])
+
+
+    @classmethod
+    def from_config(cls, specs: list) -> "ConstraintSet":
+        """
+        Builds constraints from dicts such as
+        {"type": "order", "low": "bill_cycle_end_date", "high": "payment_due_date"}.
+        Types: monotonic, order, range and expression.
+        """
+        constraints = []
+        for spec in specs:
+            if spec.get("type") not in CONSTRAINT_TYPES:
+                raise ValueError(f"Unknown constraint type '{spec.get('type')}', expected one of {sorted(CONSTRAINT_TYPES)}")
+            constraints.append(CONSTRAINT_TYPES[spec["type"]](spec))
+        return cls(constraints)
+
+
+    def applicable(self, data: pd.DataFrame) -> list:
+        columns = set(data.columns)
+        return [constraint for constraint in self.constraints if constraint.required_columns() <= columns]
+
+
+    def violation_mask(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Boolean array, True for every row that breaks at least one constraint.
+        """
+        mask = np.zeros(len(data), dtype=bool)
+        for constraint in self.applicable(data):
+            mask |= constraint.violations(data)
+        return mask
+
+
+    def report(self, data: pd.DataFrame) -> dict:
+        """
+        Number of violating rows per constraint, plus the total rows with any violation.
+        """
+        counts = {}
+        mask = np.zeros(len(data), dtype=bool)
+        for constraint in self.applicable(data):
+            broken = constraint.violations(data)
+            counts[constraint.name] = int(broken.sum())
+            mask |= broken
+        return {"rows": len(data), "violating_rows": int(mask.sum()), "violations": counts}
+
+
+    def to_config(self) -> list:
+        return [constraint.to_dict() for constraint in self.constraints]
+
+
+    def __len__(self):
+        return len(self.constraints)
+
+
+def monotonic_groups(data: pd.DataFrame, min_columns: int = MONOTONIC_GROUP_MIN_COLUMNS) -> list:
+    """
+    Numeric columns whose names differ only by a number, ordered by that number, e.g.
+    due_in_30_days, due_in_60_days, ..., due_in_210_days.
+    """
+    groups = {}
+    for column in data.columns:
+        match = re.search(r"\d+", column)
+        if match and pd.api.types.is_numeric_dtype(data[column].dtype):
+            pattern = column[:match.start()] + "#" + column[match.end():]
+            groups.setdefault(pattern, []).append((int(match.group()), column))
+    return [[column for _, column in sorted(members)] for members in groups.values() if len(members) >= min_columns]
+
+
+def infer_constraints(reference_data: pd.DataFrame, ranges: bool = True) -> ConstraintSet:
+    """
+    Infers the rules every row of the reference data satisfies:
+        - numbered column groups that never decrease (or never increase) left to right,
+        - orderings between date columns, reduced to the direct ones (a < b < c keeps
+          a < b and b < c, dropping the implied a < c),
+        - with `ranges`, the observed [min, max] of each numeric non-identifier column.
+    """
+    constraints = []
+    for columns in monotonic_groups(reference_data):
+        for increasing in (True, False):
+            candidate = Monotonic(columns, increasing=increasing)
+            if not candidate.violations(reference_data).any():
+                constraints.append(candidate)
+                break
+
+    dates = {}
+    for column in reference_data.columns:
+        values = reference_data[column]
+        if pd.api.types.is_datetime64_any_dtype(values.dtype):
+            dates[column] = values
+        elif not pd.api.types.is_numeric_dtype(values.dtype):
+            parsed = infer_date_column(values)
+            if parsed is not None:
+                dates[column] = parsed.reindex(values.index)
+    ordered = set()
+    for low in dates:
+        for high in dates:
+            if low != high and dates[low].notna().any() and (dates[low] < dates[high])[dates[low].notna() & dates[high].notna()].all():
+                ordered.add((low, high))
+    for low, high in sorted(ordered):
+        implied = any((low, middle) in ordered and (middle, high) in ordered for middle in dates)
+        if not implied:
+            constraints.append(ColumnOrder(low, high, strict=True))
+
+    if ranges:
+        from utils.relational import detect_key_columns
+
+        keys = set(detect_key_columns(reference_data))
+        for column in reference_data.columns:
+            values = reference_data[column]
+            if column not in keys and pd.api.types.is_numeric_dtype(values.dtype) \
+                    and not pd.api.types.is_bool_dtype(values.dtype) and values.notna().any():
+                constraints.append(Range(column, values.min().item(), values.max().item()))
+    return ConstraintSet(constraints)
+
+
+def resolve_constraints(constraints, reference_data: pd.DataFrame = None):
+    """
+    Accepts a ConstraintSet, a list of constraint specs, "infer" to infer them from
+    `reference_data`, or None. Returns a ConstraintSet or None.
+    """
+    if constraints is None or isinstance(constraints, ConstraintSet):
+        return constraints
+    if isinstance(constraints, str):
+        if constraints != "infer":
+            raise ValueError(f"Unknown constraints '{constraints}', expected 'infer' or a list of constraint specs")
+        if reference_data is None:
+            raise ValueError("Inferring constraints needs reference data")
+        return infer_constraints(reference_data)
+    return ConstraintSet.from_config(constraints)
+
+
+def fill_shortfall(synthetic_data: pd.DataFrame, accept, regenerate, target: int = None,
+                   max_rounds: int = 3, progress_callback=None, stage: str = "constraints") -> pd.DataFrame:
+    """
+    Keeps the rows `accept(batch, max_rows)` returns and asks `regenerate(num_rows)` for just
+    the missing number of rows, filtering those the same way, for up to `max_rounds` rounds.
+    Rows still missing after the last round are left out with a warning.
+
+    Args:
+        synthetic_data (pd.DataFrame): Rows generated so far.
+        accept (callable): Returns the acceptable rows of a batch, at most `max_rows` of them.
+        regenerate (callable): Generates a given number of new rows.
+        target (int): Number of rows wanted, default len(synthetic_data).
+    """
+    progress_callback = progress_callback or (lambda *args: None)
+    target = len(synthetic_data) if target is None else target
+    accepted = [accept(synthetic_data, target)]
+    shortfall = target - len(accepted[0])
+    for attempt in range(1, max_rounds + 1):
+        if shortfall <= 0:
+            break
+        logging.info(f'          - regenerating {shortfall} rows rejected by {stage} (round {attempt})')
+        try:
+            replacement = regenerate(shortfall)
+        except Exception as e:
+            logging.warning(f'          - regenerating rows failed: {e}')
+            continue
+        replacement = accept(replacement, shortfall)
+        accepted.append(replacement)
+        shortfall -= len(replacement)
+        progress_callback(target - shortfall, target, stage)
+    if shortfall > 0:
+        logging.warning(f'          - {shortfall} of {target} rows still missing after {max_rounds} rounds of {stage}')
+    return pd.concat(accepted, ignore_index=True)
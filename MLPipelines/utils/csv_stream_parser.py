@@ -0,0 +1,197 @@
+import csv
+import logging
+import pandas as pd
+from io import StringIO
+
+
+class CompletionText:
+    """
+    Iterates over the text deltas of a `stream=True` chat completion. Once the stream is
+    exhausted, `finish_reason` holds the reason sent with its last choice, e.g. "length"
+    when the completion was cut off by `max_tokens`.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.finish_reason = None
+
+
+    def __iter__(self):
+        for chunk in self.stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if getattr(choice, "finish_reason", None):
+                self.finish_reason = choice.finish_reason
+            delta = choice.delta.content
+            if delta:
+                yield delta
+
+
+def iter_completion_text(stream) -> CompletionText:
+    """
+    Yields the text deltas of a `stream=True` chat completion, see CompletionText.
+    """
+    return CompletionText(stream)
+
+
+def cast_to_dtypes(data: pd.DataFrame, dtypes) -> pd.DataFrame:
+    """
+    Casts the columns of `data` to the reference `dtypes` where the values allow it.
+    Columns that cannot be converted are left as parsed.
+    """
+    if dtypes is None:
+        return data
+    for column, dtype in dtypes.items():
+        if column not in data.columns:
+            continue
+        try:
+            if pd.api.types.is_numeric_dtype(dtype):
+                converted = pd.to_numeric(data[column], errors='raise')
+                data[column] = converted.astype(dtype) if not converted.isna().any() else converted
+            elif pd.api.types.is_datetime64_any_dtype(dtype):
+                data[column] = pd.to_datetime(data[column], errors='raise')
+        except (ValueError, TypeError):
+            pass
+    return data
+
+
+class StreamingCSVParser:
+    """
+    Incrementally parses CSV text as it arrives from a streamed LLM response.
+
+    Text is fed in arbitrary pieces; complete records are buffered and emitted as
+    DataFrame chunks of `chunk_rows` rows. When `columns` is None the first record is
+    used as the header. When `start_marker` is set, everything before it is ignored,
+    and parsing stops at `end_marker`. Records whose field count differs from the header's
+    are dropped and counted in `dropped` rather than padded with NaN.
+    """
+
+    def __init__(self, columns=None, dtypes=None, chunk_rows: int = 100,
+                 start_marker: str = None, end_marker: str = None):
+        self.columns = list(columns) if columns is not None else None
+        self.dtypes = dtypes
+        self.chunk_rows = chunk_rows
+        self.start_marker = start_marker
+        self.end_marker = end_marker
+        self._buffer = ""
+        self._pending_record = ""
+        self._records = []
+        self._started = start_marker is None
+        self._finished = False
+        self._header_checked = False
+        self._header_order = None
+        self.dropped = 0
+
+
+    def feed(self, text: str) -> list:
+        """
+        Adds a piece of streamed text and returns the DataFrame chunks completed by it.
+        """
+        if self._finished:
+            return []
+        self._buffer += text
+
+        if not self._started:
+            start_index = self._buffer.find(self.start_marker)
+            if start_index == -1:
+                # Keep just enough text to match a marker split across deltas
+                self._buffer = self._buffer[-len(self.start_marker):]
+                return []
+            self._buffer = self._buffer[start_index + len(self.start_marker):]
+            self._started = True
+
+        if self.end_marker:
+            end_index = self._buffer.find(self.end_marker)
+            if end_index != -1:
+                self._buffer = self._buffer[:end_index]
+                self._finished = True
+
+        *lines, self._buffer = self._buffer.split("\n")
+        if self._finished:
+            lines.append(self._buffer)
+            self._buffer = ""
+        for line in lines:
+            self._add_line(line)
+
+        chunks = []
+        while len(self._records) >= self.chunk_rows:
+            chunks.append(self._build_chunk(self._records[:self.chunk_rows]))
+            self._records = self._records[self.chunk_rows:]
+        return chunks
+
+
+    def close(self, truncated: bool = False) -> list:
+        """
+        Flushes any remaining records once the stream has ended. When the completion was
+        `truncated` (finish_reason "length"), a final record without its line break may be
+        cut at a field boundary and still look whole, so it is dropped.
+        """
+        if self._buffer and self._started:
+            if truncated and self._buffer.strip():
+                self.dropped += 1
+            else:
+                self._add_line(self._buffer)
+            self._buffer = ""
+        if self._pending_record:
+            # An unterminated quoted field means the final record was cut off
+            self._pending_record = ""
+            self.dropped += 1
+        self._finished = True
+        chunks = []
+        if self._records:
+            chunks.append(self._build_chunk(self._records))
+            self._records = []
+        return chunks
+
+
+    def _add_line(self, line: str):
+        line = line.rstrip("\r")
+        record = f"{self._pending_record}\n{line}" if self._pending_record else line
+        if record.count('"') % 2:
+            # Quoted field spans a line break, wait for the rest of the record
+            self._pending_record = record
+            return
+        self._pending_record = ""
+        if not record.strip() or record.strip().startswith("```"):
+            return
+        if not self._header_checked:
+            self._header_checked = True
+            header = next(iter(pd.read_csv(StringIO(record), header=None, dtype=str).values.tolist()), [])
+            header = [str(value).strip() for value in header]
+            if self.columns is None:
+                self.columns = header
+                return
+            if set(header) == set(self.columns):
+                self._header_order = header
+                return
+        if len(next(csv.reader([record]), [])) != len(self._header_order or self.columns):
+            self.dropped += 1
+            return
+        self._records.append(record)
+
+
+    def _build_chunk(self, records: list) -> pd.DataFrame:
+        names = self._header_order or self.columns
+        chunk = pd.read_csv(StringIO("\n".join(records)), header=None, names=names,
+                            skipinitialspace=True, on_bad_lines='skip')
+        chunk = chunk[self.columns]
+        return cast_to_dtypes(chunk, self.dtypes)
+
+
+def iter_csv_chunks(text_stream, columns=None, dtypes=None, chunk_rows: int = 100,
+                    start_marker: str = None, end_marker: str = None):
+    """
+    Parses an iterable of text pieces into typed DataFrame chunks as soon as
+    `chunk_rows` complete records are available. A CompletionText that finished with
+    "length" has its trailing partial record dropped.
+    """
+    parser = StreamingCSVParser(columns=columns, dtypes=dtypes, chunk_rows=chunk_rows,
+                                start_marker=start_marker, end_marker=end_marker)
+    for text in text_stream:
+        for chunk in parser.feed(text):
+            yield chunk
+    for chunk in parser.close(truncated=getattr(text_stream, "finish_reason", None) == "length"):
+        yield chunk
+    if parser.dropped:
+        logging.warning(f'          - dropped {parser.dropped} truncated or malformed streamed rows')
@@ -1,22 +1,37 @@
 import pandas as pd
 import numpy as np
 import time
-from scipy.stats import norm
-from openai import OpenAI
-import plotly.express as px
-import plotly.graph_objects as go
+import json
+import logging
+import os
+from concurrent.futures import wait
+from utils.openai_client import get_shared_client
+from utils.llm_cache import get_default_cache
+from utils.data_profiler import profile_dataframe
+from utils.executors import get_thread_pool, BoundedSubmitter
+from utils.plot_aggregates import (histogram_density, gaussian_curve, kde_curve, box_statistics, sample_outliers,
+                                   MAX_OUTLIERS)
+
+INSIGHT_MODES = ("concurrent", "batched")
+INSIGHT_MAX_CONCURRENCY = int(os.getenv("INSIGHT_MAX_CONCURRENCY", 8))
+INSIGHT_BATCH_COLUMNS = int(os.getenv("INSIGHT_BATCH_COLUMNS", 20))
+INSIGHT_TIMEOUT_SECONDS = float(os.getenv("INSIGHT_TIMEOUT_SECONDS", 60))
+INSIGHT_UNAVAILABLE = "Insight not available within the latency budget."
+PLOT_MODES = ("aggregated", "raw")
 
 
 class DataAnalyzer:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None):
         self.api_key = api_key
-        self.llm_client = OpenAI(api_key=self.api_key)
+        self.llm_client = get_shared_client(self.api_key)
+        self.cache = cache or get_default_cache()
     
     def generate_summary_statistics(self, data: pd.DataFrame) -> pd.DataFrame:
         """
         Generate summary statistics for the dataset.
+        The statistics come from the shared dataset profile, computed once per DataFrame content.
         """
-        return data.describe(include='all').transpose()
+        return profile_dataframe(data).summary_statistics
     
 
 
@@ -25,17 +40,23 @@ class DataAnalyzer:
         Generate multiple interactive plots for a given column using Plotly.
         The plots are generated only for numerical columns.
         """
+        # Plotly and SciPy are imported on first use to keep module import cheap
+        import plotly.express as px
+        import plotly.graph_objects as go
+        from scipy.stats import norm
+
         plots = {}
         
         # Check if the column is numerical
-        if not np.issubdtype(data[column].dtype, np.number):
+        if not pd.api.types.is_numeric_dtype(data[column].dtype) or pd.api.types.is_bool_dtype(data[column].dtype):
             # Skip generating plots for non-numeric columns
             return plots
         
         # Gaussian Distribution Plot (for Numerical Columns)
-        mean = data[column].mean()
-        std = data[column].std()
-        x = np.linspace(data[column].min(), data[column].max(), 100)
+        column_stats = profile_dataframe(data).column(column)
+        mean = column_stats['mean']
+        std = column_stats['std']
+        x = np.linspace(column_stats['min'], column_stats['max'], 100)
         y = norm.pdf(x, mean, std)
         
         fig_gaussian = go.Figure()
@@ -76,6 +97,70 @@ class DataAnalyzer:
         return plots
 
 
+    def generate_column_plot_aggregated(self, data: pd.DataFrame, column: str,
+                                        max_outliers: int = MAX_OUTLIERS) -> dict:
+        """
+        Same four plots as `generate_column_plot_plotly`, built from aggregates computed in
+        NumPy: histogram bins, Gaussian and KDE curves, box quartiles and fences, and a
+        sample of at most `max_outliers` outliers. The figures never embed the raw column,
+        so their size does not grow with the number of rows.
+        """
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+
+        if not pd.api.types.is_numeric_dtype(data[column].dtype) or pd.api.types.is_bool_dtype(data[column].dtype):
+            return {}
+        values = data[column].dropna().to_numpy(dtype=np.float64)
+        if not len(values):
+            return {}
+
+        plots = {}
+        column_stats = profile_dataframe(data).column(column)
+        centers, densities, bin_width = histogram_density(values)
+        box = box_statistics(values)
+        outliers, num_outliers = sample_outliers(values, box, max_outliers)
+
+        def histogram_trace(name='Data Distribution'):
+            return go.Bar(x=centers, y=densities, width=bin_width, name=name, opacity=0.7)
+
+        def box_trace(name, orientation='v'):
+            quantiles = {key: [value] for key, value in box.items()}
+            if orientation == 'h':
+                return go.Box(y=[column], orientation='h', name=name, boxpoints=False, **quantiles)
+            return go.Box(x=[column], name=name, boxpoints=False, **quantiles)
+
+        # Gaussian Distribution Plot
+        x, y = gaussian_curve(column_stats['mean'], column_stats['std'], values.min(), values.max())
+        fig_gaussian = go.Figure([histogram_trace(),
+                                  go.Scatter(x=x, y=y, mode='lines', name='Gaussian Fit', line=dict(color='red'))])
+        fig_gaussian.update_layout(title=f"Gaussian Distribution Plot for {column}", xaxis_title=column,
+                                   yaxis_title="Density", bargap=0)
+        plots['gaussian_distribution_plot'] = fig_gaussian
+
+        # Distribution Plot: histogram with a KDE curve and a box marginal
+        kde_x, kde_y = kde_curve(values)
+        fig_dist = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+        fig_dist.add_trace(box_trace(column, orientation='h'), row=1, col=1)
+        fig_dist.add_trace(histogram_trace(column), row=2, col=1)
+        fig_dist.add_trace(go.Scatter(x=kde_x, y=kde_y, mode='lines', name='KDE'), row=2, col=1)
+        fig_dist.update_layout(title=f"Distribution Plot for {column}", bargap=0, showlegend=False)
+        plots['distribution_plot'] = fig_dist
+
+        # Box Plot
+        fig_box = go.Figure([box_trace(column)])
+        fig_box.update_layout(title=f"Box Plot for {column}")
+        plots['box_plot'] = fig_box
+
+        # Outlier Detection Plot
+        fig_outliers = go.Figure([box_trace('Outliers'),
+                                  go.Scatter(x=[column] * len(outliers), y=outliers, mode='markers',
+                                             name=f'Outliers ({len(outliers)} of {num_outliers} shown)')])
+        fig_outliers.update_layout(title=f"Outlier Detection for {column}")
+        plots['outlier_plot'] = fig_outliers
+
+        return plots
+
+
 
     def generate_column_insight(self, column_name: str, stats: pd.Series) -> str:
         """
@@ -87,15 +172,107 @@ class DataAnalyzer:
         
         Provide a concise summary and key insights based on this information.
         """
-        response = self.llm_client.chat.completions.create(
+        return self.cache.cached_chat_completion(
+            self.llm_client,
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are a data analysis assistant."},
                 {"role": "user", "content": prompt}
             ]
         )
-        return response.choices[0].message.content
-    
+
+
+    def build_batched_insight_prompt(self, summary_stats: pd.DataFrame, columns) -> str:
+        column_summaries = "\n".join(
+            f"- {column}: {json.dumps(summary_stats.loc[column].dropna().to_dict(), default=str)}"
+            for column in columns
+        )
+        return f"""
+        Analyze the following statistical summaries, one per column:
+        {column_summaries}
+
+        For every column, provide a concise summary and key insights based on this information.
+        Respond with only a JSON object mapping each column name to its insight text.
+        """
+
+
+    @staticmethod
+    def parse_batched_insights(text: str, columns) -> dict:
+        """
+        Extracts the {column: insight} JSON object from a batched response, ignoring any
+        surrounding prose or code fences. Columns the response missed are left out.
+        """
+        start, end = text.find("{"), text.rfind("}")
+        if start == -1 or end <= start:
+            return {}
+        try:
+            insights = json.loads(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            logging.warning(f'          - could not parse batched insights: {e}')
+            return {}
+        return {column: str(insights[column]) for column in columns if column in insights}
+
+
+    def generate_column_insights_batched(self, summary_stats: pd.DataFrame, columns) -> dict:
+        """
+        Insights for many columns from a single prompt. Columns missing from the response
+        fall back to one call each.
+        """
+        prompt = self.build_batched_insight_prompt(summary_stats, columns)
+        response = self.cache.cached_chat_completion(
+            self.llm_client,
+            model="gpt-4",
+            messages=[
+                {"role": "system", "content": "You are a data analysis assistant. Always respond in valid JSON format."},
+                {"role": "user", "content": prompt}
+            ]
+        )
+        insights = self.parse_batched_insights(response, columns)
+        for column in columns:
+            if column not in insights:
+                insights[column] = self.generate_column_insight(column, summary_stats.loc[column])
+        return insights
+
+
+    def submit_column_insights(self, executor, summary_stats: pd.DataFrame, columns, mode: str,
+                               batch_columns: int = INSIGHT_BATCH_COLUMNS) -> dict:
+        """
+        Submits the insight requests for `columns` to `executor`.
+
+        Returns:
+            dict: future -> list of the columns it produces insights for. Concurrent futures
+                return one insight string, batched futures a {column: insight} dict.
+        """
+        if mode == "concurrent":
+            return {executor.submit(self.generate_column_insight, column, summary_stats.loc[column]): [column]
+                    for column in columns}
+        if mode == "batched":
+            chunks = [list(columns[i:i + batch_columns]) for i in range(0, len(columns), batch_columns)]
+            return {executor.submit(self.generate_column_insights_batched, summary_stats, chunk): chunk
+                    for chunk in chunks}
+        raise ValueError(f"Unknown insight mode '{mode}', expected one of {INSIGHT_MODES}")
+
+
+    @staticmethod
+    def collect_column_insights(futures: dict, timeout: float) -> dict:
+        """
+        Waits up to `timeout` seconds for the insight futures. Columns whose insight failed
+        or did not arrive in time get a placeholder.
+        """
+        done, _ = wait(futures, timeout=max(timeout, 0))
+        insights = {}
+        for future, columns in futures.items():
+            if future not in done:
+                insights.update({column: INSIGHT_UNAVAILABLE for column in columns})
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.warning(f'          - insight generation failed for {columns}: {e}')
+                insights.update({column: f"Insight generation failed: {e}" for column in columns})
+                continue
+            insights.update(result if isinstance(result, dict) else {columns[0]: result})
+        return insights
 
 
     """
@@ -130,7 +307,27 @@ class DataAnalyzer:
         - "plots": JSON representations of Plotly figures for visualization.
         - "insight": A text-based insight generated for each column.
     """
-    def show_plots_and_insights(self, dataset):
+    def show_plots_and_insights(self, dataset, insight_mode: str = "concurrent",
+                                max_concurrency: int = INSIGHT_MAX_CONCURRENCY,
+                                timeout: float = INSIGHT_TIMEOUT_SECONDS,
+                                plot_mode: str = "aggregated"):
+        """
+        Plots and LLM insights for every column.
+
+        The insight requests are submitted first to the shared I/O thread pool, at most
+        `max_concurrency` at a time, and run while the plots are built, either one call per column ("concurrent") or one JSON
+        prompt per INSIGHT_BATCH_COLUMNS columns ("batched"). After `timeout` seconds the
+        payload is returned regardless, with a placeholder for every insight still pending,
+        so latency stays bounded however many columns the dataset has. Requests already in
+        flight still complete and are cached for the next call.
+
+        `plot_mode` "aggregated" ships precomputed bins, curves and quartiles with a capped
+        outlier sample, "raw" embeds every value of the column in each figure.
+        """
+        if plot_mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode '{plot_mode}', expected one of {PLOT_MODES}")
+        plot_fn = self.generate_column_plot_aggregated if plot_mode == "aggregated" else self.generate_column_plot_plotly
+        started = time.monotonic()
         summary_stats = self.generate_summary_statistics(dataset)
 
         payload = {
@@ -138,24 +335,29 @@ class DataAnalyzer:
             "columns": {}
         }
 
-        for column in dataset.columns[:1]:
+        executor = BoundedSubmitter(get_thread_pool(), max_concurrency)
+        insight_futures = self.submit_column_insights(executor, summary_stats, dataset.columns, insight_mode)
+
+        for column in dataset.columns:
             column_data = {
                 "plots": {},
                 "insight": ""
             }
 
             # Generate and store plots
-            column_plots = self.generate_column_plot_plotly(dataset, column)
+            column_plots = plot_fn(dataset, column)
             if column_plots:
                 for plot_name, fig in column_plots.items():
                     column_data["plots"][plot_name] = fig.to_json()
             else:
                 column_data["plots"] = "No plots available (non-numeric data)."
 
-            # Generate and store insights
-            column_stats = summary_stats.loc[column]
-            column_data["insight"] = self.generate_column_insight(column, column_stats)
-
             payload["columns"][column] = column_data
-        payload['structured_data_insights'] = payload
+
+        # Collect the insights that were generated while the plots were built
+        insights = self.collect_column_insights(insight_futures, timeout - (time.monotonic() - started))
+        executor.cancel()
+        for column in dataset.columns:
+            payload["columns"][column]["insight"] = insights[column]
+        payload["insights_pending"] = [column for column in dataset.columns if insights[column] == INSIGHT_UNAVAILABLE]
         return payload
\ No newline at end of file
@@ -1,12 +1,32 @@
-from openai import OpenAI
+from utils.openai_client import get_shared_client
 import pandas as pd
 import json
 from io import StringIO
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import logging
+import time
+from utils.csv_stream_parser import iter_completion_text, iter_csv_chunks
+from utils.llm_cache import get_default_cache
+from utils.statistical_generator import GaussianCopulaGenerator
+from utils.data_profiler import profile_dataframe
+from utils.relational import generate_relational_data
+from utils.constraints import resolve_constraints, fill_shortfall
+from utils.dedup import UniquenessTracker
+from utils.batch_planner import (estimate_row_tokens, count_message_tokens, count_tokens, plan_batches,
+                                 drop_truncated_rows, get_token_calibration)
+
+GENERATION_MODEL = "gpt-4"
+GENERATION_SYSTEM_MESSAGE = "You are a data generation assistant."
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 1.0
+
 
 class SyntheticDataGenerator:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None):
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_shared_client(self.api_key)
+        self.cache = cache or get_default_cache()
 
 
     def generate_synthetic_data_payload(self, synthetic_data):
@@ -15,58 +35,309 @@ class SyntheticDataGenerator:
         return payload
     
 
-    def generate_tabular_data(self, reference_data: pd.DataFrame, num_rows: int) -> pd.DataFrame:
+    def build_schema_summary(self, reference_data: pd.DataFrame) -> str:
+        profile = profile_dataframe(reference_data)
         schema_description = []
         for column in reference_data.columns:
-            dtype = reference_data[column].dtype
+            dtype = profile.dtypes[column]
+            stats = profile.column(column)
             if dtype in ['int64', 'float64']:
-                summary = f"mean: {reference_data[column].mean():.2f}, std: {reference_data[column].std():.2f}, min: {reference_data[column].min()}, max: {reference_data[column].max()}"
+                summary = f"mean: {stats['mean']:.2f}, std: {stats['std']:.2f}, min: {stats['min']}, max: {stats['max']}"
             elif dtype == 'object':
-                unique_values = reference_data[column].nunique()
-                sample_values = reference_data[column].dropna().unique()[:3]
-                summary = f"{unique_values} unique values, e.g., {list(sample_values)}"
+                summary = f"{stats['unique']} unique values, e.g., {profile.sample_values[column]}"
             else:
                 summary = "Non-numeric data"
             schema_description.append(f"{column} ({dtype}): {summary}")
-        
-        schema_summary = "\n".join(schema_description)
+        return "\n".join(schema_description)
+
 
-        # Create the prompt
-        prompt = f"""
+    def build_tabular_prompt(self, schema_summary: str, num_rows: int) -> str:
+        return f"""
         Generate {num_rows} rows of synthetic data in CSV format based on the following schema:
         {schema_summary}
 
         The generated data should align with the described schema and statistical properties.
         Provide the output in CSV format enclosed by START_CSV and END_CSV placeholders.
         """
-        
-        client = OpenAI(api_key=self.api_key)
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a data generation assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        )
 
-        # Extract synthetic data from the response
-        synthetic_data_text = response.choices[0].message.content
+
+    def parse_csv_block(self, synthetic_data_text: str, columns, complete: bool = True) -> pd.DataFrame:
+        """
+        Extracts the START_CSV/END_CSV block from an LLM response and aligns it to `columns`.
+        A header matching the reference columns is reordered by name, otherwise columns are
+        renamed positionally. Rows with the wrong number of fields are dropped, and so is the
+        last row when the response was not `complete` (cut off by `max_tokens`).
+        """
         start_index = synthetic_data_text.find("START_CSV") + len("START_CSV")
         end_index = synthetic_data_text.find("END_CSV")
-        csv_data = synthetic_data_text[start_index:end_index].strip()
+        csv_data = synthetic_data_text[start_index:end_index if end_index >= 0 else None].strip()
+        csv_data, _ = drop_truncated_rows(csv_data, num_columns=len(columns), complete=complete)
         synthetic_data = pd.read_csv(StringIO(csv_data))
-        synthetic_data.columns = reference_data.columns[:len(reference_data.columns)]
+        if set(synthetic_data.columns) == set(columns):
+            return synthetic_data[list(columns)]
+        if len(synthetic_data.columns) != len(columns):
+            raise ValueError(f"Expected {len(columns)} columns in generated CSV, got {len(synthetic_data.columns)}")
+        synthetic_data.columns = list(columns)
         return synthetic_data
 
 
-    def generate_textual_data(self, reference_text: str, column_name, num_samples: int) -> list:
+    def plan_tabular_batches(self, reference_data: pd.DataFrame, schema_summary: str, max_rows_per_call: int = None):
+        """
+        Rows per call and `max_tokens` for the tabular prompt, from the token width of the
+        reference rows, calibrated by the widths observed in earlier responses.
+        """
+        prompt_tokens = count_message_tokens([
+            {"role": "system", "content": GENERATION_SYSTEM_MESSAGE},
+            {"role": "user", "content": self.build_tabular_prompt(schema_summary, 10**6)}
+        ], GENERATION_MODEL)
+        row_tokens = get_token_calibration().row_tokens(tuple(reference_data.columns),
+                                                        estimate_row_tokens(reference_data, GENERATION_MODEL))
+        plan = plan_batches(row_tokens, prompt_tokens, GENERATION_MODEL, max_rows_per_call=max_rows_per_call,
+                            header_tokens=count_tokens(",".join(map(str, reference_data.columns)), GENERATION_MODEL))
+        logging.info(f'          - batch plan: {plan.to_dict()}')
+        return plan
+
+
+    def request_tabular_batch(self, schema_summary: str, num_rows: int, columns,
+                              use_cache: bool = False, cache_variant=None, max_tokens: int = None) -> pd.DataFrame:
+        prompt = self.build_tabular_prompt(schema_summary, num_rows)
+        params = {"max_tokens": max_tokens} if max_tokens else {}
+        synthetic_data_text, finish_reason = self.cache.cached_chat_completion(
+            self.client,
+            model=GENERATION_MODEL,
+            messages=[
+                {"role": "system", "content": GENERATION_SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt}
+            ],
+            use_cache=use_cache,
+            cache_variant=cache_variant,
+            return_finish_reason=True,
+            **params
+        )
+        synthetic_data = self.parse_csv_block(synthetic_data_text, columns, complete=finish_reason != "length")
+        get_token_calibration().observe(tuple(columns), synthetic_data.to_csv(index=False, header=False),
+                                        len(synthetic_data), GENERATION_MODEL)
+        return synthetic_data
+
+
+    def generate_tabular_data(self, reference_data: pd.DataFrame, num_rows: int,
+                              batch_size: int = None,
+                              max_workers: int = DEFAULT_MAX_WORKERS,
+                              max_retries: int = DEFAULT_MAX_RETRIES,
+                              use_cache: bool = False,
+                              engine: str = "llm",
+                              random_state=None,
+                              drift_tracker=None,
+                              progress_callback=None,
+                              constraints=None,
+                              key_columns=None,
+                              deduplicate: bool = False) -> pd.DataFrame:
+        """
+        Generates `num_rows` synthetic rows resembling `reference_data`.
+
+        Args:
+            reference_data (pd.DataFrame): The reference dataset.
+            num_rows (int): Number of rows to generate.
+            batch_size (int): Maximum rows requested per LLM call. The request is split into
+                batches, sent concurrently, of as many rows as fit the model's output limit
+                (see `plan_tabular_batches`) and at most `batch_size`.
+            max_workers (int): Maximum number of batches in flight at once.
+            max_retries (int): Retry rounds for failed batches.
+            use_cache (bool): Replay a cached response for an identical request instead of
+                requesting fresh rows. Off by default, so repeated requests yield new data.
+            engine (str): "llm" to prompt GPT-4, or "statistical" to sample locally from
+                fitted marginals and a Gaussian copula without any LLM call.
+            random_state: Seed for the statistical engine.
+            drift_tracker (IncrementalDriftTracker): Updated with every completed batch; batched
+                generation stops early, keeping the rows generated so far, once it reports drift.
+            progress_callback (callable): Called as `progress_callback(rows_done, num_rows, stage)`
+                whenever a batch completes.
+            constraints: Business rules the rows must satisfy: a ConstraintSet, a list of constraint
+                specs, or "infer" to use the rules every reference row satisfies. Rows breaking them
+                are dropped and only that many rows are regenerated, see `fill_shortfall`.
+            key_columns (list): Columns whose values must be unique on their own, enforced like constraints.
+            deduplicate (bool): Also replace rows repeating an earlier row across batches.
+
+        Returns:
+            pd.DataFrame: Synthetic data in the reference column order.
+        """
+        progress_callback = progress_callback or (lambda *args: None)
+        constraints = resolve_constraints(constraints, reference_data)
+        if engine == "statistical":
+            generator = GaussianCopulaGenerator(random_state=random_state).fit(reference_data)
+            synthetic_data = generator.sample(num_rows)
+            progress_callback(len(synthetic_data), num_rows, "generating")
+            regenerate = generator.sample
+        elif engine == "llm":
+            schema_summary = self.build_schema_summary(reference_data)
+            columns = reference_data.columns
+            plan = self.plan_tabular_batches(reference_data, schema_summary, max_rows_per_call=batch_size)
+
+            def regenerate(rows):
+                # Fresh rows: a cached response would repeat the rows that were just rejected
+                return self.generate_tabular_data_batched(schema_summary, rows, columns, plan.rows_per_call,
+                                                          max_workers, max_retries, use_cache=False, plan=plan)
+
+            synthetic_data = self.generate_tabular_data_batched(schema_summary, num_rows, columns,
+                                                                plan.rows_per_call, max_workers, max_retries, use_cache,
+                                                                drift_tracker, progress_callback, plan=plan)
+        else:
+            raise ValueError(f"Unknown generation engine '{engine}', expected 'llm' or 'statistical'")
+
+        tracker = UniquenessTracker(key_columns=key_columns, whole_row=deduplicate, expected_rows=num_rows) \
+            if key_columns or deduplicate else None
+        if constraints or tracker:
+            def accept(batch, max_rows):
+                if constraints:
+                    batch = batch[~constraints.violation_mask(batch)]
+                return tracker.filter(batch, max_rows=max_rows) if tracker else batch.iloc[:max_rows]
+
+            synthetic_data = fill_shortfall(synthetic_data, accept, regenerate, max_rounds=max_retries,
+                                            progress_callback=progress_callback,
+                                            stage="constraints and deduplication")
+        return synthetic_data
+
+
+    def generate_tabular_data_batched(self, schema_summary: str, num_rows: int, columns,
+                                      batch_size: int, max_workers: int, max_retries: int,
+                                      use_cache: bool = False, drift_tracker=None,
+                                      progress_callback=None, plan=None) -> pd.DataFrame:
+        """
+        Splits the request into batches of `batch_size` rows, runs them on a bounded thread pool
+        and retries only the batches that failed. Batches that still fail after `max_retries`
+        rounds are dropped with a warning; the rows generated so far are always kept.
+        Each batch is cached under its own index so identical prompts still yield distinct rows.
+        When `drift_tracker` detects drift, batches not yet started are cancelled.
+        With a BatchPlan, each call gets a matching `max_tokens`, and rows missing from a
+        truncated response are queued again as a new batch in the next round.
+        """
+        progress_callback = progress_callback or (lambda *args: None)
+        batch_sizes = [batch_size] * (num_rows // batch_size)
+        if num_rows % batch_size:
+            batch_sizes.append(num_rows % batch_size)
+
+        results = {}
+        pending = list(range(len(batch_sizes)))
+        attempt = 0
+        failed = []
+        drift_stopped = False
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while pending and attempt <= max_retries and not drift_stopped:
+                if failed:
+                    time.sleep(RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+                if attempt:
+                    logging.info(f'          - retrying {len(pending)} failed or truncated batches (attempt {attempt})')
+                futures = {
+                    executor.submit(self.request_tabular_batch, schema_summary, batch_sizes[i], columns,
+                                    use_cache, i, plan.max_tokens_for(batch_sizes[i]) if plan else None): i
+                    for i in pending
+                }
+                failed = []
+                requeued = []
+                for future in as_completed(futures):
+                    batch_index = futures[future]
+                    try:
+                        results[batch_index] = future.result()
+                    except Exception as e:
+                        logging.warning(f'          - batch {batch_index} failed: {e}')
+                        failed.append(batch_index)
+                        continue
+                    missing = batch_sizes[batch_index] - len(results[batch_index])
+                    if plan is not None and missing > 0:
+                        # The response was cut off or short: ask for the missing rows in a new batch
+                        batch_sizes.append(missing)
+                        requeued.append(len(batch_sizes) - 1)
+                    progress_callback(sum(len(batch) for batch in results.values()), num_rows, "generating")
+                    if drift_tracker is not None and drift_tracker.update(results[batch_index]).drift_detected():
+                        logging.warning(f'          - drift detected after {drift_tracker.current.num_rows} rows, stopping generation')
+                        for remaining in futures:
+                            remaining.cancel()
+                        drift_stopped = True
+                        break
+                pending = [] if drift_stopped else sorted(failed) + requeued
+                attempt += 1
+
+        if not results:
+            raise RuntimeError(f"All {len(batch_sizes)} generation batches failed")
+        if pending:
+            logging.warning(f'          - {len(pending)} of {len(batch_sizes)} batches failed or were short after {max_retries} retries')
+
+        synthetic_data = pd.concat([results[i] for i in sorted(results)], ignore_index=True)
+        return synthetic_data[list(columns)]
+
+
+    def stream_tabular_data(self, reference_data: pd.DataFrame, num_rows: int, chunk_rows: int = 100,
+                            max_retries: int = DEFAULT_MAX_RETRIES):
+        """
+        Streams the completion and yields DataFrame chunks of up to `chunk_rows` rows,
+        typed like `reference_data`, as soon as the rows have been generated. Rows are
+        requested in calls sized by `plan_tabular_batches`; rows a call did not deliver
+        (cut off by `max_tokens` or malformed) are requested again, in up to `max_retries`
+        further calls.
+        """
+        schema_summary = self.build_schema_summary(reference_data)
+        plan = self.plan_tabular_batches(reference_data, schema_summary)
+        remaining = num_rows
+        short_calls = 0
+        while remaining > 0:
+            call_rows = min(remaining, plan.rows_per_call)
+            stream = self.client.chat.completions.create(
+                model=GENERATION_MODEL,
+                messages=[
+                    {"role": "system", "content": GENERATION_SYSTEM_MESSAGE},
+                    {"role": "user", "content": self.build_tabular_prompt(schema_summary, call_rows)}
+                ],
+                max_tokens=plan.max_tokens_for(call_rows),
+                stream=True
+            )
+            delivered = 0
+            for chunk in iter_csv_chunks(iter_completion_text(stream),
+                                         columns=reference_data.columns,
+                                         dtypes=reference_data.dtypes,
+                                         chunk_rows=chunk_rows,
+                                         start_marker="START_CSV",
+                                         end_marker="END_CSV"):
+                chunk = chunk.iloc[:remaining]
+                delivered += len(chunk)
+                remaining -= len(chunk)
+                yield chunk
+            if remaining > 0 and delivered < call_rows:
+                short_calls += 1
+                if short_calls > max_retries:
+                    logging.warning(f'          - {remaining} of {num_rows} rows still missing after {max_retries} retries')
+                    break
+                logging.info(f'          - requesting {call_rows - delivered} rows missing from a truncated stream (attempt {short_calls})')
+
+
+    def generate_relational_data(self, parent_reference: pd.DataFrame, child_reference: pd.DataFrame, key: str,
+                                 num_parents: int, cardinality=None, batch_size: int = None, engine: str = "llm",
+                                 random_state=None, constraints=None) -> dict:
+        """
+        Generates linked parent and child tables, e.g. account_details and account_fin_info
+        joined on card_number. The non-key columns of each table come from
+        `generate_tabular_data` with the given engine; the keys are assigned afterwards so every
+        child row references a generated parent, see `utils.relational.generate_relational_data`.
+        `constraints` applies to each table on its own, "infer" infers them per table.
+
+        Returns:
+            dict: {'parent_data', 'child_data', 'integrity'}
+        """
+        def generate_table(reference_data, num_rows):
+            return self.generate_tabular_data(reference_data, num_rows, batch_size=batch_size, engine=engine,
+                                              random_state=random_state, constraints=constraints)
+
+        return generate_relational_data(parent_reference, child_reference, key, num_parents, generate_table,
+                                        cardinality=cardinality, random_state=random_state)
+
+
+    def generate_textual_data(self, reference_text: str, column_name, num_samples: int, use_cache: bool = False) -> list:
         prompt = f"Generate {num_samples} synthetic samples based on the following text:\n{reference_text}"
-        response = self.client.chat.completions.create(model="gpt-4",
+        synthetic_text = self.cache.cached_chat_completion(self.client, model="gpt-4",
         messages=[
             {"role": "system", "content": "You are a text generation assistant."},
             {"role": "user", "content": prompt}
-        ])
-        synthetic_texts = response.choices[0].message.content.split("\n")
+        ], use_cache=use_cache)
+        synthetic_texts = synthetic_text.split("\n")
         synthetic_data = pd.DataFrame(synthetic_texts, columns=[column_name])
         synthetic_data.dropna(inplace=True)
         synthetic_data.reset_index(inplace=True, drop=True)
@@ -1,14 +1,26 @@
 import pandas as pd
-from openai import OpenAI
+from utils.openai_client import get_shared_client
 import json
-import streamlit as st
 import io
+import logging
+from utils.csv_stream_parser import iter_completion_text, iter_csv_chunks
+from utils.llm_cache import get_default_cache
+from utils.constraints import resolve_constraints, fill_shortfall
+from utils.dedup import UniquenessTracker
+from utils.batch_planner import (estimate_schema_row_tokens, count_message_tokens, count_tokens, plan_batches,
+                                 drop_truncated_rows, get_token_calibration)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+GENERATION_MODEL = "gpt-3.5-turbo"
+DEFAULT_MAX_ROUNDS = 5
+DEFAULT_MAX_WORKERS = 4
 
 class DataGenerationUsingMetaInfo:
 
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None):
         self.api_key = api_key
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_shared_client(self.api_key)
+        self.cache = cache or get_default_cache()
 
     def parse_llm_schema(self, schema_str: str) -> dict:
             """
@@ -46,7 +58,8 @@ class DataGenerationUsingMetaInfo:
         """
         Sends the user prompt to the LLM and returns a JSON schema suggestion.
         """
-        response = self.client.chat.completions.create(
+        metadata_schema_str = self.cache.cached_chat_completion(
+            self.client,
             model="gpt-4",
             messages=[
                 {"role": "system", "content": "You are an assistant designed to create JSON schemas for synthetic data generation. Always respond in valid JSON format. Given a user description, suggest a JSON schema with column names, data types, and constraints."},
@@ -56,25 +69,21 @@ class DataGenerationUsingMetaInfo:
             max_tokens=500
         )
         try:
-            metadata_schema_str = response.choices[0].message.content
             schema = self.parse_llm_schema(metadata_schema_str)
             return schema
 
         except json.JSONDecodeError as e:
-            st.error("Failed to parse LLM response as JSON. Please refine your input.")
-            st.write("🛠️ **Debug Info:** JSON Decode Error")
-            st.write(str(e))
+            logging.error(f'          - failed to parse LLM response as JSON: {e}')
             return {}
 
         except (KeyError, AttributeError) as e:
-            st.error(f"Unexpected response format: {e}")
+            logging.error(f'          - unexpected LLM response format: {e}')
             return {}
 
 
-    def generate_synthetic_data_llm(self, schema, field_ranges, num_records):
+    def build_generation_messages(self, schema, field_ranges, num_records) -> list:
         """
-        Send schema, field ranges, and number of records to LLM for data generation.
-        Here, OpenAI GPT is assumed, replace with your LLM API.
+        Builds the chat messages asking the LLM for `num_records` rows matching the schema.
         """
 
         # Construct the prompt
@@ -89,25 +98,152 @@ class DataGenerationUsingMetaInfo:
         Please generate the data in CSV format with one record per row. Each record should have unique values for fields like employee_id, name, role, designation, salary, and department.
         """
 
-        # Ensure you have the correct model, e.g., "gpt-3.5-turbo"
-        model = "gpt-3.5-turbo"
-
         # Create the messages for the chat API
         messages = [{"role": "system", "content": "You are a helpful assistant for generating synthetic data. Note: when you generate the data, do not add duplicate values in the data. augment the data with different values for each record."}]
         messages.append({"role": "user", "content": prompt})
+        return messages
+
+
+    def plan_record_batches(self, schema, field_ranges):
+        """
+        Records per call and `max_tokens`, from the token width the schema implies,
+        calibrated by the widths observed in earlier responses for the same schema.
+        """
+        prompt_tokens = count_message_tokens(self.build_generation_messages(schema, field_ranges, 10**6),
+                                             GENERATION_MODEL)
+        row_tokens = get_token_calibration().row_tokens(self.calibration_key(schema),
+                                                        estimate_schema_row_tokens(schema, field_ranges, GENERATION_MODEL))
+        fields = schema.get("fields", schema) if isinstance(schema, dict) else schema
+        plan = plan_batches(row_tokens, prompt_tokens, GENERATION_MODEL,
+                            header_tokens=count_tokens(",".join(map(str, fields)), GENERATION_MODEL))
+        logging.info(f'          - batch plan: {plan.to_dict()}')
+        return plan
+
+
+    @staticmethod
+    def calibration_key(schema):
+        return ("metadata", json.dumps(schema, sort_keys=True, default=str))
+
+
+    def request_synthetic_records(self, schema, field_ranges, num_records, use_cache: bool = False,
+                                  max_tokens: int = 2000, cache_variant=None):
+        """
+        Send schema, field ranges, and number of records to LLM for data generation.
+        Here, OpenAI GPT is assumed, replace with your LLM API.
+        Pass `use_cache=True` to replay a cached sample for an identical request.
+        A response cut off by `max_tokens` (finish_reason "length") has its last record dropped.
+        """
+        messages = self.build_generation_messages(schema, field_ranges, num_records)
 
         # Make the API call to OpenAI for chat completion
-        response = self.client.chat.completions.create(
-            model=model,   # Specify the model
+        synthetic_data_response, finish_reason = self.cache.cached_chat_completion(
+            self.client,
+            model=GENERATION_MODEL,   # Specify the model
             messages=messages,  # Pass the messages
-            max_tokens=2000,
+            use_cache=use_cache,
+            cache_variant=cache_variant,
+            return_finish_reason=True,
+            max_tokens=max_tokens,
             n=1,
             temperature=0.7
         )
 
-
-        synthetic_data_response_lines = response.choices[0].message.content.strip().split("\n")
-        csv_data = "\n".join(synthetic_data_response_lines)
+        csv_data = synthetic_data_response.strip()
+        csv_data, _ = drop_truncated_rows(csv_data, complete=finish_reason != "length")
         synthetic_data = pd.read_csv(io.StringIO(csv_data))
+        rows_text = csv_data.split("\n", 1)[1] if "\n" in csv_data else ""
+        get_token_calibration().observe(self.calibration_key(schema), rows_text, len(synthetic_data), GENERATION_MODEL)
+
+        return synthetic_data
+
 
-        return synthetic_data
\ No newline at end of file
+    def generate_synthetic_data_llm(self, schema, field_ranges, num_records, use_cache: bool = False,
+                                    constraints=None, key_columns=None, deduplicate: bool = True,
+                                    max_rounds: int = DEFAULT_MAX_ROUNDS, max_workers: int = DEFAULT_MAX_WORKERS):
+        """
+        Generates `num_records` records in calls sized by `plan_record_batches`, sent
+        concurrently, then keeps only complete, valid and unique records and requests just
+        the shortfall until `num_records` exist or `max_rounds` further rounds were made.
+
+        Args:
+            constraints: A ConstraintSet or a list of constraint specs the records must satisfy.
+            key_columns (list): Columns that must be unique on their own, e.g. ["employee_id", "name"].
+            deduplicate (bool): Reject records repeating an earlier record or key value, across all requests.
+            max_rounds (int): Maximum follow-up rounds for the shortfall.
+            max_workers (int): Maximum calls in flight at once.
+            use_cache (bool): Replay cached responses for an identical request, off by default.
+        """
+        constraints = resolve_constraints(constraints)
+        plan = self.plan_record_batches(schema, field_ranges)
+
+        def request(num_rows, use_cache):
+            # A failed or unparseable batch is skipped; fill_shortfall requests its rows again
+            sizes = plan.batch_sizes(num_rows)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {
+                    executor.submit(self.request_synthetic_records, schema, field_ranges, size, use_cache=use_cache,
+                                    max_tokens=plan.max_tokens_for(size),
+                                    cache_variant=i if len(sizes) > 1 else None): i
+                    for i, size in enumerate(sizes)
+                }
+                batches = {}
+                for future in as_completed(futures):
+                    try:
+                        batches[futures[future]] = future.result()
+                    except Exception as e:
+                        logging.warning(f'          - batch {futures[future]} failed: {e}')
+            if not batches:
+                raise RuntimeError(f"All {len(sizes)} generation batches failed")
+            return pd.concat([batches[i] for i in sorted(batches)], ignore_index=True)
+
+        tracker = UniquenessTracker(key_columns=key_columns, expected_rows=num_records) if deduplicate else None
+
+        def accept(batch, max_rows):
+            if constraints:
+                batch = batch[~constraints.violation_mask(batch)]
+            return tracker.filter(batch, max_rows=max_rows) if tracker else batch.iloc[:max_rows]
+
+        synthetic_data = fill_shortfall(request(num_records, use_cache), accept,
+                                        lambda rows: request(rows, use_cache=False), target=num_records,
+                                        max_rounds=max_rounds, stage="truncation, constraints and deduplication")
+        if tracker:
+            logging.info(f'          - deduplication: {tracker.stats()}')
+        return synthetic_data
+
+
+    def stream_synthetic_data_llm(self, schema, field_ranges, num_records, chunk_rows: int = 100,
+                                  max_rounds: int = DEFAULT_MAX_ROUNDS):
+        """
+        Streaming variant of `generate_synthetic_data_llm`. Yields DataFrame chunks of up to
+        `chunk_rows` records as the CSV lines arrive, using the first line as the header.
+        Records are requested in calls of at most `plan.rows_per_call`; records a call did
+        not deliver (cut off by `max_tokens` or malformed) are requested again, in up to
+        `max_rounds` further calls.
+        """
+        plan = self.plan_record_batches(schema, field_ranges)
+        columns = None
+        remaining = num_records
+        short_calls = 0
+        while remaining > 0:
+            call_records = min(remaining, plan.rows_per_call)
+            stream = self.client.chat.completions.create(
+                model=GENERATION_MODEL,
+                messages=self.build_generation_messages(schema, field_ranges, call_records),
+                max_tokens=plan.max_tokens_for(call_records),
+                n=1,
+                temperature=0.7,
+                stream=True
+            )
+            delivered = 0
+            for chunk in iter_csv_chunks(iter_completion_text(stream), columns=columns, chunk_rows=chunk_rows):
+                chunk = chunk.iloc[:remaining]
+                columns = columns or list(chunk.columns)
+                delivered += len(chunk)
+                remaining -= len(chunk)
+                yield chunk
+            if remaining > 0 and delivered < call_records:
+                short_calls += 1
+                if short_calls > max_rounds:
+                    logging.warning(f'          - {remaining} of {num_records} records still missing after {max_rounds} rounds')
+                    break
+                logging.info(f'          - requesting {call_records - delivered} records missing from a truncated stream (round {short_calls})')
@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+PROFILE_CACHE_SIZE = 32
+SAMPLE_VALUES = 3
+
+
+def dataframe_fingerprint(data: pd.DataFrame) -> str:
+    """
+    Content fingerprint of a DataFrame: values, index, column names and dtypes.
+    """
+    digest = hashlib.sha1()
+    digest.update(repr(list(zip(data.columns, map(str, data.dtypes)))).encode("utf-8"))
+    try:
+        row_hashes = pd.util.hash_pandas_object(data, index=True)
+    except TypeError:
+        # Unhashable cells (lists, arrays) are hashed through their string form
+        row_hashes = pd.util.hash_pandas_object(data.astype(str), index=True)
+    digest.update(row_hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class DatasetProfile:
+    """
+    Column statistics of a DataFrame computed once.
+
+    Attributes:
+        fingerprint (str): Content fingerprint the profile was computed for.
+        num_rows (int): Number of rows.
+        dtypes (pd.Series): Column dtypes.
+        numeric_columns (list): Numeric (non-boolean) columns.
+        categorical_columns (list): All other columns.
+        summary_statistics (pd.DataFrame): Same layout as `describe(include='all').transpose()`.
+        sample_values (dict): Up to three distinct non-null values per non-numeric column.
+    """
+
+    def __init__(self, fingerprint, num_rows, dtypes, numeric_columns, categorical_columns,
+                 summary_statistics, sample_values):
+        self.fingerprint = fingerprint
+        self.num_rows = num_rows
+        self.dtypes = dtypes
+        self.numeric_columns = numeric_columns
+        self.categorical_columns = categorical_columns
+        self.summary_statistics = summary_statistics
+        self.sample_values = sample_values
+
+
+    def column(self, column: str) -> pd.Series:
+        return self.summary_statistics.loc[column]
+
+
+def compute_profile(data: pd.DataFrame, fingerprint: str = None) -> DatasetProfile:
+    """
+    Computes every column statistic in one pass: numeric columns are reduced together as
+    a single float matrix, the other columns through one value count each.
+    """
+    fingerprint = fingerprint or dataframe_fingerprint(data)
+    numeric_columns = [column for column in data.columns
+                       if pd.api.types.is_numeric_dtype(data[column].dtype)
+                       and not pd.api.types.is_bool_dtype(data[column].dtype)]
+    categorical_columns = [column for column in data.columns if column not in numeric_columns]
+
+    statistics = pd.DataFrame(index=data.columns,
+                              columns=['count', 'unique', 'top', 'freq', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+                              dtype=object)
+    statistics['count'] = data.notna().sum()
+
+    if numeric_columns and len(data):
+        values = data[numeric_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        with warnings.catch_warnings():
+            # All-NaN columns and single-row frames yield NaN statistics, as in describe()
+            warnings.simplefilter('ignore', RuntimeWarning)
+            quantiles = np.nanquantile(values, [0.25, 0.5, 0.75], axis=0)
+            statistics.loc[numeric_columns, 'mean'] = np.nanmean(values, axis=0)
+            statistics.loc[numeric_columns, 'std'] = np.nanstd(values, axis=0, ddof=1)
+        for i, name in enumerate(['25%', '50%', '75%']):
+            statistics.loc[numeric_columns, name] = quantiles[i]
+        # Bounds keep the column dtype so large integer identifiers stay exact
+        statistics.loc[numeric_columns, 'min'] = data[numeric_columns].min()
+        statistics.loc[numeric_columns, 'max'] = data[numeric_columns].max()
+
+    sample_values = {}
+    for column in categorical_columns:
+        counts = data[column].value_counts(dropna=True, sort=True)
+        statistics.loc[column, 'unique'] = len(counts)
+        if len(counts):
+            statistics.loc[column, 'top'] = counts.index[0]
+            statistics.loc[column, 'freq'] = counts.iloc[0]
+        sample_values[column] = list(data[column].dropna().unique()[:SAMPLE_VALUES])
+
+    # Drop statistics that do not apply to any column, as describe() does
+    statistics = statistics.dropna(axis=1, how='all')
+    return DatasetProfile(fingerprint=fingerprint,
+                          num_rows=len(data),
+                          dtypes=data.dtypes,
+                          numeric_columns=numeric_columns,
+                          categorical_columns=categorical_columns,
+                          summary_statistics=statistics,
+                          sample_values=sample_values)
+
+
+_profile_cache = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
+def profile_dataframe(data: pd.DataFrame) -> DatasetProfile:
+    """
+    Returns the profile of `data`, reusing the cached one when a DataFrame with the same
+    content has been profiled before.
+    """
+    fingerprint = dataframe_fingerprint(data)
+    with _profile_cache_lock:
+        if fingerprint in _profile_cache:
+            _profile_cache.move_to_end(fingerprint)
+            return _profile_cache[fingerprint]
+
+    profile = compute_profile(data, fingerprint)
+    with _profile_cache_lock:
+        _profile_cache[fingerprint] = profile
+        while len(_profile_cache) > PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+    return profile
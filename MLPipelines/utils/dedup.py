@@ -0,0 +1,263 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+BLOOM_FILTER_MIN_ROWS = int(os.getenv("BLOOM_FILTER_MIN_ROWS", 50_000_000))
+BLOOM_FALSE_POSITIVE_RATE = float(os.getenv("BLOOM_FALSE_POSITIVE_RATE", 0.001))
+HASH_SET_INITIAL_CAPACITY = 1 << 16
+EMPTY_SLOT = np.uint64(0)
+
+
+NULL_TEXT = "\x00null"
+INTEGRAL_TEXT = r"[+-]?\d+(?:\.0*)?"
+# Integral floats below 2**63 are written as integers
+MAX_INTEGRAL_FLOAT = 2.0 ** 63
+
+
+def canonical_numbers(numeric: pd.Series) -> pd.Series:
+    """
+    Text form of float values: integral values as integers (7.0 -> "7"), others by repr.
+    """
+    values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+    integral = np.isfinite(values) & (np.floor(values) == values) & (np.abs(values) < MAX_INTEGRAL_FLOAT)
+    text = pd.Series(values.astype(str), index=numeric.index, dtype=object)
+    text[integral] = values[integral].astype(np.int64).astype(str)
+    return text
+
+
+def canonical_text(values: pd.Series) -> pd.Series:
+    """
+    Text form of a column in which the same number reads the same whatever the dtype it
+    was parsed as: 7, 7.0, "7", "7.0" and "007" all become "7", and every kind of null
+    (None, NaN, NA, NaT) becomes NULL_TEXT.
+    """
+    nulls = values.isna().to_numpy()
+    if pd.api.types.is_bool_dtype(values.dtype):
+        text = values.astype(object).astype(str)
+    elif pd.api.types.is_integer_dtype(values.dtype):
+        text = values.astype(object).astype(str)
+    elif pd.api.types.is_float_dtype(values.dtype):
+        text = canonical_numbers(values)
+    else:
+        text = values.astype(object).astype(str).str.strip()
+        # Integers are rewritten as text, so keys beyond float64 precision stay exact
+        integral = text.str.fullmatch(INTEGRAL_TEXT).fillna(False).to_numpy(dtype=bool)
+        text[integral] = (text[integral].str.replace(r"\.0*$", "", regex=True)
+                          .str.replace(r"^\+", "", regex=True)
+                          .str.replace(r"^(-?)0+(?=\d)", r"\1", regex=True))
+        numeric = pd.to_numeric(text.where(~integral & ~nulls), errors='coerce')
+        parsed = numeric.notna().to_numpy()
+        if parsed.any():
+            text[parsed] = canonical_numbers(numeric[parsed])
+    text[nulls] = NULL_TEXT
+    return text
+
+
+def hash_columns(data: pd.DataFrame, columns=None) -> np.ndarray:
+    """
+    64-bit hash per row over `columns` (all columns by default). Values are hashed by their
+    canonical_text, so 7, 7.0 or "7" from differently parsed batches hash the same.
+    """
+    subset = data if columns is None else data[list(columns)]
+    canonical = pd.DataFrame({position: canonical_text(subset.iloc[:, position])
+                              for position in range(subset.shape[1])}, index=subset.index)
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy(dtype=np.uint64)
+
+
+def first_occurrences(hashes: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of the first occurrence of every distinct hash.
+    """
+    mask = np.zeros(len(hashes), dtype=bool)
+    mask[np.unique(hashes, return_index=True)[1]] = True
+    return mask
+
+
+class HashSet:
+    """
+    Set of uint64 hashes in an open-addressing table (linear probing) held in one NumPy
+    array. Lookups and inserts are vectorised over a whole batch: each probing round handles
+    every pending hash at once, and the table doubles once it is half full.
+    """
+
+    def __init__(self, capacity: int = HASH_SET_INITIAL_CAPACITY):
+        self.table = np.zeros(1 << max(4, int(capacity - 1).bit_length()), dtype=np.uint64)
+        self.size = 0
+
+
+    @staticmethod
+    def _normalise(hashes: np.ndarray) -> np.ndarray:
+        # 0 marks an empty slot
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        return np.where(hashes == EMPTY_SLOT, np.uint64(1), hashes)
+
+
+    def _probe(self, hashes: np.ndarray, insert: bool) -> np.ndarray:
+        """
+        Returns which of the distinct `hashes` were already present, inserting the others
+        when `insert` is set.
+        """
+        mask = np.uint64(len(self.table) - 1)
+        present = np.zeros(len(hashes), dtype=bool)
+        pending = np.arange(len(hashes))
+        slots = hashes & mask
+        while len(pending):
+            current = self.table[slots[pending]]
+            found = current == hashes[pending]
+            present[pending[found]] = True
+            empty = current == EMPTY_SLOT
+            done = found | empty
+            if insert and empty.any():
+                # Several hashes may claim the same empty slot: one write lands, the others
+                # see it on the next round and move on
+                claims = pending[empty]
+                self.table[slots[claims]] = hashes[claims]
+                landed = self.table[slots[claims]] == hashes[claims]
+                self.size += int(landed.sum())
+                done[np.flatnonzero(empty)[~landed]] = False
+            advance = ~done & ~empty
+            slots[pending[advance]] = (slots[pending[advance]] + np.uint64(1)) & mask
+            pending = pending[~done]
+        return present
+
+
+    def _grow(self, extra: int):
+        if (self.size + extra) * 2 <= len(self.table):
+            return
+        stored = self.table[self.table != EMPTY_SLOT]
+        capacity = len(self.table)
+        while (self.size + extra) * 2 > capacity:
+            capacity *= 2
+        self.table = np.zeros(capacity, dtype=np.uint64)
+        self.size = 0
+        self._probe(stored, insert=True)
+
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        return self._probe(self._normalise(hashes), insert=False)
+
+
+    def add(self, hashes: np.ndarray, distinct: bool = False):
+        """
+        Adds `hashes`; pass `distinct=True` when they are known to contain no duplicates
+        to skip deduplicating them first.
+        """
+        hashes = self._normalise(hashes)
+        if not distinct:
+            hashes = np.unique(hashes)
+        self._grow(len(hashes))
+        self._probe(hashes, insert=True)
+
+
+    def __len__(self):
+        return self.size
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over uint64 hashes, for runs too large to keep every hash.
+    Membership can be a false positive (at about `false_positive_rate` once
+    `expected_items` are added), so some unique rows are rejected, never the reverse.
+    """
+
+    def __init__(self, expected_items: int, false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE):
+        num_bits = max(64, int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.num_bits = np.uint64(num_bits)
+        self.num_hashes = max(1, round(num_bits / max(expected_items, 1) * math.log(2)))
+        self.bits = np.zeros((num_bits + 7) // 8, dtype=np.uint8)
+        self.size = 0
+
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        # Double hashing: position_i = h1 + i * h2
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        h1 = hashes
+        h2 = ((hashes * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(29)) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % self.num_bits
+
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        positions = self._positions(hashes)
+        bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+
+    def add(self, hashes: np.ndarray, distinct: bool = False):
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.size += len(hashes)
+
+
+    def __len__(self):
+        return self.size
+
+
+class UniquenessTracker:
+    """
+    Tracks the rows accepted so far across generation batches, so each new batch is
+    filtered against everything generated before in time proportional to the batch only.
+
+    A row is new when its whole-row hash and the hash of each key column (e.g. employee_id,
+    name) have not been seen, neither in earlier batches nor earlier in the same batch.
+    Hashes are kept in a HashSet, or in a BloomFilter when `expected_rows` reaches
+    BLOOM_FILTER_MIN_ROWS.
+
+    Args:
+        key_columns (list): Columns that must each be unique on their own.
+        whole_row (bool): Also reject rows identical to an accepted row.
+        expected_rows (int): Expected number of accepted rows, used to size a Bloom filter.
+        use_bloom_filter (bool): Force (True) or disable (False) the Bloom filter, None decides by size.
+    """
+
+    def __init__(self, key_columns=None, whole_row: bool = True, expected_rows: int = None,
+                 use_bloom_filter: bool = None, false_positive_rate: float = BLOOM_FALSE_POSITIVE_RATE):
+        self.key_columns = list(key_columns or [])
+        self.whole_row = whole_row
+        if use_bloom_filter is None:
+            use_bloom_filter = expected_rows is not None and expected_rows >= BLOOM_FILTER_MIN_ROWS
+        if use_bloom_filter and not expected_rows:
+            raise ValueError("A Bloom filter needs expected_rows to be sized")
+        self.fields = [[column] for column in self.key_columns] + ([None] if whole_row else [])
+        self.stores = [BloomFilter(expected_rows, false_positive_rate) if use_bloom_filter else HashSet()
+                       for _ in self.fields]
+        self.accepted = 0
+        self.rejected = 0
+
+
+    def filter(self, batch: pd.DataFrame, max_rows: int = None) -> pd.DataFrame:
+        """
+        Returns the rows of `batch` that are new, at most `max_rows` of them, and records
+        them as seen.
+        """
+        if batch.empty or not self.fields:
+            return batch.iloc[:max_rows]
+        hashes = [hash_columns(batch, columns) for columns in self.fields]
+        keep = np.ones(len(batch), dtype=bool)
+        for field_hashes, store in zip(hashes, self.stores):
+            keep &= ~store.contains(field_hashes)
+        # Within the batch, keep the first row for each value of every field, in turn
+        for field_hashes in hashes:
+            candidates = np.flatnonzero(keep)
+            keep[candidates[~first_occurrences(field_hashes[candidates])]] = False
+        if max_rows is not None:
+            keep[np.flatnonzero(keep)[max_rows:]] = False
+
+        for field_hashes, store in zip(hashes, self.stores):
+            store.add(field_hashes[keep], distinct=True)
+        accepted = int(keep.sum())
+        self.accepted += accepted
+        self.rejected += len(batch) - accepted
+        return batch[keep]
+
+
+    def stats(self) -> dict:
+        return {
+            "accepted_rows": self.accepted,
+            "rejected_rows": self.rejected,
+            "key_columns": self.key_columns,
+            "store": type(self.stores[0]).__name__ if self.stores else None,
+        }
@@ -1,58 +1,78 @@
+import logging
+import os
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import torch
-from sklearn.manifold import TSNE
 
 import base64
+import hashlib
 from io import BytesIO
 
-from evidently.report import Report
-from evidently.metric_preset import DataDriftPreset
-from transformers import AutoTokenizer, AutoModel
-
-
-from evidently import ColumnMapping
-from evidently.metrics import EmbeddingsDriftMetric
-from evidently.metrics.data_drift.embedding_drift_methods import mmd
-
+# torch, transformers, evidently, matplotlib, seaborn and scikit-learn are imported inside
+# the functions that use them, so importing this module (and starting the API) stays cheap
+
+from utils.data_profiler import profile_dataframe
+from utils.embedding_store import get_embedding_store
+from utils.embedding_backends import (EmbeddingBackend, load_embedding_backend, embed_texts,
+                                      EMBEDDING_BATCH_SIZE, EMBEDDING_NUM_THREADS)
+from utils.embedding_projection import project_embeddings, DEFAULT_MAX_POINTS
+from utils.drift_statistics import detect_drift
+from utils.drift_sketches import IncrementalDriftTracker, MIN_ROWS_FOR_DRIFT
+from utils.mmd import mmd_test
+from utils.executors import run_in_process
+from utils.report_store import report_id_for, HTML_MEDIA_TYPE, PNG_MEDIA_TYPE
+
+def get_default_embedding_backend() -> EmbeddingBackend:
+    """
+    The embedding backend configured through the environment, see `utils.embedding_backends`.
+    Its embeddings are stored under its own model_id, next to those of other backends.
+    """
+    return load_embedding_backend()
 
-_model = None
-_tokenizer = None
 
 def load_model_and_tokenizer():
     """
     Load and cache the model and tokenizer.
     """
-    global _model, _tokenizer
-    if _model is None or _tokenizer is None:
-        print("Loading model and tokenizer...")
-        model_path = "/Users/apple/Documents/Priyesh/Pretrained-Models/all-mpnet-base-v2"
-        _tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
-        _model = AutoModel.from_pretrained(model_path, local_files_only=True)
-        _model.eval()
-    return _tokenizer, _model
+    backend = get_default_embedding_backend()
+    return backend.tokenizer, backend.model
 
 
 def get_embedding(text, tokenizer, model):
     """
     Generate embedding for a single text input.
     """
-    inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-    with torch.no_grad():
-        outputs = model(**inputs)
-    embedding = outputs.last_hidden_state.mean(dim=1).squeeze().cpu().numpy()
-    return embedding
+    return embed_texts([text], tokenizer, model)[0]
+
+
+def embed_with_store(texts, batch_size=EMBEDDING_BATCH_SIZE, num_threads=EMBEDDING_NUM_THREADS,
+                     use_embedding_store=True) -> np.ndarray:
+    """
+    Embeds texts with the configured backend, reusing vectors from the persistent embedding
+    store when enabled. Top-level so it can run in a compute worker process.
+    """
+    backend = get_default_embedding_backend()
+
+    def embed_fn(new_texts):
+        return embed_texts(new_texts, backend.tokenizer, backend.model, batch_size=batch_size,
+                           num_threads=num_threads or backend.num_threads, max_length=backend.max_length)
 
+    if not use_embedding_store:
+        return embed_fn(texts)
+    store = get_embedding_store(backend.model_id, backend.dim)
+    return store.get_or_compute(texts, embed_fn)
 
-def add_png_to_payload(plt):
+
+def figure_to_png(fig) -> bytes:
     buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
+    fig.savefig(buffer, format='png')
+    png = buffer.getvalue()
+    buffer.close()
+    return png
+
 
+def add_png_to_payload(png: bytes):
     # Encode image to Base64
-    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    buffer.close()
+    image_base64 = base64.b64encode(png).decode('utf-8')
 
     # Prepare payload
     payload = {
@@ -68,14 +88,71 @@ def add_html_to_payload(evidently_html):
     return payload
 
 
+def add_report_id_to_payload(report_id, media_type):
+    payload = {
+        "report_id": report_id,
+        "media_type": media_type
+    }
+    return payload
+
+
+def embeddings_matrix(embedded_data) -> np.ndarray:
+    return np.ascontiguousarray(np.vstack(embedded_data['embeddings'].tolist()), dtype=np.float32)
+
+
+def matrix_fingerprint(matrix: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(matrix).tobytes()).hexdigest()
+
+
 
 
 class DriftDetector:
 
+    def __init__(self, batch_size=EMBEDDING_BATCH_SIZE, num_threads=EMBEDDING_NUM_THREADS,
+                 use_embedding_store=True, report_store=None, use_process_pool=False):
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.use_embedding_store = use_embedding_store
+        self.report_store = report_store
+        self.use_process_pool = use_process_pool
+
+
+    def run_compute(self, fn, *args, **kwargs):
+        """
+        Runs a CPU-bound stage, in the shared compute process pool when enabled so the
+        calling thread only waits for it.
+        """
+        if self.use_process_pool:
+            return run_in_process(fn, *args, **kwargs)
+        return fn(*args, **kwargs)
+
+
+    def report_payload(self, report_id, media_type, render_fn, *args) -> dict:
+        """
+        With a report store, registers `render_fn(*args)` to be run on first download and returns
+        the report ID. Without one, renders immediately and inlines the HTML or base64 PNG.
+        `render_fn` is one of the static `render_*` methods, so the store can persist it.
+        """
+        if self.report_store is not None:
+            self.report_store.register(report_id, media_type, render_fn, *args)
+            return add_report_id_to_payload(report_id, media_type)
+        if media_type == PNG_MEDIA_TYPE:
+            return add_png_to_payload(render_fn(*args))
+        return add_html_to_payload(render_fn(*args))
+
+
+    def embed(self, texts) -> np.ndarray:
+        """
+        Embeds texts, reusing vectors from the persistent embedding store when enabled.
+        """
+        return self.run_compute(embed_with_store, list(texts), self.batch_size, self.num_threads,
+                                self.use_embedding_store)
+
+
     def generate_embeddings(self, reference_data, current_data, text_column) -> str:
         """
         Generates an embedding drift report between two datasets using AutoTokenizer and AutoModel.
-        Uses all-mpnet-base-2 model
+        Uses all-mpnet-base-2 model, embedding texts in length-bucketed batches of `self.batch_size`.
         
         Args:
             reference_data (pd.DataFrame): The reference dataset containing text data.
@@ -89,30 +166,86 @@ class DriftDetector:
         if text_column not in reference_data.columns or text_column not in current_data.columns:
             raise ValueError(f"Column '{text_column}' not found in one or both datasets.")
         
-        tokenizer, model = load_model_and_tokenizer()
-        model.eval()
-        
         # Generate embeddings for reference and current data
-        reference_data['embeddings'] = reference_data[text_column].apply(get_embedding, 
-                                                                         tokenizer=tokenizer, 
-                                                                         model=model)
-        
-        current_data['embeddings'] = current_data[text_column].apply(get_embedding, 
-                                                                     tokenizer=tokenizer, 
-                                                                     model=model)
+        for data in (reference_data, current_data):
+            texts = data[text_column].fillna("").astype(str).tolist()
+            embeddings = self.embed(texts)
+            data['embeddings'] = list(embeddings)
 
         return reference_data, current_data
 
 
-    def detect_tabular_drift(self, reference_data: pd.DataFrame, synthetic_data: pd.DataFrame) -> Report:
-        self.report = Report(metrics=[DataDriftPreset()])
-        self.report.run(reference_data=reference_data, current_data=synthetic_data)
-        return add_html_to_payload(self.report.get_html())
+    def detect_tabular_drift(self, reference_data: pd.DataFrame, synthetic_data: pd.DataFrame,
+                             include_html: bool = False) -> dict:
+        """
+        Tests every column for drift with the native KS / PSI / Wasserstein / chi-square engine.
+
+        Args:
+            reference_data (pd.DataFrame): The reference dataset.
+            synthetic_data (pd.DataFrame): The generated dataset.
+            include_html (bool): Also add the Evidently DataDriftPreset HTML report. With a report
+                store the report is registered and only rendered when downloaded.
+
+        Returns:
+            dict: {'drift_summary': per-column results and drift flags} plus 'report_html' when
+                `include_html` is set (or 'report_id' with a report store).
+        """
+        payload = {'drift_summary': self.run_compute(detect_drift, reference_data, synthetic_data)}
+        if include_html:
+            payload.update(self.get_tabular_drift_preset_report(reference_data, synthetic_data))
+        return payload
+
+
+    def create_drift_tracker(self, reference_data: pd.DataFrame, min_rows: int = MIN_ROWS_FOR_DRIFT) -> IncrementalDriftTracker:
+        """
+        Returns a tracker that reports drift against `reference_data` while synthetic chunks are fed
+        to it with `update()`, in bounded memory.
+        """
+        return IncrementalDriftTracker(reference_data, min_rows=min_rows)
+
+
+    def get_tabular_drift_preset_report(self, reference_data: pd.DataFrame, synthetic_data: pd.DataFrame) -> dict:
+        report_id = report_id_for('tabular_drift_preset',
+                                  profile_dataframe(reference_data).fingerprint,
+                                  profile_dataframe(synthetic_data).fingerprint)
+        return self.report_payload(report_id, HTML_MEDIA_TYPE, DriftDetector.render_tabular_drift_preset_report,
+                                   reference_data, synthetic_data)
+
+
+    @staticmethod
+    def render_tabular_drift_preset_report(reference_data: pd.DataFrame, synthetic_data: pd.DataFrame) -> str:
+        from evidently import ColumnMapping
+        from evidently.metric_preset import DataDriftPreset
+        from evidently.report import Report
+
+        # Column types come from the cached reference profile instead of Evidently's own inference
+        reference_profile = profile_dataframe(reference_data)
+        column_mapping = ColumnMapping(numerical_features=reference_profile.numeric_columns,
+                                       categorical_features=reference_profile.categorical_columns)
+        report = Report(metrics=[DataDriftPreset()])
+        report.run(reference_data=reference_data, current_data=synthetic_data,
+                   column_mapping=column_mapping)
+        return report.get_html()
 
     
     def get_textual_data_drift_preset_report(self, embedded_reference_data, embedded_current_data):
-        reference_embeddings = pd.DataFrame(embedded_reference_data['embeddings'].tolist(), columns=[f"dim_{i}" for i in range(len(embedded_reference_data['embeddings'][0]))])
-        current_embeddings = pd.DataFrame(embedded_current_data['embeddings'].tolist(), columns=[f"dim_{i}" for i in range(len(embedded_current_data['embeddings'][0]))])
+        reference_matrix = embeddings_matrix(embedded_reference_data)
+        current_matrix = embeddings_matrix(embedded_current_data)
+        report_id = report_id_for('textual_data_drift_preset',
+                                  matrix_fingerprint(reference_matrix),
+                                  matrix_fingerprint(current_matrix))
+        return self.report_payload(report_id, HTML_MEDIA_TYPE, DriftDetector.render_textual_data_drift_preset_report,
+                                   reference_matrix, current_matrix)
+
+
+    @staticmethod
+    def render_textual_data_drift_preset_report(reference_matrix, current_matrix) -> str:
+        from evidently.metric_preset import DataDriftPreset
+        from evidently.report import Report
+
+        columns = [f"dim_{i}" for i in range(reference_matrix.shape[1])]
+        reference_embeddings = pd.DataFrame(reference_matrix, columns=columns)
+        current_embeddings = pd.DataFrame(current_matrix, columns=columns)
 
         textual_data_drift_preset_report = Report(metrics=[
             DataDriftPreset()
@@ -122,10 +255,11 @@ class DriftDetector:
             reference_data=reference_embeddings,
             current_data=current_embeddings
         )
-        return add_html_to_payload(textual_data_drift_preset_report.get_html())
+        return textual_data_drift_preset_report.get_html()
 
 
-    def get_textual_data_embeddings_countour_plots(self, embedded_reference_data, embedded_current_data):
+    def get_textual_data_embeddings_countour_plots(self, embedded_reference_data, embedded_current_data,
+                                                   projection="tsne", max_points=DEFAULT_MAX_POINTS):
         """
         Generates 3 subplots for embedding contour plots:
         1. Reference Data
@@ -135,28 +269,39 @@ class DriftDetector:
         Args:
             embedded_reference_data (pd.DataFrame): DataFrame with reference embeddings.
             embedded_current_data (pd.DataFrame): DataFrame with current embeddings.
+            projection (str): "tsne", "pca", "randomized_svd" or "random_projection". The
+                linear projections are fitted on the reference set once and reused.
+            max_points (int): Maximum number of points projected, sampled per dataset.
             
         Returns:
-            str: Path to the saved subplot image.
+            dict: The base64 PNG payload, or its report ID when a report store is configured.
         """
-        # Prepare Embeddings DataFrames
-        reference_embeddings = pd.DataFrame(embedded_reference_data['embeddings'].tolist())
-        current_embeddings = pd.DataFrame(embedded_current_data['embeddings'].tolist())
-        
-        reference_embeddings['dataset'] = 'Reference'
-        current_embeddings['dataset'] = 'Current'
-        
-        combined_embeddings = pd.concat([reference_embeddings, current_embeddings], ignore_index=True)
-        labels = combined_embeddings['dataset']
-        combined_embeddings = combined_embeddings.drop(columns=['dataset'])
-        
-        # Dimensionality Reduction using t-SNE
-        print("Performing dimensionality reduction using t-SNE...")
-        tsne = TSNE(n_components=2, random_state=42)
-        reduced_embeddings = tsne.fit_transform(combined_embeddings)
-        
-        reduced_df = pd.DataFrame(reduced_embeddings, columns=['dim1', 'dim2'])
-        reduced_df['dataset'] = labels.values
+        reference_embeddings = embeddings_matrix(embedded_reference_data)
+        current_embeddings = embeddings_matrix(embedded_current_data)
+        report_id = report_id_for('textual_data_embeddings_contour_plots',
+                                  matrix_fingerprint(reference_embeddings),
+                                  matrix_fingerprint(current_embeddings),
+                                  projection, max_points)
+        return self.report_payload(report_id, PNG_MEDIA_TYPE, DriftDetector.render_textual_data_embeddings_countour_plots,
+                                   reference_embeddings, current_embeddings, projection, max_points,
+                                   self.use_process_pool)
+
+
+    @staticmethod
+    def render_textual_data_embeddings_countour_plots(reference_embeddings, current_embeddings,
+                                                      projection, max_points, use_process_pool=False) -> bytes:
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
+        # Dimensionality Reduction
+        logging.info(f'          - performing dimensionality reduction using {projection}')
+        project = run_in_process if use_process_pool else (lambda fn, *args, **kwargs: fn(*args, **kwargs))
+        reduced_reference, reduced_current = project(project_embeddings, reference_embeddings,
+                                                     current_embeddings, method=projection,
+                                                     max_points=max_points)
+
+        reduced_df = pd.DataFrame(np.vstack([reduced_reference, reduced_current]), columns=['dim1', 'dim2'])
+        reduced_df['dataset'] = ['Reference'] * len(reduced_reference) + ['Current'] * len(reduced_current)
         
         # Create Subplots
         fig, axs = plt.subplots(1, 3, figsize=(18, 6))
@@ -203,18 +348,48 @@ class DriftDetector:
         axs[2].legend(title='Dataset')
         
         # Adjust Layout and Save Plot
-        plt.tight_layout()
+        fig.tight_layout()
         textual_data_embeddings_contour_plots_path = './outputs/drift_reports/textual_data/textual_data_embeddings_contour_plots.png'
-        plt.savefig(textual_data_embeddings_contour_plots_path)
-        plt.close()
-        
-        payload = add_png_to_payload(plt)
-        return payload
+        fig.savefig(textual_data_embeddings_contour_plots_path)
+        png = figure_to_png(fig)
+        plt.close(fig)
+        return png
     
 
-    def get_embeddings_drift_reports(self, embedded_reference_data, embedded_current_data):
-        ref_embeddings = embedded_reference_data['embeddings'].to_list()
-        curr_embeddings = embedded_current_data['embeddings'].to_list() 
+    def get_embeddings_drift_reports(self, embedded_reference_data, embedded_current_data,
+                                     mmd_method="auto", pca_components=None, include_html=False):
+        """
+        Tests the embeddings for drift with the native MMD test on float32 matrices.
+
+        Args:
+            mmd_method (str): "auto", "exact", "rff" or "linear", see `utils.mmd.mmd_test`.
+            pca_components (int): Optional PCA reduction before the test.
+            include_html (bool): Also add the Evidently EmbeddingsDriftMetric HTML report. With a
+                report store the report is registered and only rendered when downloaded.
+
+        Returns:
+            dict: {'mmd_summary': MMD statistic, p-value and drift flag} plus 'report_html' when
+                `include_html` is set (or 'report_id' with a report store).
+        """
+        reference_matrix = embeddings_matrix(embedded_reference_data)
+        current_matrix = embeddings_matrix(embedded_current_data)
+        payload = {'mmd_summary': self.run_compute(mmd_test, reference_matrix, current_matrix, method=mmd_method,
+                                                   pca_components=pca_components)}
+        if include_html:
+            report_id = report_id_for('textual_embeddings_drift_mmd',
+                                      matrix_fingerprint(reference_matrix),
+                                      matrix_fingerprint(current_matrix))
+            payload.update(self.report_payload(report_id, HTML_MEDIA_TYPE, DriftDetector.render_embeddings_drift_report,
+                                               reference_matrix, current_matrix))
+        return payload
+
+
+    @staticmethod
+    def render_embeddings_drift_report(ref_embeddings, curr_embeddings) -> str:
+        from evidently import ColumnMapping
+        from evidently.metrics import EmbeddingsDriftMetric
+        from evidently.metrics.data_drift.embedding_drift_methods import mmd
+        from evidently.report import Report
 
         ref_embeddings_df = pd.DataFrame(ref_embeddings)
         ref_embeddings_df.columns = ['col_' + str(x) for x in ref_embeddings_df.columns]
@@ -239,10 +414,12 @@ class DriftDetector:
                                     column_mapping=column_mapping)
         
     
-        return add_html_to_payload(embedding_drif_mmd_report.get_html())
+        return embedding_drif_mmd_report.get_html()
     
 
-    def textual_data_drift_reports(self, reference_data, current_data, text_column):
+    def textual_data_drift_reports(self, reference_data, current_data, text_column,
+                                   projection="tsne", max_points=DEFAULT_MAX_POINTS,
+                                   mmd_method="auto", pca_components=None):
         embedded_reference_data, embedded_current_data = self.generate_embeddings(reference_data,
                                                                                   current_data,
                                                                                   text_column)
@@ -251,10 +428,14 @@ class DriftDetector:
                                                                                           embedded_current_data)
         
         textual_data_embeddings_countour_plots = self.get_textual_data_embeddings_countour_plots(embedded_reference_data,
-                                                                                                      embedded_current_data)
+                                                                                                      embedded_current_data,
+                                                                                                      projection=projection,
+                                                                                                      max_points=max_points)
         
         textual_embeddings_drift_mmd_report = self.get_embeddings_drift_reports(embedded_reference_data,
-                                                                                    embedded_current_data)
+                                                                                    embedded_current_data,
+                                                                                    mmd_method=mmd_method,
+                                                                                    pca_components=pca_components)
         
         textual_drift_report_payload = {}
         textual_drift_report_payload['textual_data_drift_preset'] = textual_data_drift_preset_report
@@ -0,0 +1,334 @@
+import copy
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.data_profiler import profile_dataframe
+from utils.statistical_generator import infer_date_column
+from utils.drift_statistics import (NUM_BINS, P_VALUE_THRESHOLD, WASSERSTEIN_THRESHOLD, KS_MAX_SAMPLE_SIZE,
+                                    DRIFT_SHARE_THRESHOLD, EPSILON, population_stability_index)
+
+QUANTILE_SKETCH_BINS = 512
+MIN_ROWS_FOR_DRIFT = 50
+SKETCH_CACHE_SIZE = 16
+# Categories tracked per column; rarer reference values and unseen values share one bucket
+MAX_SKETCH_CATEGORIES = 256
+
+
+class HistogramSketch:
+    """
+    Counts over fixed bin edges. Values outside the edges fall into the outer bins.
+    Sketches with the same edges merge by adding counts.
+    """
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = edges
+        self.counts = np.zeros(max(len(edges) - 1, 1), dtype=np.int64)
+
+
+    def update(self, values: np.ndarray):
+        bins = np.searchsorted(self.edges[1:-1], values, side='right')
+        self.counts += np.bincount(bins, minlength=len(self.counts))
+
+
+    def merge(self, other: "HistogramSketch"):
+        self.counts += other.counts
+
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+
+    def proportions(self) -> np.ndarray:
+        return self.counts / max(self.total, 1)
+
+
+class QuantileSketch(HistogramSketch):
+    """
+    Fine equal-width histogram over the reference range, with the exact minimum and maximum
+    tracked separately. Gives mergeable approximate CDFs and quantiles in bounded memory.
+    """
+
+    def __init__(self, low: float, high: float, num_bins: int = QUANTILE_SKETCH_BINS):
+        if high <= low:
+            high = low + 1.0
+        super().__init__(np.linspace(low, high, num_bins + 1))
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+
+    def update(self, values: np.ndarray):
+        if len(values):
+            super().update(values)
+            self.minimum = min(self.minimum, float(values.min()))
+            self.maximum = max(self.maximum, float(values.max()))
+
+
+    def merge(self, other: "QuantileSketch"):
+        super().merge(other)
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+
+    def cdf(self) -> np.ndarray:
+        return np.cumsum(self.counts) / max(self.total, 1)
+
+
+    def quantile(self, q):
+        cdf = self.cdf()
+        index = np.searchsorted(cdf, q, side='left')
+        centers = (self.edges[:-1] + self.edges[1:]) / 2
+        return np.clip(centers[np.minimum(index, len(centers) - 1)], self.minimum, self.maximum)
+
+
+class CategoricalCounter:
+    """
+    Counts over a fixed list of categories (the most frequent reference values) plus one
+    bucket for every other value, so memory does not grow with high-cardinality columns
+    such as identifiers. Counters with the same categories merge by adding counts.
+    """
+
+    OTHER = "__other__"
+
+    def __init__(self, categories):
+        self.categories = pd.Index(categories)
+        self.values = np.zeros(len(self.categories) + 1, dtype=np.int64)
+
+
+    def update(self, values: pd.Series):
+        codes = self.categories.get_indexer(values.dropna().astype(str))
+        # Values outside the tracked categories (code -1) go to the last bucket
+        self.values += np.bincount(np.where(codes < 0, len(self.categories), codes), minlength=len(self.values))
+
+
+    def merge(self, other: "CategoricalCounter"):
+        self.values += other.values
+
+
+    @property
+    def counts(self) -> pd.Series:
+        counts = pd.Series(self.values, index=list(self.categories) + [self.OTHER])
+        return counts[counts > 0]
+
+
+    @property
+    def total(self) -> int:
+        return int(self.values.sum())
+
+
+class ColumnSketches:
+    """
+    Sketches of one side (reference or synthetic) of every tracked column. Date columns,
+    including dates stored as strings, are sketched as numbers (nanoseconds since epoch).
+    """
+
+    def __init__(self, numerical_edges: dict, numerical_ranges: dict, categories: dict, date_columns=()):
+        self.num_rows = 0
+        self.date_columns = set(date_columns)
+        self.histograms = {column: HistogramSketch(edges) for column, edges in numerical_edges.items()}
+        self.quantiles = {column: QuantileSketch(*numerical_ranges[column]) for column in numerical_edges}
+        self.categorical = {column: CategoricalCounter(values) for column, values in categories.items()}
+
+
+    def numeric_values(self, column: str, values: pd.Series) -> np.ndarray:
+        if column in self.date_columns:
+            return date_values(values)
+        return pd.to_numeric(values, errors='coerce').dropna().to_numpy(dtype=np.float64)
+
+
+    def update(self, chunk: pd.DataFrame):
+        self.num_rows += len(chunk)
+        for column in self.histograms:
+            if column in chunk.columns:
+                values = self.numeric_values(column, chunk[column])
+                self.histograms[column].update(values)
+                self.quantiles[column].update(values)
+        for column, counter in self.categorical.items():
+            if column in chunk.columns:
+                counter.update(chunk[column])
+
+
+    def merge(self, other: "ColumnSketches"):
+        self.num_rows += other.num_rows
+        for column in self.histograms:
+            self.histograms[column].merge(other.histograms[column])
+            self.quantiles[column].merge(other.quantiles[column])
+        for column in self.categorical:
+            self.categorical[column].merge(other.categorical[column])
+
+
+def date_values(values: pd.Series) -> np.ndarray:
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed').dropna()
+    return parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+
+
+def build_reference_sketches(reference_data: pd.DataFrame,
+                             max_categories: int = MAX_SKETCH_CATEGORIES) -> ColumnSketches:
+    profile = profile_dataframe(reference_data)
+    date_columns = [column for column in profile.categorical_columns
+                    if pd.api.types.is_datetime64_any_dtype(reference_data[column].dtype)
+                    or infer_date_column(reference_data[column]) is not None]
+    numerical_edges, numerical_ranges, categories = {}, {}, {}
+    for column in list(profile.numeric_columns) + date_columns:
+        values = date_values(reference_data[column]) if column in date_columns \
+            else reference_data[column].dropna().to_numpy(dtype=np.float64)
+        if not len(values):
+            continue
+        numerical_edges[column] = np.unique(np.quantile(values, np.linspace(0, 1, NUM_BINS + 1)))
+        numerical_ranges[column] = (float(values.min()), float(values.max()))
+    for column in profile.categorical_columns:
+        if column not in date_columns:
+            frequencies = reference_data[column].dropna().astype(str).value_counts().iloc[:max_categories]
+            # Values seen once (e.g. unique identifiers) carry no frequency and stay in the shared bucket
+            categories[column] = frequencies.index[frequencies.to_numpy() > 1]
+    sketches = ColumnSketches(numerical_edges, numerical_ranges, categories, date_columns)
+    sketches.update(reference_data)
+    return sketches
+
+
+_reference_sketches = OrderedDict()
+_reference_sketches_lock = threading.Lock()
+
+def get_reference_sketches(reference_data: pd.DataFrame) -> ColumnSketches:
+    fingerprint = profile_dataframe(reference_data).fingerprint
+    with _reference_sketches_lock:
+        if fingerprint in _reference_sketches:
+            _reference_sketches.move_to_end(fingerprint)
+            return _reference_sketches[fingerprint]
+    sketches = build_reference_sketches(reference_data)
+    with _reference_sketches_lock:
+        _reference_sketches[fingerprint] = sketches
+        while len(_reference_sketches) > SKETCH_CACHE_SIZE:
+            _reference_sketches.popitem(last=False)
+    return sketches
+
+
+class IncrementalDriftTracker:
+    """
+    Tracks drift of a synthetic table while it is being generated.
+
+    Reference sketches (histograms on reference quantile bins, fine quantile sketches,
+    and counters over the top MAX_SKETCH_CATEGORIES categories) are built once per
+    reference DataFrame. Date columns are compared as numbers, not as categories. Each synthetic chunk
+    only updates the synthetic-side sketches, so memory stays bounded however many rows
+    are generated. `report()` can be called at any point and returns the same summary
+    layout as the native drift engine. Trackers fed from different workers can be merged.
+    """
+
+    def __init__(self, reference_data: pd.DataFrame, min_rows: int = MIN_ROWS_FOR_DRIFT):
+        self.reference = get_reference_sketches(reference_data)
+        self.current = ColumnSketches({column: sketch.edges for column, sketch in self.reference.histograms.items()},
+                                      {column: (sketch.edges[0], sketch.edges[-1])
+                                       for column, sketch in self.reference.quantiles.items()},
+                                      {column: counter.categories
+                                       for column, counter in self.reference.categorical.items()},
+                                      self.reference.date_columns)
+        self.min_rows = min_rows
+
+
+    def update(self, chunk: pd.DataFrame) -> "IncrementalDriftTracker":
+        self.current.update(chunk)
+        return self
+
+
+    def merge(self, other: "IncrementalDriftTracker") -> "IncrementalDriftTracker":
+        self.current.merge(other.current)
+        return self
+
+
+    def copy(self) -> "IncrementalDriftTracker":
+        tracker = copy.copy(self)
+        tracker.current = copy.deepcopy(self.current)
+        return tracker
+
+
+    def _numerical_result(self, column: str) -> dict:
+        from scipy.stats import kstwo
+
+        reference_q, current_q = self.reference.quantiles[column], self.current.quantiles[column]
+        n, m = reference_q.total, current_q.total
+        if not n or not m:
+            return {"type": "numerical", "stattest": None, "drift_detected": False}
+
+        cdf_difference = reference_q.cdf() - current_q.cdf()
+        ks = float(np.max(np.abs(cdf_difference)))
+        p_value = float(kstwo.sf(ks, np.round(n * m / (n + m))))
+        bin_width = reference_q.edges[1] - reference_q.edges[0]
+        reference_std = self._sketch_std(reference_q)
+        wasserstein = float(np.sum(np.abs(cdf_difference)) * bin_width)
+        wasserstein_normed = wasserstein / reference_std if reference_std > 0 else float(wasserstein > 0)
+        psi = population_stability_index(self.reference.histograms[column].proportions(),
+                                         self.current.histograms[column].proportions())
+
+        if n <= KS_MAX_SAMPLE_SIZE:
+            stattest, drift_detected = "ks", p_value < P_VALUE_THRESHOLD
+        else:
+            stattest, drift_detected = "wasserstein", wasserstein_normed > WASSERSTEIN_THRESHOLD
+        return {
+            "type": "numerical",
+            "stattest": stattest,
+            "ks_statistic": ks,
+            "p_value": p_value,
+            "wasserstein_normed": wasserstein_normed,
+            "psi": psi,
+            "median": float(current_q.quantile(0.5)),
+            "drift_detected": bool(drift_detected),
+        }
+
+
+    @staticmethod
+    def _sketch_std(sketch: QuantileSketch) -> float:
+        centers = (sketch.edges[:-1] + sketch.edges[1:]) / 2
+        weights = sketch.proportions()
+        mean = np.sum(centers * weights)
+        return float(np.sqrt(np.sum(weights * (centers - mean) ** 2)))
+
+
+    def _categorical_result(self, column: str) -> dict:
+        from scipy.stats import chi2
+
+        reference_counts = self.reference.categorical[column].counts
+        current_counts = self.current.categorical[column].counts
+        if reference_counts.empty or current_counts.empty:
+            return {"type": "categorical", "stattest": None, "drift_detected": False}
+
+        categories = reference_counts.index.union(current_counts.index)
+        expected_proportions = (reference_counts / reference_counts.sum()).reindex(categories, fill_value=0).to_numpy()
+        observed = current_counts.reindex(categories, fill_value=0).to_numpy(dtype=np.float64)
+        expected = np.clip(expected_proportions, EPSILON, None) * observed.sum()
+        statistic = float(np.sum((observed - expected) ** 2 / expected))
+        p_value = float(chi2.sf(statistic, max(len(categories) - 1, 1)))
+        return {
+            "type": "categorical",
+            "stattest": "chisquare",
+            "chi2_statistic": statistic,
+            "p_value": p_value,
+            "psi": population_stability_index(expected_proportions, observed / observed.sum()),
+            "drift_detected": bool(p_value < P_VALUE_THRESHOLD),
+        }
+
+
+    def report(self) -> dict:
+        columns = {column: self._numerical_result(column) for column in self.reference.quantiles}
+        columns.update({column: self._categorical_result(column) for column in self.reference.categorical})
+        drifted = sum(result["drift_detected"] for result in columns.values())
+        drift_share = drifted / len(columns) if columns else 0.0
+        return {
+            "engine": "sketch",
+            "rows_seen": self.current.num_rows,
+            "number_of_columns": len(columns),
+            "number_of_drifted_columns": drifted,
+            "share_of_drifted_columns": drift_share,
+            "dataset_drift": bool(self.current.num_rows >= self.min_rows and drift_share >= DRIFT_SHARE_THRESHOLD),
+            "columns": columns,
+        }
+
+
+    def drift_detected(self) -> bool:
+        """
+        True once at least `min_rows` synthetic rows have been seen and the dataset drifts.
+        """
+        return self.current.num_rows >= self.min_rows and self.report()["dataset_drift"]
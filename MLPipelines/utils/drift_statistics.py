@@ -0,0 +1,194 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.data_profiler import profile_dataframe
+
+NUM_BINS = 10
+P_VALUE_THRESHOLD = 0.05
+WASSERSTEIN_THRESHOLD = 0.1
+PSI_THRESHOLD = 0.2
+KS_MAX_SAMPLE_SIZE = 1000
+DRIFT_SHARE_THRESHOLD = 0.5
+EPSILON = 1e-6
+BASELINE_CACHE_SIZE = 16
+
+
+def ks_statistic(reference_sorted: np.ndarray, current_sorted: np.ndarray):
+    """
+    Two-sample Kolmogorov-Smirnov statistic and asymptotic p-value from sorted samples.
+    """
+    from scipy.stats import kstwo
+
+    n, m = len(reference_sorted), len(current_sorted)
+    points = np.concatenate([reference_sorted, current_sorted])
+    cdf_reference = np.searchsorted(reference_sorted, points, side='right') / n
+    cdf_current = np.searchsorted(current_sorted, points, side='right') / m
+    statistic = float(np.max(np.abs(cdf_reference - cdf_current)))
+    effective_n = n * m / (n + m)
+    return statistic, float(kstwo.sf(statistic, np.round(effective_n)))
+
+
+def wasserstein_from_sorted(reference_sorted: np.ndarray, current_sorted: np.ndarray) -> float:
+    """
+    First Wasserstein distance between two 1D samples, computed from their sorted values.
+    """
+    points = np.concatenate([reference_sorted, current_sorted])
+    points.sort(kind='mergesort')
+    deltas = np.diff(points)
+    cdf_reference = np.searchsorted(reference_sorted, points[:-1], side='right') / len(reference_sorted)
+    cdf_current = np.searchsorted(current_sorted, points[:-1], side='right') / len(current_sorted)
+    return float(np.sum(np.abs(cdf_reference - cdf_current) * deltas))
+
+
+def population_stability_index(reference_proportions: np.ndarray, current_proportions: np.ndarray) -> float:
+    p = np.clip(reference_proportions, EPSILON, None)
+    q = np.clip(current_proportions, EPSILON, None)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+class ReferenceBaseline:
+    """
+    Reference side of the native drift tests, prepared once per reference DataFrame:
+    sorted values, quantile bin edges and bin proportions for numerical columns,
+    category frequencies for categorical columns.
+    """
+
+    def __init__(self, reference_data: pd.DataFrame, num_bins: int = NUM_BINS):
+        profile = profile_dataframe(reference_data)
+        self.numerical_columns = list(profile.numeric_columns)
+        self.categorical_columns = list(profile.categorical_columns)
+        self.numerical = {}
+        self.categorical = {}
+
+        for column in self.numerical_columns:
+            values = reference_data[column].dropna().to_numpy(dtype=np.float64)
+            values.sort()
+            edges = np.unique(np.quantile(values, np.linspace(0, 1, num_bins + 1))) if len(values) else np.array([0.0])
+            counts = self._bin_counts(values, edges)
+            self.numerical[column] = {
+                "sorted": values,
+                "edges": edges,
+                "proportions": counts / max(counts.sum(), 1),
+                "std": float(values.std()) if len(values) else 0.0,
+            }
+
+        for column in self.categorical_columns:
+            frequencies = reference_data[column].dropna().astype(str).value_counts(normalize=True)
+            self.categorical[column] = frequencies
+
+
+    @staticmethod
+    def _bin_counts(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        # Interior edges only, so values outside the reference range fall in the outer bins
+        bins = np.searchsorted(edges[1:-1], values, side='right')
+        return np.bincount(bins, minlength=max(len(edges) - 1, 1)).astype(np.float64)
+
+
+    def compare_numerical(self, column: str, current: np.ndarray) -> dict:
+        baseline = self.numerical[column]
+        reference_sorted = baseline["sorted"]
+        current_sorted = np.sort(current)
+        if not len(reference_sorted) or not len(current_sorted):
+            return {"type": "numerical", "stattest": None, "drift_detected": False}
+
+        ks, p_value = ks_statistic(reference_sorted, current_sorted)
+        wasserstein = wasserstein_from_sorted(reference_sorted, current_sorted)
+        wasserstein_normed = wasserstein / baseline["std"] if baseline["std"] > 0 else float(wasserstein > 0)
+        counts = self._bin_counts(current_sorted, baseline["edges"])
+        psi = population_stability_index(baseline["proportions"], counts / counts.sum())
+
+        # Same rule as Evidently: KS on small samples, normed Wasserstein on large ones
+        if len(reference_sorted) <= KS_MAX_SAMPLE_SIZE:
+            stattest, drift_detected = "ks", p_value < P_VALUE_THRESHOLD
+        else:
+            stattest, drift_detected = "wasserstein", wasserstein_normed > WASSERSTEIN_THRESHOLD
+        return {
+            "type": "numerical",
+            "stattest": stattest,
+            "ks_statistic": ks,
+            "p_value": p_value,
+            "wasserstein_normed": wasserstein_normed,
+            "psi": psi,
+            "drift_detected": bool(drift_detected),
+        }
+
+
+    def compare_categorical(self, column: str, current: pd.Series) -> dict:
+        from scipy.stats import chi2
+
+        reference_frequencies = self.categorical[column]
+        current_counts = current.dropna().astype(str).value_counts()
+        if reference_frequencies.empty or current_counts.empty:
+            return {"type": "categorical", "stattest": None, "drift_detected": False}
+
+        categories = reference_frequencies.index.union(current_counts.index)
+        expected_proportions = reference_frequencies.reindex(categories, fill_value=0).to_numpy()
+        observed = current_counts.reindex(categories, fill_value=0).to_numpy(dtype=np.float64)
+        expected = np.clip(expected_proportions, EPSILON, None) * observed.sum()
+        statistic = float(np.sum((observed - expected) ** 2 / expected))
+        p_value = float(chi2.sf(statistic, max(len(categories) - 1, 1)))
+        psi = population_stability_index(expected_proportions, observed / observed.sum())
+        return {
+            "type": "categorical",
+            "stattest": "chisquare",
+            "chi2_statistic": statistic,
+            "p_value": p_value,
+            "psi": psi,
+            "drift_detected": bool(p_value < P_VALUE_THRESHOLD),
+        }
+
+
+    def compare(self, current_data: pd.DataFrame) -> dict:
+        """
+        Runs the drift test of every reference column against `current_data`.
+
+        Returns:
+            dict: JSON-serialisable summary with per-column statistics and drift flags.
+        """
+        columns = {}
+        for column in self.numerical_columns:
+            if column in current_data.columns:
+                current = pd.to_numeric(current_data[column], errors='coerce').dropna().to_numpy(dtype=np.float64)
+                columns[column] = self.compare_numerical(column, current)
+        for column in self.categorical_columns:
+            if column in current_data.columns:
+                columns[column] = self.compare_categorical(column, current_data[column])
+
+        drifted = sum(result["drift_detected"] for result in columns.values())
+        drift_share = drifted / len(columns) if columns else 0.0
+        return {
+            "engine": "native",
+            "number_of_columns": len(columns),
+            "number_of_drifted_columns": drifted,
+            "share_of_drifted_columns": drift_share,
+            "dataset_drift": bool(drift_share >= DRIFT_SHARE_THRESHOLD),
+            "columns": columns,
+        }
+
+
+_baselines = OrderedDict()
+_baselines_lock = threading.Lock()
+
+def get_reference_baseline(reference_data: pd.DataFrame) -> ReferenceBaseline:
+    """
+    Returns the baseline for `reference_data`, reusing the one built for identical content.
+    """
+    fingerprint = profile_dataframe(reference_data).fingerprint
+    with _baselines_lock:
+        if fingerprint in _baselines:
+            _baselines.move_to_end(fingerprint)
+            return _baselines[fingerprint]
+
+    baseline = ReferenceBaseline(reference_data)
+    with _baselines_lock:
+        _baselines[fingerprint] = baseline
+        while len(_baselines) > BASELINE_CACHE_SIZE:
+            _baselines.popitem(last=False)
+    return baseline
+
+
+def detect_drift(reference_data: pd.DataFrame, current_data: pd.DataFrame) -> dict:
+    return get_reference_baseline(reference_data).compare(current_data)
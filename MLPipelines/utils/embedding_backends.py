@@ -0,0 +1,214 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "sentence-transformers/all-mpnet-base-v2")
+EMBEDDING_LOCAL_FILES_ONLY = os.getenv("EMBEDDING_LOCAL_FILES_ONLY", "0") == "1"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "fp32")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_NUM_THREADS = int(os.getenv("EMBEDDING_NUM_THREADS", 0)) or None
+EMBEDDING_MAX_LENGTH = int(os.getenv("EMBEDDING_MAX_LENGTH", 512))
+
+
+def get_model_identifier(model_path):
+    """
+    Identifies a model by its path and the modification time of its weights config, so
+    embeddings cached for a replaced model are not reused.
+    """
+    config_path = os.path.join(model_path, "config.json")
+    mtime = os.path.getmtime(config_path) if os.path.exists(config_path) else 0
+    return f"{model_path}@{mtime:.0f}"
+
+
+def mean_pool(last_hidden_state, attention_mask):
+    """
+    Averages token embeddings over the real tokens only, ignoring padding.
+    """
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    summed = (last_hidden_state * mask).sum(dim=1)
+    counts = mask.sum(dim=1).clamp(min=1e-9)
+    return summed / counts
+
+
+def embed_texts(texts, tokenizer, model, batch_size=EMBEDDING_BATCH_SIZE,
+                num_threads=EMBEDDING_NUM_THREADS, max_length=EMBEDDING_MAX_LENGTH) -> np.ndarray:
+    """
+    Embeds a list of texts in batches.
+
+    Texts are tokenized once, sorted by token length so each batch holds texts of similar
+    length, and padded per batch only up to the longest text in it.
+
+    Args:
+        texts (list): Texts to embed.
+        tokenizer: Hugging Face tokenizer.
+        model: Hugging Face model.
+        batch_size (int): Number of texts per forward pass.
+        num_threads (int): torch intra-op threads, None keeps the torch default.
+        max_length (int): Maximum tokens per text.
+
+    Returns:
+        np.ndarray: C-contiguous float32 matrix of shape (len(texts), hidden_size) in input order.
+    """
+    import torch
+
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    hidden_size = model.config.hidden_size
+    if len(texts) == 0:
+        return np.empty((0, hidden_size), dtype=np.float32)
+
+    encodings = tokenizer(list(texts), truncation=True, max_length=max_length, padding=False)
+    lengths = np.fromiter((len(ids) for ids in encodings["input_ids"]), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind="stable")
+
+    embeddings = np.empty((len(texts), hidden_size), dtype=np.float32)
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            features = [{key: encodings[key][i] for key in encodings.keys()} for i in batch_indices]
+            inputs = tokenizer.pad(features, padding=True, return_tensors="pt")
+            outputs = model(**inputs)
+            pooled = mean_pool(outputs.last_hidden_state, inputs["attention_mask"])
+            embeddings[batch_indices] = pooled.float().cpu().numpy()
+    return np.ascontiguousarray(embeddings)
+
+
+class EmbeddingBackend:
+    """
+    A loaded tokenizer and model plus the settings that change its vectors.
+
+    `model_id` covers the model files, the backend and the max sequence length, so the
+    embedding store never mixes vectors from different variants.
+    """
+
+    def __init__(self, name: str, tokenizer, model, model_path: str,
+                 max_length: int = EMBEDDING_MAX_LENGTH, num_threads: int = EMBEDDING_NUM_THREADS):
+        self.name = name
+        self.tokenizer = tokenizer
+        self.model = model
+        self.model_path = model_path
+        self.max_length = max_length
+        self.num_threads = num_threads
+        self.model_id = f"{get_model_identifier(model_path)}:{name}:{max_length}"
+
+
+    @property
+    def dim(self) -> int:
+        return self.model.config.hidden_size
+
+
+    def embed(self, texts, batch_size: int = EMBEDDING_BATCH_SIZE) -> np.ndarray:
+        return embed_texts(texts, self.tokenizer, self.model, batch_size=batch_size,
+                           num_threads=self.num_threads, max_length=self.max_length)
+
+
+def load_fp32_model(model_path: str):
+    from transformers import AutoTokenizer, AutoModel
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=EMBEDDING_LOCAL_FILES_ONLY)
+    model = AutoModel.from_pretrained(model_path, local_files_only=EMBEDDING_LOCAL_FILES_ONLY)
+    model.eval()
+    return tokenizer, model
+
+
+def load_int8_model(model_path: str):
+    """
+    fp32 model with every Linear layer dynamically quantized to int8 for CPU inference:
+    weights are stored as int8 and activations are quantized per batch at run time.
+    """
+    import torch
+
+    tokenizer, model = load_fp32_model(model_path)
+    if torch.backends.quantized.engine == "none":
+        supported = torch.backends.quantized.supported_engines
+        torch.backends.quantized.engine = "fbgemm" if "fbgemm" in supported else "qnnpack"
+    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    model.eval()
+    return tokenizer, model
+
+
+# Backend name -> loader(model_path) returning (tokenizer, model)
+EMBEDDING_BACKENDS = {
+    "fp32": load_fp32_model,
+    "int8": load_int8_model,
+}
+
+
+def register_embedding_backend(name: str, loader):
+    EMBEDDING_BACKENDS[name] = loader
+
+
+_loaded_backends = {}
+_loaded_backends_lock = threading.Lock()
+
+def load_embedding_backend(name: str = None, model_path: str = None, max_length: int = None,
+                           num_threads: int = None) -> EmbeddingBackend:
+    """
+    Loads a registered backend once per process. Arguments left as None come from the
+    EMBEDDING_BACKEND, EMBEDDING_MODEL_PATH, EMBEDDING_MAX_LENGTH and EMBEDDING_NUM_THREADS
+    environment variables.
+    """
+    name = name or EMBEDDING_BACKEND
+    model_path = model_path or EMBEDDING_MODEL_PATH
+    max_length = max_length or EMBEDDING_MAX_LENGTH
+    num_threads = num_threads or EMBEDDING_NUM_THREADS
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {sorted(EMBEDDING_BACKENDS)}")
+
+    key = (name, model_path, max_length, num_threads)
+    with _loaded_backends_lock:
+        if key not in _loaded_backends:
+            logging.info(f'          - loading {name} embedding backend from {model_path}')
+            if num_threads:
+                import torch
+
+                torch.set_num_threads(num_threads)
+            tokenizer, model = EMBEDDING_BACKENDS[name](model_path)
+            _loaded_backends[key] = EmbeddingBackend(name, tokenizer, model, model_path, max_length, num_threads)
+        return _loaded_backends[key]
+
+
+def compare_embedding_backends(texts, candidate: str = "int8", baseline: str = "fp32",
+                               batch_size: int = EMBEDDING_BATCH_SIZE, **backend_options) -> dict:
+    """
+    Embeds `texts` with both backends and reports their throughput and how closely the
+    candidate's vectors agree with the baseline's (cosine similarity per text).
+    """
+    results = {}
+    embeddings = {}
+    for name in (baseline, candidate):
+        backend = load_embedding_backend(name, **backend_options)
+        # One untimed batch so lazy initialisation does not count against throughput
+        backend.embed(texts[:batch_size], batch_size=batch_size)
+        started = time.perf_counter()
+        embeddings[name] = backend.embed(texts, batch_size=batch_size)
+        seconds = time.perf_counter() - started
+        results[name] = {"seconds": seconds, "texts_per_second": len(texts) / seconds if seconds else None}
+
+    reference, candidate_vectors = embeddings[baseline], embeddings[candidate]
+    cosine = np.sum(reference * candidate_vectors, axis=1) / np.maximum(
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate_vectors, axis=1), 1e-12)
+    results["speedup"] = results[baseline]["seconds"] / results[candidate]["seconds"]
+    results["cosine_agreement"] = {
+        "mean": float(cosine.mean()),
+        "min": float(cosine.min()),
+        "p01": float(np.quantile(cosine, 0.01)),
+    }
+    return results
+
+
+if __name__ == "__main__":
+    # python -m utils.embedding_backends <csv_path> <text_column> [max_texts]
+    import pandas as pd
+
+    texts = pd.read_csv(sys.argv[1])[sys.argv[2]].dropna().astype(str).tolist()
+    texts = texts[:int(sys.argv[3])] if len(sys.argv) > 3 else texts
+    report = compare_embedding_backends(texts)
+    for name in ("fp32", "int8"):
+        print(f"{name}: {report[name]['texts_per_second']:.1f} texts/s")
+    print(f"speedup: {report['speedup']:.2f}x, cosine mean {report['cosine_agreement']['mean']:.4f}, "
+          f"min {report['cosine_agreement']['min']:.4f}")
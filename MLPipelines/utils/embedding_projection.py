@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+PROJECTION_METHODS = ("tsne", "pca", "randomized_svd", "random_projection")
+DEFAULT_MAX_POINTS = 2000
+PROJECTION_CACHE_SIZE = 8
+
+
+def stratified_sample_indices(labels: np.ndarray, max_points: int, random_state=42) -> np.ndarray:
+    """
+    Returns sorted row indices keeping at most `max_points` rows, split evenly across
+    the distinct `labels` (datasets). Quota left unused by a small dataset goes to the others.
+    """
+    labels = np.asarray(labels)
+    if max_points is None or len(labels) <= max_points:
+        return np.arange(len(labels))
+
+    rng = np.random.default_rng(random_state)
+    groups = [np.flatnonzero(labels == label) for label in np.unique(labels)]
+    groups.sort(key=len)
+    selected = []
+    remaining = max_points
+    for i, group in enumerate(groups):
+        quota = remaining // (len(groups) - i)
+        take = min(len(group), quota)
+        selected.append(rng.choice(group, size=take, replace=False) if take < len(group) else group)
+        remaining -= take
+    return np.sort(np.concatenate(selected))
+
+
+def make_projector(method: str, n_components: int = 2, random_state: int = 42):
+    # scikit-learn is imported on first use, it takes seconds to import
+    from sklearn.decomposition import PCA, TruncatedSVD
+    from sklearn.random_projection import GaussianRandomProjection
+
+    if method == "pca":
+        return PCA(n_components=n_components, random_state=random_state)
+    if method == "randomized_svd":
+        return TruncatedSVD(n_components=n_components, algorithm="randomized", random_state=random_state)
+    if method == "random_projection":
+        return GaussianRandomProjection(n_components=n_components, random_state=random_state)
+    raise ValueError(f"Unknown projection method '{method}', expected one of {PROJECTION_METHODS}")
+
+
+_fitted_projections = OrderedDict()
+_fitted_projections_lock = threading.Lock()
+
+def get_reference_projection(reference_embeddings: np.ndarray, method: str, random_state: int = 42):
+    """
+    Fits `method` on the reference embeddings, or reuses the projector already fitted on
+    identical reference embeddings. Returns (projector, projected_reference).
+    """
+    reference_embeddings = np.ascontiguousarray(reference_embeddings, dtype=np.float32)
+    key = (method, random_state, hashlib.sha1(reference_embeddings.tobytes()).hexdigest())
+    with _fitted_projections_lock:
+        if key in _fitted_projections:
+            _fitted_projections.move_to_end(key)
+            return _fitted_projections[key]
+
+    projector = make_projector(method, random_state=random_state)
+    projected_reference = projector.fit_transform(reference_embeddings)
+    with _fitted_projections_lock:
+        _fitted_projections[key] = (projector, projected_reference)
+        while len(_fitted_projections) > PROJECTION_CACHE_SIZE:
+            _fitted_projections.popitem(last=False)
+    return projector, projected_reference
+
+
+def project_embeddings(reference_embeddings: np.ndarray, current_embeddings: np.ndarray,
+                       method: str = "tsne", max_points: int = DEFAULT_MAX_POINTS,
+                       random_state: int = 42):
+    """
+    Projects reference and current embeddings to 2D.
+
+    Both sets are first capped to `max_points` rows in total with stratified sampling.
+    "tsne" runs Barnes-Hut t-SNE on the combined sample. The linear methods are fitted on
+    the reference sample only, and that fit is reused on later calls with the same
+    reference, so only the current embeddings are transformed.
+
+    Returns:
+        tuple: (projected_reference, projected_current) as (n, 2) arrays.
+    """
+    labels = np.concatenate([np.zeros(len(reference_embeddings), dtype=np.int8),
+                             np.ones(len(current_embeddings), dtype=np.int8)])
+    selected = stratified_sample_indices(labels, max_points, random_state)
+    reference_sample = np.asarray(reference_embeddings, dtype=np.float32)[selected[labels[selected] == 0]]
+    current_sample = np.asarray(current_embeddings, dtype=np.float32)[selected[labels[selected] == 1] - len(reference_embeddings)]
+
+    if method == "tsne":
+        from sklearn.manifold import TSNE
+
+        combined = np.concatenate([reference_sample, current_sample])
+        perplexity = min(30.0, max(1.0, (len(combined) - 1) / 3))
+        reduced = TSNE(n_components=2, method="barnes_hut", perplexity=perplexity,
+                       init="pca", random_state=random_state).fit_transform(combined)
+        return reduced[:len(reference_sample)], reduced[len(reference_sample):]
+
+    projector, projected_reference = get_reference_projection(reference_sample, method, random_state)
+    return projected_reference, projector.transform(current_sample)
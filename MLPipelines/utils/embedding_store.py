@@ -0,0 +1,211 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", ".cache/embeddings")
+# Stores no process has used for this long are removed by `prune_embedding_stores`
+EMBEDDING_STORE_MAX_AGE_DAYS = float(os.getenv("EMBEDDING_STORE_MAX_AGE_DAYS", 30))
+LOOKUP_BATCH_SIZE = 500
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def model_directory_name(model_id: str) -> str:
+    return hashlib.sha1(model_id.encode("utf-8")).hexdigest()[:16]
+
+
+class EmbeddingStore:
+    """
+    Persistent embedding cache for one model.
+
+    Vectors are appended to a flat float32 file that is read through a memory map,
+    so several worker processes can share the cached vectors without copying them.
+    A SQLite index maps each text hash to its row offset in that file. Writes are
+    serialised across processes with a file lock. Each model or variant has its own
+    directory, so processes configured with different backends never touch each
+    other's stores; every use refreshes the modification time of `meta.json`.
+    """
+
+    def __init__(self, model_id: str, dim: int, root: str = EMBEDDING_STORE_PATH):
+        self.model_id = model_id
+        self.dim = dim
+        self.directory = os.path.join(root, model_directory_name(model_id))
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.lock_path = os.path.join(self.directory, "write.lock")
+        self._thread_lock = threading.Lock()
+        self._memmap = None
+        self._memmap_rows = 0
+        self._open()
+
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        meta_path = self.meta_path = os.path.join(self.directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta.get("model_id") != self.model_id or meta.get("dim") != self.dim:
+                logging.info(f'          - embedding store metadata changed for {self.model_id}, invalidating')
+                self._connection = None
+                self.invalidate()
+                return
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"model_id": self.model_id, "dim": self.dim}, f)
+        open(self.vectors_path, "ab").close()
+        self._connection = sqlite3.connect(os.path.join(self.directory, "index.sqlite"),
+                                           check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS offsets (hash TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._connection.commit()
+
+
+    def _vectors(self) -> np.ndarray:
+        rows = os.path.getsize(self.vectors_path) // (self.dim * 4)
+        if self._memmap is None or rows != self._memmap_rows:
+            self._memmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(rows, self.dim)) if rows else np.empty((0, self.dim), dtype=np.float32)
+            self._memmap_rows = rows
+        return self._memmap
+
+
+    def lookup(self, hashes: list) -> dict:
+        """
+        Returns {hash: row} for the hashes already stored.
+        """
+        with self._thread_lock:
+            return self._lookup(hashes)
+
+
+    def _lookup(self, hashes: list) -> dict:
+        offsets = {}
+        for start in range(0, len(hashes), LOOKUP_BATCH_SIZE):
+            batch = hashes[start:start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            offsets.update(self._connection.execute(
+                f"SELECT hash, row FROM offsets WHERE hash IN ({placeholders})", batch
+            ).fetchall())
+        return offsets
+
+
+    def put(self, hashes: list, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._thread_lock, open(self.lock_path, "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                existing = self._lookup(hashes)
+                new_indices = [i for i, h in enumerate(hashes) if h not in existing]
+                if not new_indices:
+                    return
+                first_row = os.path.getsize(self.vectors_path) // (self.dim * 4)
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vectors[new_indices].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                # Offsets are published only after the vectors are on disk
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO offsets (hash, row) VALUES (?, ?)",
+                    [(hashes[i], first_row + n) for n, i in enumerate(new_indices)]
+                )
+                self._connection.commit()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+    def get_or_compute(self, texts: list, embed_fn) -> np.ndarray:
+        """
+        Returns a float32 matrix of embeddings for `texts`, calling `embed_fn` only for
+        texts that are not stored yet.
+        """
+        self._touch()
+        hashes = [text_hash(text) for text in texts]
+        offsets = self.lookup(list(set(hashes)))
+        missing = list(dict.fromkeys(h for h in hashes if h not in offsets))
+
+        if missing:
+            text_by_hash = dict(zip(hashes, texts))
+            logging.info(f'          - embedding {len(missing)} new texts ({len(texts) - len(missing)} cached)')
+            new_vectors = embed_fn([text_by_hash[h] for h in missing])
+            self.put(missing, new_vectors)
+            offsets.update(self.lookup(missing))
+
+        rows = np.fromiter((offsets[h] for h in hashes), dtype=np.int64, count=len(hashes))
+        return np.ascontiguousarray(self._vectors()[rows])
+
+
+    def _touch(self):
+        try:
+            os.utime(self.meta_path)
+        except OSError:
+            pass
+
+
+    def invalidate(self):
+        """
+        Deletes every stored vector for this model.
+        """
+        with self._thread_lock:
+            if self._connection is not None:
+                self._connection.close()
+            self._memmap = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+        self._open()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(model_id: str, dim: int, root: str = EMBEDDING_STORE_PATH) -> EmbeddingStore:
+    with _stores_lock:
+        key = (model_id, dim, root)
+        if key not in _stores:
+            _stores[key] = EmbeddingStore(model_id, dim, root)
+        return _stores[key]
+
+
+def prune_embedding_stores(max_age_days: float = EMBEDDING_STORE_MAX_AGE_DAYS, root: str = EMBEDDING_STORE_PATH) -> list:
+    """
+    Maintenance: removes the stores no process has used for `max_age_days`, e.g. those
+    of a model that is no longer configured anywhere. Stores open in this process, or
+    being written by another one, are kept. Never called on load; run it explicitly
+    with `python -m utils.embedding_store`.
+
+    Returns:
+        list: Names of the removed store directories.
+    """
+    if not os.path.isdir(root):
+        return []
+    cutoff = time.time() - max_age_days * 86400
+    with _stores_lock:
+        in_use = {store.directory for store in _stores.values()}
+    removed = []
+    for name in os.listdir(root):
+        directory = os.path.join(root, name)
+        meta_path = os.path.join(directory, "meta.json")
+        if directory in in_use or not os.path.isdir(directory) or \
+                (os.path.exists(meta_path) and os.path.getmtime(meta_path) >= cutoff):
+            continue
+        try:
+            with open(os.path.join(directory, "write.lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                logging.info(f'          - removing embedding store {name}, unused for {max_age_days} days')
+                shutil.rmtree(directory, ignore_errors=True)
+                removed.append(name)
+        except (BlockingIOError, OSError):
+            continue
+    return removed
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    prune_embedding_stores()
@@ -0,0 +1,135 @@
+import asyncio
+import collections
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+LLM_THREAD_WORKERS = int(os.getenv("LLM_THREAD_WORKERS", 16))
+COMPUTE_PROCESS_WORKERS = int(os.getenv("COMPUTE_PROCESS_WORKERS", 0)) or max(1, (os.cpu_count() or 2) // 2)
+
+_thread_pool = None
+_process_pool = None
+_pools_lock = threading.Lock()
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """
+    Shared thread pool for blocking I/O, mostly OpenAI calls, sized by LLM_THREAD_WORKERS.
+    """
+    global _thread_pool
+    with _pools_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=LLM_THREAD_WORKERS, thread_name_prefix="llm-io")
+    return _thread_pool
+
+
+class BoundedSubmitter:
+    """
+    Submits calls to a shared executor with at most `max_in_flight` of them running at
+    once; the others wait in a queue and are submitted as earlier calls finish, so one
+    request cannot take over the whole pool. `cancel()` drops the calls still queued.
+    """
+
+    def __init__(self, executor, max_in_flight: int):
+        self.executor = executor
+        self.max_in_flight = max(1, max_in_flight)
+        self._queue = collections.deque()
+        self._running = 0
+        self._lock = threading.Lock()
+
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            self._queue.append((future, fn, args, kwargs))
+        self._drain()
+        return future
+
+
+    def _drain(self):
+        while True:
+            with self._lock:
+                if self._running >= self.max_in_flight or not self._queue:
+                    return
+                future, fn, args, kwargs = self._queue.popleft()
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self._running += 1
+            self.executor.submit(self._run, future, fn, args, kwargs)
+
+
+    def _run(self, future, fn, args, kwargs):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running -= 1
+            self._drain()
+
+
+    def cancel(self):
+        with self._lock:
+            queued, self._queue = list(self._queue), collections.deque()
+        for future, *_ in queued:
+            future.cancel()
+
+
+def _init_compute_worker(num_threads: int):
+    # Set before torch / BLAS are imported in the worker so the workers together
+    # do not oversubscribe the CPU cores
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(variable, str(num_threads))
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound stages (embedding, t-SNE, drift statistics), sized by
+    COMPUTE_PROCESS_WORKERS. Workers are spawned rather than forked, since the API process
+    runs threads and may hold an initialised torch runtime. A broken pool is replaced.
+    """
+    global _process_pool
+    with _pools_lock:
+        if _process_pool is None or getattr(_process_pool, "_broken", False):
+            threads_per_worker = max(1, (os.cpu_count() or 1) // COMPUTE_PROCESS_WORKERS)
+            _process_pool = ProcessPoolExecutor(max_workers=COMPUTE_PROCESS_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_compute_worker,
+                                                initargs=(threads_per_worker,))
+    return _process_pool
+
+
+def run_in_process(fn, *args, **kwargs):
+    """
+    Runs a picklable top-level function in the compute process pool and waits for its result.
+    The pool is recreated and the call retried once if a worker died.
+    """
+    try:
+        return get_process_pool().submit(fn, *args, **kwargs).result()
+    except BrokenProcessPool:
+        logging.warning(f'          - compute process pool broken, restarting it for {fn.__name__}')
+        return get_process_pool().submit(fn, *args, **kwargs).result()
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    """
+    Awaits a blocking call on the shared I/O thread pool, keeping the event loop free.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_pools():
+    global _thread_pool, _process_pool
+    with _pools_lock:
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
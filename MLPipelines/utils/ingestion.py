@@ -0,0 +1,147 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", 2048)) * 1024 * 1024)
+MAX_INPUT_FILE_BYTES = int(float(os.getenv("MAX_INPUT_FILE_MB", 10240)) * 1024 * 1024)
+CSV_BLOCK_SIZE = int(float(os.getenv("CSV_BLOCK_SIZE_MB", 4)) * 1024 * 1024)
+
+PARQUET_MAGIC = b"PAR1"
+ARROW_FILE_MAGIC = b"ARROW1"
+ARROW_STREAM_CONTINUATION = b"\xff\xff\xff\xff"
+FORMATS = ("csv", "parquet", "arrow")
+
+
+class InputTooLargeError(ValueError):
+    pass
+
+
+def detect_format(file, filename: str = None) -> str:
+    """
+    Detects the table format from the file's magic bytes, falling back to the file
+    extension, and CSV otherwise. Leaves the file position at the start.
+    """
+    file.seek(0)
+    head = file.read(8)
+    file.seek(0)
+    if head.startswith(PARQUET_MAGIC):
+        return "parquet"
+    if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_CONTINUATION):
+        return "arrow"
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".parquet", ".pq"):
+        return "parquet"
+    if extension in (".arrow", ".feather", ".ipc"):
+        return "arrow"
+    return "csv"
+
+
+def check_size(file, max_bytes: int, name: str = "input") -> int:
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    if size > max_bytes:
+        raise InputTooLargeError(f"The {name} is {size / 2**20:.1f} MB, the limit is {max_bytes / 2**20:.1f} MB")
+    return size
+
+
+def arrow_type(dtype):
+    import pyarrow as pa
+
+    if str(dtype) in ("str", "string", "object"):
+        return pa.string()
+    if str(dtype) == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype))
+
+
+def read_csv_arrow(file, dtypes: dict = None) -> pd.DataFrame:
+    """
+    Parses CSV with the streaming pyarrow reader, block by block from the open file, into an
+    Arrow table that is then converted column by column, so besides the final DataFrame only
+    about one block of raw text is held in memory.
+
+    Types are inferred except for the columns given in `dtypes`. Columns that pyarrow would
+    infer as dates or timestamps are kept as strings, as `pd.read_csv` does, since the
+    profiler and generators detect date strings themselves. Quoted values may span lines,
+    as in free-text columns.
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    read_options = pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE)
+    # Without it, a quoted newline in any block but the first throws the chunker out of sync
+    parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+    column_types = {column: arrow_type(dtype) for column, dtype in (dtypes or {}).items()}
+
+    # Infer the schema from the complete lines of the first block, to find the temporal columns
+    head = file.read(CSV_BLOCK_SIZE)
+    file.seek(0)
+    try:
+        schema = pa_csv.read_csv(pa.BufferReader(head[:head.rfind(b"\n") + 1] or head), parse_options=parse_options,
+                                 convert_options=pa_csv.ConvertOptions(column_types=column_types)).schema
+    except pa.ArrowInvalid:
+        # e.g. the block ends inside a quoted multi-line value
+        schema = []
+    for field in schema:
+        if field.name not in column_types and pa.types.is_temporal(field.type):
+            column_types[field.name] = pa.string()
+
+    convert_options = pa_csv.ConvertOptions(column_types=column_types)
+    try:
+        table = pa_csv.open_csv(file, read_options=read_options, parse_options=parse_options,
+                                convert_options=convert_options).read_all()
+    except pa.ArrowInvalid as e:
+        # The streaming reader fixes column types after the first block. A later value that
+        # does not fit needs the whole-file inference of the (more memory hungry) table reader.
+        logging.info(f'          - re-reading CSV with whole-file type inference: {e}')
+        file.seek(0)
+        table = pa_csv.read_csv(file, read_options=read_options, parse_options=parse_options,
+                                convert_options=convert_options)
+    # Releases each Arrow column as soon as it is converted, so peak memory stays near the DataFrame size
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_table(file, filename: str = None, dtypes: dict = None, max_bytes: int = MAX_UPLOAD_BYTES) -> pd.DataFrame:
+    """
+    Reads a CSV, Parquet or Arrow IPC table from a binary file object, for example the
+    spooled temporary file behind an upload, without loading its raw bytes into memory.
+
+    Args:
+        file: Seekable binary file object.
+        filename (str): Original file name, used when the format is not recognised from its content.
+        dtypes (dict): Explicit column dtypes for CSV input, e.g. {"card_number": "int64"}.
+        max_bytes (int): Size limit, InputTooLargeError is raised above it.
+    """
+    check_size(file, max_bytes, filename or "input")
+    file_format = detect_format(file, filename)
+    try:
+        import pyarrow
+    except ImportError:
+        if file_format != "csv":
+            raise ValueError(f"Reading {file_format} input requires pyarrow")
+        logging.info('          - pyarrow not installed, parsing CSV with pandas')
+        return pd.read_csv(file, dtype=dtypes)
+
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_table(file).to_pandas(split_blocks=True, self_destruct=True)
+    if file_format == "arrow":
+        import pyarrow.ipc as ipc
+
+        head = file.read(6)
+        file.seek(0)
+        reader = ipc.open_file(file) if head == ARROW_FILE_MAGIC else ipc.open_stream(file)
+        return reader.read_all().to_pandas(split_blocks=True, self_destruct=True)
+    return read_csv_arrow(file, dtypes)
+
+
+def read_dataset(path: str, dtypes: dict = None, max_bytes: int = MAX_INPUT_FILE_BYTES) -> pd.DataFrame:
+    """
+    Reads a CSV, Parquet or Arrow IPC file from disk, see `read_table`.
+    """
+    with open(path, "rb") as file:
+        return read_table(file, filename=path, dtypes=dtypes, max_bytes=max_bytes)
@@ -0,0 +1,155 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+JOB_QUEUE_WORKERS = int(os.getenv("JOB_QUEUE_WORKERS", 2))
+MAX_FINISHED_JOBS = int(os.getenv("JOB_QUEUE_MAX_FINISHED", 100))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """
+    A submitted job: its state, progress and, once finished, its result or error.
+    """
+
+    def __init__(self, kind: str, fn, args, kwargs):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.stage = None
+        self.completed = 0
+        self.total = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+
+    def report_progress(self, completed: int, total: int = None, stage: str = None):
+        """
+        Progress callback handed to the job function as `progress_callback`.
+        """
+        self.completed = completed
+        if total is not None:
+            self.total = total
+        if stage is not None:
+            self.stage = stage
+
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "stage": self.stage,
+            "completed": self.completed,
+            "total": self.total,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """
+    In-process FIFO queue of long-running jobs served by `num_workers` daemon threads.
+
+    Job functions are called with the submitted arguments plus a `progress_callback`
+    keyword argument, see `Job.report_progress`. Results of finished jobs are kept in
+    memory until they are among the oldest beyond `max_finished`.
+    """
+
+    def __init__(self, num_workers: int = JOB_QUEUE_WORKERS, max_finished: int = MAX_FINISHED_JOBS):
+        self.max_finished = max_finished
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+
+    def submit(self, kind: str, fn, *args, **kwargs) -> dict:
+        job = Job(kind, fn, args, kwargs)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._queue.put(job)
+        logging.info(f'          - queued {kind} job {job.job_id}')
+        return job.to_dict()
+
+
+    def get(self, job_id: str) -> Job:
+        """
+        Raises KeyError for unknown or evicted job IDs.
+        """
+        with self._lock:
+            return self._jobs[job_id]
+
+
+    def status(self, job_id: str) -> dict:
+        status = self.get(job_id).to_dict()
+        status["queue_position"] = self._queue_position(job_id)
+        return status
+
+
+    def _queue_position(self, job_id: str):
+        with self._queue.mutex:
+            for position, job in enumerate(self._queue.queue):
+                if job.job_id == job_id:
+                    return position
+        return None
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": len(self._workers),
+            **{status: statuses.count(status) for status in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+        }
+
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = job.fn(*job.args, progress_callback=job.report_progress, **job.kwargs)
+                job.status = SUCCEEDED
+            except Exception as e:
+                logging.error(f'          - {job.kind} job {job.job_id} failed: {e}')
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                # Arguments can be large DataFrames, drop them once the job is done
+                job.args, job.kwargs = (), {}
+                self._evict_finished()
+                self._queue.task_done()
+
+
+    def _evict_finished(self):
+        with self._lock:
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+            for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+                del self._jobs[job_id]
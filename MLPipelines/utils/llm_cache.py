@@ -0,0 +1,167 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+DEFAULT_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+DEFAULT_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+
+
+class LLMResponseCache:
+    """
+    Disk-backed cache of chat completion responses, keyed on model, messages and
+    sampling parameters. Entries expire after `ttl_seconds` and the least recently
+    used entries are evicted once the cache holds more than `max_entries`.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS idx_last_accessed ON responses (last_accessed)")
+        self._connection.commit()
+
+
+    @staticmethod
+    def make_key(model: str, messages: list, **params) -> str:
+        payload = json.dumps({"model": model, "messages": messages, "params": params},
+                             sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET last_accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return row[0]
+
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict(now)
+            self._connection.commit()
+
+
+    def _evict(self, now: float):
+        self._connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._connection.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_accessed DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,)
+        )
+
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self.hits = 0
+            self.misses = 0
+
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+    def cached_chat_completion(self, client, model: str, messages: list,
+                               use_cache: bool = True, cache_variant=None, return_finish_reason: bool = False,
+                               **params):
+        """
+        Returns the message content of a chat completion, served from the cache when possible.
+
+        Args:
+            client: OpenAI client used on a cache miss.
+            model (str): Model name.
+            messages (list): Chat messages.
+            use_cache (bool): Set to False to bypass the cache for deliberately
+                non-deterministic generation.
+            cache_variant: Extra key component so that identical prompts which should
+                produce different results (e.g. generation batches) get separate entries.
+            return_finish_reason (bool): Also return the completion's finish_reason, e.g.
+                "length" when it was cut off by `max_tokens`. Only finished completions are
+                cached, so a cache hit reports "stop".
+            **params: Sampling parameters passed to the completion call.
+
+        Returns:
+            str: The completion text, or (text, finish_reason) with `return_finish_reason`.
+        """
+        key = self.make_key(model, messages, cache_variant=cache_variant, **params) if use_cache else None
+        cached = self.get(key) if use_cache else None
+        if cached is not None:
+            return (cached, "stop") if return_finish_reason else cached
+
+        response = client.chat.completions.create(model=model, messages=messages, **params)
+        content = response.choices[0].message.content
+        finish_reason = response.choices[0].finish_reason
+        if use_cache and finish_reason in (None, "stop"):
+            self.set(key, content)
+        return (content, finish_reason) if return_finish_reason else content
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_default_cache() -> LLMResponseCache:
+    """
+    Returns the process-wide cache shared by the generators and the analyzer.
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            logging.info(f'          - opening LLM response cache at {DEFAULT_CACHE_PATH}')
+            _default_cache = LLMResponseCache()
+    return _default_cache
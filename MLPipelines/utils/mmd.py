@@ -0,0 +1,186 @@
+import logging
+
+import numpy as np
+
+# The exact test holds the (n + m)^2 pooled kernel matrix: 5000 rows take ~100 MB in float32
+EXACT_MAX_SAMPLES = 5000
+NUM_RANDOM_FEATURES = 512
+NUM_PERMUTATIONS = 200
+PERMUTATION_BATCH_SIZE = 20
+BANDWIDTH_SAMPLE_SIZE = 1000
+P_VALUE_THRESHOLD = 0.05
+
+
+def pca_reduce(reference: np.ndarray, current: np.ndarray, n_components: int):
+    """
+    Projects both samples onto the top `n_components` principal axes of the pooled data.
+    The axes are fitted on both samples together: fitting on the reference alone inflates its
+    variance along those axes relative to the current sample, which the test reads as drift.
+    """
+    pooled = np.concatenate([reference, current])
+    mean = pooled.mean(axis=0, dtype=np.float64)
+    centered = pooled - mean
+    covariance = (centered.T @ centered) / max(len(pooled) - 1, 1)
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    components = eigenvectors[:, ::-1][:, :n_components].astype(np.float32)
+    mean = mean.astype(np.float32)
+    return (reference - mean) @ components, (current - mean) @ components
+
+
+def squared_distances(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    distances = (a * a).sum(axis=1)[:, None] + (b * b).sum(axis=1)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(distances, 0.0, out=distances)
+
+
+def median_heuristic_bandwidth(reference: np.ndarray, current: np.ndarray, random_state=42) -> float:
+    """
+    Median pairwise distance on a subsample of the pooled data.
+    """
+    rng = np.random.default_rng(random_state)
+    pooled = np.concatenate([reference, current])
+    if len(pooled) > BANDWIDTH_SAMPLE_SIZE:
+        pooled = pooled[rng.choice(len(pooled), BANDWIDTH_SAMPLE_SIZE, replace=False)]
+    distances = squared_distances(pooled, pooled)
+    median = np.median(distances[np.triu_indices(len(pooled), k=1)])
+    return float(np.sqrt(median)) if median > 0 else 1.0
+
+
+def unbiased_mmd2(kernel: np.ndarray, n: int) -> float:
+    """
+    Unbiased MMD^2 estimate from the pooled kernel matrix whose first `n` rows are the reference.
+    """
+    m = len(kernel) - n
+    # exp(0) on the diagonals of k(x, x) and k(y, y) is left out
+    within_reference = (float(kernel[:n, :n].sum(dtype=np.float64)) - n) / (n * (n - 1))
+    within_current = (float(kernel[n:, n:].sum(dtype=np.float64)) - m) / (m * (m - 1))
+    between = float(kernel[:n, n:].sum(dtype=np.float64)) / (n * m)
+    return within_reference + within_current - 2.0 * between
+
+
+def random_fourier_features(data: np.ndarray, weights: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    features = data @ weights
+    features += offsets
+    np.cos(features, out=features)
+    features *= np.float32(np.sqrt(2.0 / weights.shape[1]))
+    return features
+
+
+def permutation_weights(rng, num_permutations: int, n: int, m: int) -> np.ndarray:
+    """
+    One row per permutation: +1/n for rows assigned to the reference side, -1/m for the rest.
+    """
+    return rng.permuted(np.tile(group_weights(n, m), (num_permutations, 1)), axis=1)
+
+
+def group_weights(n: int, m: int) -> np.ndarray:
+    return np.concatenate([np.full(n, 1.0 / n, dtype=np.float32), np.full(m, -1.0 / m, dtype=np.float32)])
+
+
+def permutation_p_value(observed: float, statistic_fn, rng, n: int, m: int, num_permutations: int) -> float:
+    """
+    Permutation p-value where `statistic_fn` maps a (batch, n + m) weight matrix to a
+    vector of statistics, so each batch of permutations is evaluated with matrix products.
+    """
+    exceed = 0
+    for start in range(0, num_permutations, PERMUTATION_BATCH_SIZE):
+        batch = min(PERMUTATION_BATCH_SIZE, num_permutations - start)
+        statistics = statistic_fn(permutation_weights(rng, batch, n, m))
+        exceed += int(np.sum(statistics >= observed))
+    return (exceed + 1) / (num_permutations + 1)
+
+
+def linear_time_mmd(reference: np.ndarray, current: np.ndarray, gamma: float):
+    """
+    Gretton's linear-time MMD^2 estimate on disjoint sample pairs, with its Gaussian
+    asymptotic null. Returns (mmd2, p_value).
+    """
+    from scipy.stats import norm
+
+    pairs = min(len(reference), len(current)) // 2
+    if pairs < 2:
+        return 0.0, 1.0
+    x1, x2 = reference[:pairs], reference[pairs:2 * pairs]
+    y1, y2 = current[:pairs], current[pairs:2 * pairs]
+
+    def kernel(a, b):
+        return np.exp(-gamma * ((a - b) ** 2).sum(axis=1))
+
+    h = kernel(x1, x2) + kernel(y1, y2) - kernel(x1, y2) - kernel(x2, y1)
+    mmd2 = float(h.mean())
+    standard_error = float(h.std(ddof=1)) / np.sqrt(pairs)
+    p_value = float(norm.sf(mmd2 / standard_error)) if standard_error > 0 else float(mmd2 <= 0)
+    return mmd2, p_value
+
+
+def mmd_test(reference: np.ndarray, current: np.ndarray, method: str = "auto",
+             pca_components: int = None, bandwidth: float = None,
+             num_features: int = NUM_RANDOM_FEATURES, num_permutations: int = NUM_PERMUTATIONS,
+             threshold: float = P_VALUE_THRESHOLD, random_state=42) -> dict:
+    """
+    Maximum mean discrepancy two-sample test with a Gaussian kernel on float32 matrices.
+
+    Args:
+        reference (np.ndarray): Reference embeddings, shape (n, d).
+        current (np.ndarray): Current embeddings, shape (m, d).
+        method (str): "exact" (permutation test over the full pooled kernel matrix, up to
+            EXACT_MAX_SAMPLES rows in total, larger samples fall back to rff), "rff" (random
+            Fourier features, linear time), "linear" (linear-time estimate with an asymptotic
+            p-value) or "auto" (exact up to EXACT_MAX_SAMPLES rows, rff beyond).
+        pca_components (int): Reduce both samples to this many principal components first.
+        bandwidth (float): Kernel bandwidth, median heuristic when None.
+        num_features (int): Number of random Fourier features.
+        num_permutations (int): Permutations for the p-value of the exact and rff methods.
+        threshold (float): p-value below which drift is reported.
+
+    Returns:
+        dict: mmd2, p_value, drift_detected and the settings used.
+    """
+    reference = np.ascontiguousarray(reference, dtype=np.float32)
+    current = np.ascontiguousarray(current, dtype=np.float32)
+    n, m = len(reference), len(current)
+    if n < 2 or m < 2:
+        raise ValueError("MMD test needs at least two reference and two current samples")
+    if pca_components:
+        reference, current = pca_reduce(reference, current, min(pca_components, reference.shape[1]))
+    if method == "auto":
+        method = "exact" if n + m <= EXACT_MAX_SAMPLES else "rff"
+    elif method == "exact" and n + m > EXACT_MAX_SAMPLES:
+        logging.warning(f'          - exact MMD needs a {n + m}x{n + m} kernel matrix, '
+                        f'using rff above {EXACT_MAX_SAMPLES} samples')
+        method = "rff"
+
+    rng = np.random.default_rng(random_state)
+    bandwidth = bandwidth or median_heuristic_bandwidth(reference, current, random_state)
+    gamma = 1.0 / (2.0 * bandwidth ** 2)
+
+    if method == "linear":
+        mmd2, p_value = linear_time_mmd(reference, current, gamma)
+    elif method == "exact":
+        pooled = np.concatenate([reference, current])
+        kernel = np.exp(-gamma * squared_distances(pooled, pooled))
+        mmd2 = unbiased_mmd2(kernel, n)
+        signs = group_weights(n, m)
+        observed = float(signs @ kernel @ signs)
+        p_value = permutation_p_value(observed, lambda weights: np.einsum('pi,pi->p', weights @ kernel, weights),
+                                      rng, n, m, num_permutations)
+    elif method == "rff":
+        weights = rng.normal(0.0, np.sqrt(2.0 * gamma), size=(reference.shape[1], num_features)).astype(np.float32)
+        offsets = rng.uniform(0.0, 2.0 * np.pi, size=num_features).astype(np.float32)
+        features = random_fourier_features(np.concatenate([reference, current]), weights, offsets)
+        difference = features[:n].mean(axis=0) - features[n:].mean(axis=0)
+        mmd2 = float(difference @ difference)
+        p_value = permutation_p_value(mmd2, lambda weights: ((weights @ features) ** 2).sum(axis=1),
+                                      rng, n, m, num_permutations)
+    else:
+        raise ValueError(f"Unknown MMD method '{method}', expected 'auto', 'exact', 'rff' or 'linear'")
+
+    return {
+        "method": method,
+        "mmd2": float(mmd2),
+        "p_value": float(p_value),
+        "drift_detected": bool(p_value < threshold),
+        "bandwidth": bandwidth,
+        "pca_components": pca_components,
+        "reference_size": n,
+        "current_size": m,
+    }
@@ -0,0 +1,238 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import httpx
+from openai import OpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", 500))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", 300000))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 5))
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", 600))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+DEFAULT_COMPLETION_TOKENS = 1000
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `rate_per_minute`.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_second)
+        self._updated_at = now
+
+
+    def acquire(self, amount: float = 1):
+        """
+        Blocks until `amount` tokens are available and takes them. Requests larger than
+        the bucket capacity are capped so they can still go through once the bucket is full.
+        """
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate_per_second
+            time.sleep(wait)
+
+
+    def adjust(self, amount: float):
+        """
+        Returns (positive) or charges (negative) tokens once the real cost is known.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+def estimate_request_tokens(messages: list, max_tokens: int = None) -> int:
+    prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+    return prompt_chars // CHARS_PER_TOKEN + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or error.status_code >= 500)
+
+
+def backoff_delay(attempt: int, error: Exception = None) -> float:
+    """
+    Full-jitter exponential backoff, honouring a Retry-After header when the server sends one.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class _SlotStream:
+    """
+    Iterator over a streamed completion that holds a concurrency slot until it is
+    exhausted, closed or garbage collected, so a stream abandoned before its first chunk
+    (e.g. the client disconnected first) still gives the slot back.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._iterator = iter(stream)
+        self._release = release
+        self._released = False
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._iterator)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        try:
+            if hasattr(self._stream, "close"):
+                self._stream.close()
+        finally:
+            self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner.create_chat_completion(**kwargs)
+
+
+class _Chat:
+    def __init__(self, owner):
+        self.completions = _Completions(owner)
+
+
+class RateLimitedOpenAIClient:
+    """
+    OpenAI client wrapper shared across the process. It reuses pooled keep-alive
+    connections, schedules calls through requests-per-minute and tokens-per-minute
+    token buckets, caps concurrent requests and retries 429/5xx responses with
+    jittered exponential backoff.
+
+    It exposes `chat.completions.create` so it can be used wherever an `OpenAI`
+    client is expected. Set `base_url` (or OPENAI_BASE_URL) to point it at a local
+    mock server.
+    """
+
+    def __init__(self, api_key: str, base_url: str = OPENAI_BASE_URL,
+                 requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = OPENAI_TOKENS_PER_MINUTE,
+                 max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+                 max_connections: int = OPENAI_MAX_CONNECTIONS,
+                 max_retries: int = OPENAI_MAX_RETRIES,
+                 timeout: float = OPENAI_TIMEOUT_SECONDS):
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        # Retries are handled here so they go through the rate limiter as well
+        self._client = OpenAI(api_key=api_key, base_url=base_url,
+                              http_client=self._http_client, max_retries=0)
+        self.chat = _Chat(self)
+        self.stats = {"requests": 0, "retries": 0, "failures": 0}
+        self._stats_lock = threading.Lock()
+
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+    def create_chat_completion(self, **kwargs):
+        estimated_tokens = estimate_request_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        attempt = 0
+        while True:
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(estimated_tokens)
+            self._semaphore.acquire()
+            try:
+                self._count("requests")
+                response = self._client.chat.completions.create(**kwargs)
+            except Exception as e:
+                self._semaphore.release()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                delay = backoff_delay(attempt, e)
+                logging.warning(f'          - OpenAI request failed ({e.__class__.__name__}), retrying in {delay:.1f}s')
+                self._count("retries")
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            if kwargs.get("stream"):
+                return _SlotStream(response, self._semaphore.release)
+            self._semaphore.release()
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                self.token_bucket.adjust(estimated_tokens - usage.total_tokens)
+            return response
+
+
+    def close(self):
+        self._http_client.close()
+
+
+_shared_clients = {}
+_shared_clients_lock = threading.Lock()
+
+def get_shared_client(api_key: str, base_url: str = OPENAI_BASE_URL) -> RateLimitedOpenAIClient:
+    """
+    Returns the process-wide client for `api_key`, creating it on first use.
+    """
+    with _shared_clients_lock:
+        key = (api_key, base_url)
+        if key not in _shared_clients:
+            logging.info('          - creating shared rate limited OpenAI client')
+            _shared_clients[key] = RateLimitedOpenAIClient(api_key=api_key, base_url=base_url)
+        return _shared_clients[key]
@@ -0,0 +1,87 @@
+import numpy as np
+
+HISTOGRAM_BINS = 30
+CURVE_POINTS = 200
+KDE_GRID_BINS = 1024
+MAX_OUTLIERS = 200
+
+
+def histogram_density(values: np.ndarray, num_bins: int = HISTOGRAM_BINS):
+    """
+    Returns (bin_centers, densities, bin_width) of an equal-width histogram normalised as a
+    probability density, like Plotly's histnorm='probability density'.
+    """
+    counts, edges = np.histogram(values, bins=num_bins)
+    width = edges[1] - edges[0]
+    densities = counts / (counts.sum() * width) if width > 0 else counts.astype(np.float64)
+    return (edges[:-1] + edges[1:]) / 2, densities, width
+
+
+def gaussian_curve(mean: float, std: float, low: float, high: float, num_points: int = CURVE_POINTS):
+    x = np.linspace(low, high, num_points)
+    if not std > 0:
+        return x, np.zeros_like(x)
+    return x, np.exp(-0.5 * ((x - mean) / std) ** 2) / (std * np.sqrt(2 * np.pi))
+
+
+def kde_curve(values: np.ndarray, num_points: int = CURVE_POINTS, grid_bins: int = KDE_GRID_BINS):
+    """
+    Gaussian kernel density estimate with Silverman's bandwidth, computed on a binned
+    grid: the values are counted into `grid_bins` bins once and the counts are convolved
+    with the kernel, so the cost does not depend on the number of rows beyond one pass.
+    """
+    low, high = float(values.min()), float(values.max())
+    std = float(values.std())
+    iqr = float(np.subtract(*np.percentile(values, [75, 25])))
+    spread = min(std, iqr / 1.34) if iqr > 0 else std
+    bandwidth = 0.9 * spread * len(values) ** (-0.2)
+    if not bandwidth > 0 or high <= low:
+        return np.array([low]), np.array([1.0])
+
+    low, high = low - 3 * bandwidth, high + 3 * bandwidth
+    counts, edges = np.histogram(values, bins=grid_bins, range=(low, high))
+    step = edges[1] - edges[0]
+    half_width = int(np.ceil(4 * bandwidth / step))
+    offsets = np.arange(-half_width, half_width + 1) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    density = np.convolve(counts, kernel)[half_width:half_width + grid_bins] / len(values)
+    centers = (edges[:-1] + edges[1:]) / 2
+    x = np.linspace(low, high, num_points)
+    return x, np.interp(x, centers, density)
+
+
+def box_statistics(values: np.ndarray) -> dict:
+    """
+    Quartiles, Tukey fences (whiskers at the most extreme values within 1.5 IQR), mean and
+    standard deviation, in the form Plotly box traces accept precomputed.
+    """
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "lowerfence": float(inside.min()) if len(inside) else float(q1),
+        "upperfence": float(inside.max()) if len(inside) else float(q3),
+        "mean": float(values.mean()),
+        "sd": float(values.std()),
+    }
+
+
+def sample_outliers(values: np.ndarray, box: dict, max_outliers: int = MAX_OUTLIERS, random_state=42):
+    """
+    Values outside the box whiskers, capped at `max_outliers`. The most extreme value on
+    each side is always kept, the rest is a uniform random sample.
+
+    Returns:
+        tuple: (sampled_outliers, total_number_of_outliers)
+    """
+    outliers = values[(values < box["lowerfence"]) | (values > box["upperfence"])]
+    if len(outliers) <= max_outliers:
+        return outliers, len(outliers)
+    rng = np.random.default_rng(random_state)
+    extremes = [outliers.argmin(), outliers.argmax()]
+    rest = np.setdiff1d(np.arange(len(outliers)), extremes)
+    keep = np.concatenate([extremes, rng.choice(rest, size=max_outliers - 2, replace=False)])
+    return outliers[np.sort(keep)], len(outliers)
@@ -0,0 +1,251 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+MIN_KEY_DIGITS = 10
+CARD_KEY_DIGITS = 16
+MAX_KEY_ROUNDS = 20
+LUHN_GROUP_DIGITS = 4
+
+
+def luhn_digit_sums(group_digits: int = LUHN_GROUP_DIGITS) -> np.ndarray:
+    """
+    Luhn sum of every `group_digits`-digit number, doubling every other digit starting with
+    the last. The group size is even, so the same table serves every group of a body.
+    """
+    numbers = np.arange(10 ** group_digits, dtype=np.int64)
+    total = np.zeros(len(numbers), dtype=np.int64)
+    for position in range(group_digits):
+        digit = numbers // 10 ** position % 10
+        if position % 2 == 0:
+            digit = digit * 2
+            digit -= 9 * (digit > 9)
+        total += digit
+    return total
+
+
+_LUHN_DIGIT_SUMS = luhn_digit_sums()
+
+
+def luhn_check_digits(bodies: np.ndarray) -> np.ndarray:
+    """
+    Luhn check digit for each integer in `bodies`, so that `body * 10 + check` is a valid
+    payment card number. Computed LUHN_GROUP_DIGITS digits at a time across the whole
+    array, from a table of the digit sums of every group.
+    """
+    bodies = bodies.astype(np.int64, copy=True)
+    total = np.zeros(len(bodies), dtype=np.int64)
+    group = 10 ** LUHN_GROUP_DIGITS
+    while bodies.any():
+        total += _LUHN_DIGIT_SUMS[bodies % group]
+        bodies //= group
+    return (10 - total % 10) % 10
+
+
+def is_luhn_valid(keys: np.ndarray) -> np.ndarray:
+    keys = np.asarray(keys, dtype=np.int64)
+    return luhn_check_digits(keys // 10) == keys % 10
+
+
+def duplicate_mask(keys: np.ndarray) -> np.ndarray:
+    """
+    Marks every occurrence of a key but the first. Random keys drawn from a wide range are
+    almost always distinct, which a plain sort confirms without the stable argsort that
+    locating the duplicates needs.
+    """
+    ordered = np.sort(keys)
+    if not (ordered[1:] == ordered[:-1]).any():
+        return np.zeros(len(keys), dtype=bool)
+    mask = np.ones(len(keys), dtype=bool)
+    mask[np.unique(keys, return_index=True)[1]] = False
+    return mask
+
+
+def generate_unique_keys(num_keys: int, num_digits: int, rng: np.random.Generator,
+                         luhn: bool = False, exclude=None) -> np.ndarray:
+    """
+    Draws `num_keys` distinct random integer keys with exactly `num_digits` digits.
+
+    Keys are drawn in one vectorised batch; the few duplicates, and collisions with the
+    `exclude` keys (e.g. the real identifiers of the reference data), are redrawn in
+    further batches until none are left.
+
+    Args:
+        num_keys (int): Number of keys.
+        num_digits (int): Digits per key, at most 18.
+        rng (np.random.Generator): Random generator.
+        luhn (bool): Make the last digit a Luhn check digit, as on payment cards.
+        exclude (array-like): Keys that must not be generated.
+
+    Returns:
+        np.ndarray: int64 keys in random order.
+    """
+    if not 1 <= num_digits <= 18:
+        raise ValueError(f"Keys need 1 to 18 digits to fit int64, got {num_digits}")
+    body_digits = num_digits - 1 if luhn else num_digits
+    low, high = (10 ** (body_digits - 1) if body_digits > 1 else 0), 10 ** body_digits
+    if num_keys > high - low:
+        raise ValueError(f"Cannot draw {num_keys} distinct keys with {num_digits} digits")
+    exclude = np.unique(np.asarray(exclude, dtype=np.int64)) if exclude is not None else np.empty(0, dtype=np.int64)
+
+    def to_keys(bodies):
+        return bodies * 10 + luhn_check_digits(bodies) if luhn else bodies
+
+    keys = to_keys(rng.integers(low, high, size=num_keys, dtype=np.int64))
+    for _ in range(MAX_KEY_ROUNDS):
+        redraw = duplicate_mask(keys)
+        if len(exclude):
+            # `exclude` is sorted by np.unique
+            position = np.minimum(np.searchsorted(exclude, keys), len(exclude) - 1)
+            redraw |= exclude[position] == keys
+        num_redraw = int(redraw.sum())
+        if not num_redraw:
+            return keys
+        keys[redraw] = to_keys(rng.integers(low, high, size=num_redraw, dtype=np.int64))
+    raise ValueError(f"Could not draw {num_keys} distinct {num_digits}-digit keys in {MAX_KEY_ROUNDS} rounds")
+
+
+def key_digits(values: pd.Series) -> int:
+    """
+    Most common number of digits among the non-negative integer values of a key column.
+    """
+    values = pd.to_numeric(values.dropna(), errors="coerce").dropna()
+    values = values[values > 0].astype(np.int64)
+    if values.empty:
+        return CARD_KEY_DIGITS
+    return int(pd.Series(np.floor(np.log10(values.to_numpy())).astype(np.int64) + 1).mode().iloc[0])
+
+
+def detect_key_columns(data: pd.DataFrame, min_digits: int = MIN_KEY_DIGITS) -> list:
+    """
+    Integer columns that look like identifiers: every value distinct and at least
+    `min_digits` digits long.
+    """
+    columns = []
+    for column in data.columns:
+        values = data[column]
+        if pd.api.types.is_integer_dtype(values.dtype) and values.is_unique and len(values) \
+                and values.min() >= 10 ** (min_digits - 1):
+            columns.append(column)
+    return columns
+
+
+def sample_cardinality(num_parents: int, rng: np.random.Generator, cardinality=None,
+                       reference_counts: np.ndarray = None) -> np.ndarray:
+    """
+    Number of child rows for each parent.
+
+    Args:
+        cardinality: An int for a fixed number per parent, a (min, max) tuple for a uniform
+            count, or None to resample the per-parent counts seen in `reference_counts`.
+        reference_counts (np.ndarray): Child rows per parent in the reference data.
+    """
+    if cardinality is None:
+        if reference_counts is None or not len(reference_counts):
+            return np.ones(num_parents, dtype=np.int64)
+        return rng.choice(np.asarray(reference_counts, dtype=np.int64), size=num_parents)
+    if isinstance(cardinality, (tuple, list)):
+        low, high = cardinality
+        return rng.integers(low, high + 1, size=num_parents, dtype=np.int64)
+    return np.full(num_parents, int(cardinality), dtype=np.int64)
+
+
+def check_referential_integrity(parent_data: pd.DataFrame, child_data: pd.DataFrame, key: str) -> dict:
+    """
+    Checks the parent key is unique and every child row references an existing parent,
+    using a hash index on the parent keys (one vectorised lookup per child key).
+
+    Returns:
+        dict: Counts of duplicate parent keys, orphan child rows and parents without children,
+            plus 'valid' when there are no duplicates or orphans.
+    """
+    parent_index = pd.Index(parent_data[key])
+    duplicate_parents = int(parent_index.duplicated().sum())
+    if duplicate_parents:
+        parent_index = parent_index.drop_duplicates()
+    positions = parent_index.get_indexer(child_data[key])
+    orphan_children = int((positions < 0).sum())
+    referenced = np.zeros(len(parent_index), dtype=bool)
+    referenced[positions[positions >= 0]] = True
+    return {
+        "valid": duplicate_parents == 0 and orphan_children == 0,
+        "parent_rows": len(parent_data),
+        "child_rows": len(child_data),
+        "duplicate_parent_keys": duplicate_parents,
+        "orphan_child_rows": orphan_children,
+        "parents_without_children": int((~referenced).sum()),
+    }
+
+
+def fit_rows(data: pd.DataFrame, num_rows: int, rng: np.random.Generator) -> pd.DataFrame:
+    """
+    Returns exactly `num_rows` rows: truncated, or topped up by resampling the rows
+    available when a generator returned fewer than requested.
+    """
+    if len(data) >= num_rows:
+        return data.iloc[:num_rows].reset_index(drop=True)
+    if data.empty:
+        raise ValueError(f"No rows were generated, {num_rows} were needed")
+    logging.warning(f'          - {len(data)} rows generated for {num_rows} needed, resampling the rest')
+    extra = rng.integers(0, len(data), size=num_rows - len(data))
+    return pd.concat([data, data.iloc[extra]], ignore_index=True)
+
+
+def generate_relational_data(parent_reference: pd.DataFrame, child_reference: pd.DataFrame, key: str,
+                             num_parents: int, generate_table, cardinality=None, random_state=None) -> dict:
+    """
+    Generates a parent table and a child table linked by `key`.
+
+    The parent rows are generated first, then assigned fresh unique keys (16-digit keys get
+    a Luhn check digit like card numbers). Every parent receives a number of child rows
+    drawn from `cardinality`, and the child foreign keys are the parent keys repeated by
+    those counts. Other identifier columns (e.g. account numbers) get fresh unique keys of
+    the reference's length. Real reference keys are never reused.
+
+    Args:
+        parent_reference (pd.DataFrame): Reference parent table, e.g. account_details.
+        child_reference (pd.DataFrame): Reference child table, e.g. account_fin_info.
+        key (str): Key column linking the tables, e.g. "card_number".
+        num_parents (int): Number of parent rows to generate.
+        generate_table (callable): `generate_table(reference_data, num_rows)` returning synthetic rows
+            for the non-key columns of one table.
+        cardinality: Children per parent, see `sample_cardinality`. None follows the reference.
+        random_state: Seed for keys and cardinality.
+
+    Returns:
+        dict: {'parent_data', 'child_data', 'integrity'}
+    """
+    rng = np.random.default_rng(random_state)
+    parent_keys = [key] + [column for column in detect_key_columns(parent_reference) if column != key]
+    child_keys = [key] + [column for column in detect_key_columns(child_reference) if column != key]
+
+    logging.info(f'          - generating {num_parents} parent rows')
+    parent_data = fit_rows(generate_table(parent_reference.drop(columns=parent_keys), num_parents), num_parents, rng)
+    for column in parent_keys:
+        num_digits = key_digits(parent_reference[column])
+        keys = generate_unique_keys(num_parents, num_digits, rng, luhn=num_digits == CARD_KEY_DIGITS,
+                                    exclude=parent_reference[column].dropna().to_numpy(dtype=np.int64))
+        parent_data[column] = keys
+    parent_data = parent_data[list(parent_reference.columns)]
+
+    reference_counts = child_reference[key].value_counts().reindex(parent_reference[key], fill_value=0).to_numpy()
+    counts = sample_cardinality(num_parents, rng, cardinality, reference_counts)
+    num_children = int(counts.sum())
+
+    logging.info(f'          - generating {num_children} child rows')
+    child_data = fit_rows(generate_table(child_reference.drop(columns=child_keys), num_children), num_children, rng)
+    for column in child_keys:
+        if column == key:
+            values = np.repeat(parent_data[key].to_numpy(), counts)
+        else:
+            num_digits = key_digits(child_reference[column])
+            values = generate_unique_keys(num_children, num_digits, rng, luhn=num_digits == CARD_KEY_DIGITS,
+                                          exclude=child_reference[column].dropna().to_numpy(dtype=np.int64))
+        child_data[column] = values
+    child_data = child_data[list(child_reference.columns)]
+
+    integrity = check_referential_integrity(parent_data, child_data, key)
+    if not integrity["valid"]:
+        raise ValueError(f"Generated tables violate referential integrity on '{key}': {integrity}")
+    return {'parent_data': parent_data, 'child_data': child_data, 'integrity': integrity}
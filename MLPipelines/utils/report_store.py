@@ -0,0 +1,162 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+REPORT_STORE_PATH = os.getenv("REPORT_STORE_PATH", ".cache/reports")
+# Unrendered reports whose inputs are older than this are removed
+PENDING_REPORT_MAX_AGE_HOURS = float(os.getenv("REPORT_STORE_PENDING_MAX_AGE_HOURS", 24))
+
+HTML_MEDIA_TYPE = "text/html; charset=utf-8"
+PNG_MEDIA_TYPE = "image/png"
+
+
+def report_id_for(kind: str, *key_parts) -> str:
+    """
+    Content address of a report: its kind plus the fingerprints of everything it is rendered from.
+    """
+    return hashlib.sha256(json.dumps([kind, *key_parts], default=str).encode("utf-8")).hexdigest()
+
+
+class ReportStore:
+    """
+    Local filesystem store for rendered report artifacts (Evidently HTML, PNG plots).
+
+    Reports are registered with a renderer and rendered only the first time they are
+    requested. The rendered bytes are stored gzip-compressed under their content
+    address, so later requests and identical reports are served from disk.
+    The renderer of a pending report and its inputs are pickled to disk rather than
+    kept in memory, so any worker process sharing `root` can render it, also after a
+    restart. Pending inputs older than `pending_max_age_hours` are removed.
+    """
+
+    def __init__(self, root: str = REPORT_STORE_PATH, pending_max_age_hours: float = PENDING_REPORT_MAX_AGE_HOURS):
+        self.root = root
+        self.pending_max_age_hours = pending_max_age_hours
+        self.pending_root = os.path.join(root, "pending")
+        self._render_locks = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.pending_root, exist_ok=True)
+
+
+    def _paths(self, report_id: str):
+        directory = os.path.join(self.root, report_id[:2])
+        return os.path.join(directory, f"{report_id}.gz"), os.path.join(directory, f"{report_id}.json")
+
+
+    def _pending_path(self, report_id: str) -> str:
+        return os.path.join(self.pending_root, f"{report_id}.pkl.gz")
+
+
+    def exists(self, report_id: str) -> bool:
+        return os.path.exists(self._paths(report_id)[0])
+
+
+    def is_pending(self, report_id: str) -> bool:
+        return os.path.exists(self._pending_path(report_id))
+
+
+    def has(self, report_id: str) -> bool:
+        """
+        True for reports that are rendered or can still be rendered.
+        """
+        return self.exists(report_id) or self.is_pending(report_id)
+
+
+    def register(self, report_id: str, media_type: str, render_fn, *args) -> str:
+        """
+        Registers a lazy report, rendered as `render_fn(*args)` returning str or bytes.
+        `render_fn` and `args` are pickled, so `render_fn` must be importable by name
+        (a module-level function or a static method), not a closure.
+        """
+        if self.has(report_id):
+            return report_id
+        self._write_atomic(self._pending_path(report_id),
+                           gzip.compress(pickle.dumps((media_type, render_fn, args), protocol=pickle.HIGHEST_PROTOCOL),
+                                         compresslevel=1))
+        self.prune_pending()
+        return report_id
+
+
+    def prune_pending(self):
+        cutoff = time.time() - self.pending_max_age_hours * 3600
+        for name in os.listdir(self.pending_root):
+            path = os.path.join(self.pending_root, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    logging.info(f'          - dropping unrendered report {name}')
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+    @staticmethod
+    def _write_atomic(path: str, payload: bytes):
+        # Write then rename so concurrent readers never see a partial file
+        temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(payload)
+        os.replace(temporary_path, path)
+
+
+    def put(self, report_id: str, media_type: str, content) -> str:
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        data_path, meta_path = self._paths(report_id)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        self._write_atomic(meta_path, json.dumps({"media_type": media_type, "size": len(content)}).encode("utf-8"))
+        self._write_atomic(data_path, gzip.compress(content, compresslevel=6))
+        return report_id
+
+
+    def _load_pending(self, report_id: str):
+        try:
+            with open(self._pending_path(report_id), "rb") as f:
+                return pickle.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+
+
+    def get(self, report_id: str):
+        """
+        Returns (gzip_bytes, media_type) for a report, rendering it first if it is still pending.
+        Raises KeyError for unknown report IDs.
+        """
+        if not self.exists(report_id):
+            with self._lock:
+                render_lock = self._render_locks.setdefault(report_id, threading.Lock())
+            with render_lock:
+                if not self.exists(report_id):
+                    pending = self._load_pending(report_id)
+                    if pending is None:
+                        raise KeyError(report_id)
+                    media_type, render_fn, args = pending
+                    logging.info(f'          - rendering report {report_id}')
+                    self.put(report_id, media_type, render_fn(*args))
+                    try:
+                        os.remove(self._pending_path(report_id))
+                    except FileNotFoundError:
+                        pass
+            with self._lock:
+                self._render_locks.pop(report_id, None)
+
+        data_path, meta_path = self._paths(report_id)
+        with open(meta_path) as f:
+            media_type = json.load(f)["media_type"]
+        with open(data_path, "rb") as f:
+            return f.read(), media_type
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def get_report_store() -> ReportStore:
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ReportStore()
+    return _default_store
@@ -0,0 +1,199 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+OUTPUT_CHUNK_ROWS = int(os.getenv("OUTPUT_CHUNK_ROWS", 65536))
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "arrow_file": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Accept header media types (without parameters) -> format
+ACCEPTED_MEDIA_TYPES = {
+    "application/json": "json",
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/vnd.apache.arrow.file": "arrow_file",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+
+
+def negotiate_format(accept: str = None, requested: str = None) -> str:
+    """
+    Picks the response format from an explicit `requested` format name, otherwise from the
+    Accept header by descending q-value, and falls back to JSON.
+    """
+    if requested:
+        if requested not in MEDIA_TYPES:
+            raise ValueError(f"Unknown output format '{requested}', expected one of {sorted(MEDIA_TYPES)}")
+        return requested
+    candidates = []
+    for position, part in enumerate((accept or "").split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type.lower() in ACCEPTED_MEDIA_TYPES and quality > 0:
+            candidates.append((-quality, position, ACCEPTED_MEDIA_TYPES[media_type.lower()]))
+    return min(candidates)[2] if candidates else "json"
+
+
+def iter_row_chunks(data: pd.DataFrame, chunk_rows: int = OUTPUT_CHUNK_ROWS):
+    for start in range(0, max(len(data), 1), chunk_rows):
+        yield start, data.iloc[start:start + chunk_rows]
+
+
+def iter_csv(data: pd.DataFrame, chunk_rows: int = OUTPUT_CHUNK_ROWS):
+    for start, chunk in iter_row_chunks(data, chunk_rows):
+        yield chunk.to_csv(index=False, header=start == 0).encode("utf-8")
+
+
+def iter_ndjson(data: pd.DataFrame, chunk_rows: int = OUTPUT_CHUNK_ROWS):
+    for _, chunk in iter_row_chunks(data, chunk_rows):
+        if len(chunk):
+            yield (chunk.to_json(orient='records', lines=True, date_format='iso') + "\n").encode("utf-8")
+
+
+class ChunkSink:
+    """
+    Write-only file object that collects written bytes until they are taken, so a writer
+    that needs a file (ParquetWriter) can be streamed piece by piece.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+
+    def tell(self) -> int:
+        return self.position
+
+
+    def flush(self):
+        pass
+
+
+    def close(self):
+        self.closed = True
+
+
+    def take(self) -> bytes:
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def iter_arrow_stream(data: pd.DataFrame, chunk_rows: int = OUTPUT_CHUNK_ROWS, file_format: bool = False):
+    """
+    Arrow IPC stream, one message per record batch, or the IPC file format (the same
+    messages framed by a magic number and a footer) when `file_format` is set. Numeric
+    columns are converted from pandas without copying, and each batch is yielded as soon
+    as it is serialised.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    sink = ChunkSink()
+    new_writer = pa.ipc.new_file if file_format else pa.ipc.new_stream
+    with new_writer(sink, table.schema) as writer:
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            writer.write_batch(batch)
+            yield sink.take()
+    yield sink.take()
+
+
+def iter_arrow_file(data: pd.DataFrame, chunk_rows: int = OUTPUT_CHUNK_ROWS):
+    return iter_arrow_stream(data, chunk_rows, file_format=True)
+
+
+def iter_parquet(data: pd.DataFrame, chunk_rows: int = OUTPUT_CHUNK_ROWS):
+    """
+    Parquet file written one row group per chunk, each yielded once it is encoded. The
+    footer follows the last row group.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    for _, chunk in iter_row_chunks(data, chunk_rows):
+        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def json_default(value):
+    if isinstance(value, pd.DataFrame):
+        # orjson serialises the cell values natively, only Timestamps come back here
+        return value.to_dict(orient='records')
+    if value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Series):
+        return value.tolist()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def stdlib_json_default(value):
+    # The json module writes float NaN as an invalid `NaN` literal, so missing cells become None
+    if isinstance(value, pd.DataFrame):
+        value = value.astype(object).where(value.notna(), None)
+    return json_default(value)
+
+
+def dumps_json(payload) -> bytes:
+    """
+    Serialises a payload containing DataFrames and NumPy values, with orjson when installed
+    and the standard library otherwise.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json.dumps(payload, default=stdlib_json_default).encode("utf-8")
+    return orjson.dumps(payload, default=json_default,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
+DATA_ENCODERS = {
+    "ndjson": iter_ndjson,
+    "csv": iter_csv,
+    "arrow": iter_arrow_stream,
+    "arrow_file": iter_arrow_file,
+    "parquet": iter_parquet,
+}
+
+
+def encode_table(data: pd.DataFrame, output_format: str, chunk_rows: int = OUTPUT_CHUNK_ROWS):
+    """
+    Returns (media_type, iterator of byte chunks) for `data` in a tabular output format.
+    """
+    return MEDIA_TYPES[output_format], DATA_ENCODERS[output_format](data, chunk_rows)
@@ -0,0 +1,118 @@
+import importlib
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# Imported lazily by the library modules, warmed explicitly by `warm_imports`
+HEAVY_MODULES = (
+    "scipy.special",
+    "scipy.stats",
+    "sklearn.manifold",
+    "plotly.express",
+    "matplotlib.pyplot",
+    "seaborn",
+    "evidently.report",
+    "torch",
+    "transformers",
+)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+IMPORT_TIME_TIMEOUT_SECONDS = float(os.getenv("IMPORT_TIME_TIMEOUT_SECONDS", 60))
+
+# module -> (returncode, stderr) of its last `-X importtime` run; one run at a time
+_import_time_runs = {}
+_import_time_lock = threading.Lock()
+
+
+def warm_imports(modules=HEAVY_MODULES) -> dict:
+    """
+    Imports `modules` in this process and returns the seconds each took, or the error
+    for modules that are not installed. Modules already imported cost ~0.
+    """
+    timings = {}
+    for module in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(module)
+            timings[module] = round(time.perf_counter() - started, 3)
+        except Exception as e:
+            timings[module] = f"unavailable: {e}"
+    return timings
+
+
+def warm_compute_worker(load_embedding_model: bool = False) -> dict:
+    """
+    Runs in a compute worker process: imports the heavy modules and optionally loads the
+    embedding model there, so the first real request does not pay for it.
+    """
+    timings = {"pid": os.getpid(), "imports": warm_imports()}
+    if load_embedding_model:
+        from utils.drift_detector import load_model_and_tokenizer
+
+        started = time.perf_counter()
+        load_model_and_tokenizer()
+        timings["embedding_model"] = round(time.perf_counter() - started, 3)
+    return timings
+
+
+def run_import_time(module: str, refresh: bool = False, timeout: float = IMPORT_TIME_TIMEOUT_SECONDS):
+    """
+    Returns (returncode, stderr) of importing `module` in a fresh interpreter with
+    `-X importtime`. Successful runs are cached per module until `refresh` is set;
+    a run exceeding `timeout` seconds is killed and reported with returncode None.
+    """
+    with _import_time_lock:
+        if not refresh and module in _import_time_runs:
+            return _import_time_runs[module]
+        try:
+            result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                    cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None, f"Importing {module} took longer than {timeout:.0f}s"
+        if result.returncode == 0:
+            _import_time_runs[module] = (result.returncode, result.stderr)
+        return result.returncode, result.stderr
+
+
+def import_time_report(module: str = "src.genai_api", top: int = 30, refresh: bool = False) -> dict:
+    """
+    Imports `module` in a fresh interpreter with `-X importtime` and breaks the import cost
+    down per module and per top-level package. The measurement is reused until `refresh`.
+
+    Returns:
+        dict: total seconds, the `top` modules by cumulative time and the packages by self time.
+    """
+    returncode, stderr = run_import_time(module, refresh)
+    modules = []
+    packages = defaultdict(int)
+    for line in stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules.append({"module": name, "self_ms": self_us / 1000, "cumulative_ms": cumulative_us / 1000,
+                        "depth": (len(indent) - 1) // 2})
+        packages[name.split(".")[0]] += self_us
+
+    total_us = sum(packages.values())
+    return {
+        "module": module,
+        "import_succeeded": returncode == 0,
+        "error": (stderr.strip().splitlines() or [None])[-1] if returncode != 0 else None,
+        "total_seconds": total_us / 1e6,
+        "slowest_modules": sorted(modules, key=lambda row: row["cumulative_ms"], reverse=True)[:top],
+        "packages": sorted(({"package": package, "self_ms": us / 1000} for package, us in packages.items()),
+                           key=lambda row: row["self_ms"], reverse=True)[:top],
+    }
+
+
+if __name__ == "__main__":
+    # python -m utils.startup [module]
+    report = import_time_report(sys.argv[1] if len(sys.argv) > 1 else "src.genai_api")
+    print(f"{report['module']}: {report['total_seconds']:.2f}s")
+    for row in report["packages"]:
+        print(f"  {row['self_ms']:10.1f} ms  {row['package']}")
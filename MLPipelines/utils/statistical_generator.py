@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+from utils.relational import MIN_KEY_DIGITS, CARD_KEY_DIGITS, key_digits, generate_unique_keys
+
+QUANTILE_GRID_SIZE = 1001
+MAX_CATEGORIES = 1000
+NANOSECONDS_PER_DAY = 86400 * 10**9
+# A prefix followed by a number, e.g. EMP01
+STRING_KEY_PATTERN = r"^(\D*)(\d{1,18})$"
+INDEPENDENT_KINDS = ("key", "string_key", "empty")
+
+
+def infer_date_column(values: pd.Series):
+    """
+    Returns the parsed datetimes when every non-null value of an object column is a date,
+    otherwise None.
+    """
+    non_null = values.dropna()
+    if non_null.empty:
+        return None
+    parsed = pd.to_datetime(non_null, errors='coerce', format='mixed')
+    if parsed.isna().any():
+        return None
+    return parsed
+
+
+def nullable_dtype(dtype):
+    """
+    The pandas nullable counterpart of a NumPy integer or bool dtype, so values can be
+    cast first and nulls masked in afterwards without falling back to float or object.
+    """
+    if isinstance(dtype, np.dtype) and dtype.kind in "iub":
+        if dtype.kind == "b":
+            return "boolean"
+        return f"{'U' if dtype.kind == 'u' else ''}Int{dtype.itemsize * 8}"
+    return dtype
+
+
+def is_key_column(values: pd.Series) -> bool:
+    """
+    Unique integers of at least MIN_KEY_DIGITS digits, e.g. card_number or account_number.
+    """
+    non_null = values.dropna()
+    return pd.api.types.is_integer_dtype(values.dtype) and not non_null.empty and non_null.is_unique \
+        and non_null.min() >= 10 ** (MIN_KEY_DIGITS - 1)
+
+
+def string_key_format(values: pd.Series):
+    """
+    Returns (prefix, digits, largest number) when the non-null values of a text column are
+    distinct and all one prefix followed by a number, e.g. EMP01, EMP02, otherwise None.
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return None
+    non_null = values.dropna()
+    if len(non_null) < 2 or not non_null.is_unique:
+        return None
+    parts = non_null.astype(str).str.extract(STRING_KEY_PATTERN)
+    if parts[1].isna().any() or parts[0].nunique() != 1:
+        return None
+    return parts[0].iloc[0], int(parts[1].str.len().max()), int(parts[1].astype(np.int64).max())
+
+
+def format_string_keys(prefix: str, numbers: np.ndarray, digits: int, dtype) -> pd.Series:
+    """
+    `prefix` followed by each number zero-padded to `digits`, built with Arrow compute when
+    pyarrow is installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return (prefix + pd.Series(numbers).astype(str).str.zfill(digits)).astype(dtype)
+    text = pc.binary_join_element_wise(prefix, pc.utf8_lpad(pa.array(numbers).cast(pa.string()), digits, padding="0"), "")
+    if hasattr(dtype, "__from_arrow__"):
+        return pd.Series(dtype.__from_arrow__(text))
+    return text.to_pandas().astype(dtype)
+
+
+def take_labels(labels: np.ndarray, index: np.ndarray, dtype) -> pd.Series:
+    """
+    labels[index] as a Series of `dtype`, converting each distinct label once rather than
+    every sampled value.
+    """
+    try:
+        return pd.Series(pd.array(labels, dtype=dtype).take(index))
+    except (ValueError, TypeError):
+        return pd.Series(labels[index])
+
+
+class GaussianCopulaGenerator:
+    """
+    Local statistical generator: fits per-column marginals and a Gaussian copula
+    capturing cross-column correlation, then samples new rows with vectorised NumPy.
+
+    Numeric and date columns use empirical quantile functions, object columns use
+    category frequencies. Identifier columns (unique integers with many digits) are not
+    interpolated, which would lose digits through float64: they get fresh unique keys of
+    the same length instead. Text identifiers (a prefix and a distinct number, e.g. EMP01)
+    continue the reference numbering with a zero-padded counter, so no real identifier is
+    copied. Sampled data has the same columns and dtypes as the reference.
+    """
+
+    def __init__(self, random_state=None):
+        self.rng = np.random.default_rng(random_state)
+        self.columns = []
+        self.copula_columns = []
+        self.marginals = {}
+        self.cholesky = None
+
+
+    def fit(self, reference_data: pd.DataFrame):
+        self.columns = list(reference_data.columns)
+        # Identifier and empty columns do not depend on the others and draw no copula values
+        self.copula_columns = []
+        normal_scores = []
+        for column in self.columns:
+            marginal, scores = self._fit_marginal(reference_data[column])
+            self.marginals[column] = marginal
+            if marginal["kind"] not in INDEPENDENT_KINDS:
+                self.copula_columns.append(column)
+                normal_scores.append(scores)
+
+        scores = np.column_stack(normal_scores) if normal_scores else np.empty((0, 0))
+        if scores.shape[0] > 1:
+            # Constant columns have no variance; their correlations are set to zero below
+            with np.errstate(invalid='ignore', divide='ignore'):
+                correlation = np.corrcoef(scores, rowvar=False)
+            correlation = np.nan_to_num(np.atleast_2d(correlation))
+            np.fill_diagonal(correlation, 1.0)
+        else:
+            correlation = np.eye(len(self.copula_columns))
+        self.cholesky = self._nearest_psd_cholesky(correlation)
+        return self
+
+
+    def _fit_marginal(self, values: pd.Series):
+        n = len(values)
+        null_rate = float(values.isna().mean()) if n else 0.0
+        non_null = values.dropna()
+        marginal = {"dtype": values.dtype, "null_rate": null_rate}
+
+        # Normal scores are computed on all rows; nulls sit at the median
+        scores = np.zeros(n)
+        mask = values.notna().to_numpy()
+
+        kind = None
+        if is_key_column(values):
+            marginal["kind"] = "key"
+            marginal["digits"] = key_digits(non_null)
+            marginal["reference_keys"] = non_null.to_numpy(dtype=np.int64)
+            return marginal, scores
+        key_format = string_key_format(values)
+        if key_format is not None:
+            marginal["kind"] = "string_key"
+            marginal["prefix"], marginal["digits"], marginal["last_number"] = key_format
+            return marginal, scores
+        if pd.api.types.is_bool_dtype(values.dtype):
+            kind = "categorical"
+        elif pd.api.types.is_numeric_dtype(values.dtype):
+            kind = "numeric"
+            numeric = non_null.to_numpy(dtype=np.float64)
+        elif pd.api.types.is_datetime64_any_dtype(values.dtype):
+            kind = "datetime"
+            numeric = non_null.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        else:
+            parsed = infer_date_column(values)
+            if parsed is not None:
+                kind = "date_string"
+                numeric = parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+                marginal["date_only"] = bool((parsed.dt.normalize() == parsed).all())
+            else:
+                kind = "categorical"
+        marginal["kind"] = kind
+
+        if non_null.empty:
+            marginal["kind"] = "empty"
+            return marginal, scores
+
+        if kind == "categorical":
+            frequencies = non_null.value_counts(normalize=True)
+            if len(frequencies) > MAX_CATEGORIES:
+                frequencies = frequencies.iloc[:MAX_CATEGORIES] / frequencies.iloc[:MAX_CATEGORIES].sum()
+            categories = frequencies.index.to_numpy()
+            cumulative = np.cumsum(frequencies.to_numpy())
+            cumulative[-1] = 1.0
+            marginal["categories"] = categories
+            marginal["cumulative"] = cumulative
+            # Score each category at the middle of its probability interval
+            midpoints = pd.Series(cumulative - frequencies.to_numpy() / 2, index=frequencies.index)
+            u = non_null.map(midpoints).fillna(0.5).to_numpy(dtype=np.float64)
+        else:
+            marginal["quantiles"] = np.quantile(numeric, np.linspace(0, 1, QUANTILE_GRID_SIZE))
+            marginal["is_integer"] = pd.api.types.is_integer_dtype(values.dtype)
+            ranks = pd.Series(numeric).rank(method="average").to_numpy()
+            u = ranks / (len(numeric) + 1)
+
+        from scipy.special import ndtri
+
+        scores[mask] = ndtri(np.clip(u, 1e-6, 1 - 1e-6))
+        return marginal, scores
+
+
+    @staticmethod
+    def _nearest_psd_cholesky(correlation: np.ndarray) -> np.ndarray:
+        eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+        eigenvalues = np.clip(eigenvalues, 1e-8, None)
+        correlation = eigenvectors @ np.diag(eigenvalues) @ eigenvectors.T
+        scale = np.sqrt(np.diag(correlation))
+        correlation = correlation / np.outer(scale, scale)
+        return np.linalg.cholesky(correlation)
+
+
+    def sample(self, num_rows: int) -> pd.DataFrame:
+        if self.cholesky is None:
+            raise ValueError("GaussianCopulaGenerator must be fitted before sampling")
+        from scipy.special import ndtr
+
+        # One row per column, so each marginal reads a contiguous array
+        u = ndtr(self.cholesky @ self.rng.standard_normal((len(self.copula_columns), num_rows)))
+        u = dict(zip(self.copula_columns, u))
+
+        data = {}
+        for column in self.columns:
+            data[column] = self._sample_marginal(self.marginals[column], u.get(column), num_rows)
+        return pd.DataFrame(data, columns=self.columns)
+
+
+    def _sample_marginal(self, marginal: dict, u: np.ndarray, num_rows: int) -> pd.Series:
+        kind = marginal["kind"]
+        dtype = nullable_dtype(marginal["dtype"]) if marginal["null_rate"] else marginal["dtype"]
+        if kind == "empty":
+            return pd.Series([None] * num_rows, dtype=marginal["dtype"])
+        if kind == "key":
+            keys = generate_unique_keys(num_rows, marginal["digits"], self.rng,
+                                        luhn=marginal["digits"] == CARD_KEY_DIGITS,
+                                        exclude=marginal["reference_keys"])
+            return pd.Series(keys).astype(marginal["dtype"])
+        if kind == "string_key":
+            numbers = np.arange(marginal["last_number"] + 1, marginal["last_number"] + 1 + num_rows, dtype=np.int64)
+            marginal["last_number"] += num_rows
+            values = format_string_keys(marginal["prefix"], numbers, marginal["digits"], dtype)
+        elif kind == "categorical":
+            index = np.searchsorted(marginal["cumulative"], u, side="right")
+            values = take_labels(marginal["categories"], np.minimum(index, len(marginal["categories"]) - 1), dtype)
+        else:
+            # Quantiles sit on a uniform grid, so interpolation needs no search
+            quantiles = marginal["quantiles"]
+            position = u * (len(quantiles) - 1)
+            lower = np.minimum(position.astype(np.int64), len(quantiles) - 2)
+            numeric = quantiles[lower] + (position - lower) * (quantiles[lower + 1] - quantiles[lower])
+            if kind == "numeric":
+                values = pd.Series(np.round(numeric) if marginal["is_integer"] else numeric)
+            elif kind == "date_string" and marginal["date_only"]:
+                # Format each day of the sampled range once instead of every sampled value
+                days = np.floor(numeric / NANOSECONDS_PER_DAY).astype(np.int64)
+                first_day = days.min()
+                labels = pd.to_datetime(first_day + np.arange(days.max() - first_day + 1), unit="D") \
+                    .strftime("%Y-%m-%d").to_numpy(dtype=object)
+                values = take_labels(labels, days - first_day, dtype)
+            else:
+                values = pd.Series(pd.to_datetime(numeric.astype(np.int64)))
+                if kind == "date_string":
+                    values = values.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+        if values.dtype != dtype:
+            try:
+                values = values.astype(dtype)
+            except (ValueError, TypeError):
+                pass
+        if marginal["null_rate"]:
+            values = values.mask(self.rng.random(num_rows) < marginal["null_rate"])
+        return values